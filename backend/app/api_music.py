@@ -1,18 +1,21 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, Query
+import asyncio
+import json
+from typing import AsyncIterator, Optional
 
-from .schemas import MusicSearchResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from .schemas import MusicSearchResponse, MusicSuggestResponse, SearchCacheStatsResponse, YouTubeQuotaResponse
 from .services_music import MusicService
 
 
 router = APIRouter(prefix="/music", tags=["music"])
 
 
-def get_music_service() -> MusicService:
-    from .main import app_state
-
-    return app_state.music_service
+def get_music_service(request: Request) -> MusicService:
+    return request.app.state.services.music_service
 
 
 @router.get("/search", response_model=MusicSearchResponse)
@@ -23,3 +26,44 @@ async def search_music(
 ) -> MusicSearchResponse:
     items = await music_service.search_tracks(query=q, limit=limit)
     return MusicSearchResponse(items=items)
+
+
+@router.get("/suggest", response_model=MusicSuggestResponse)
+async def suggest_music(
+    q: str = Query(min_length=1, max_length=120),
+    limit: int = Query(default=5, ge=1, le=20),
+    music_service: MusicService = Depends(get_music_service),
+) -> MusicSuggestResponse:
+    items, source = await music_service.suggest_tracks(query=q, limit=limit)
+    return MusicSuggestResponse(source=source, items=items)  # type: ignore[arg-type]
+
+
+@router.get("/search/stream")
+async def stream_search_music(
+    q: str = Query(min_length=1, max_length=120),
+    limit: int = Query(default=3, ge=1, le=10),
+    deadline_ms: Optional[int] = Query(default=None, ge=0, le=10_000),
+    music_service: MusicService = Depends(get_music_service),
+) -> StreamingResponse:
+    if deadline_ms is None:
+        deadline_ms = music_service.enrichment_deadline_ms
+
+    async def body() -> AsyncIterator[bytes]:
+        async for event in music_service.stream_search(query=q, limit=limit, deadline_sec=deadline_ms / 1000):
+            yield (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+
+    return StreamingResponse(body(), media_type="application/x-ndjson", headers={"Cache-Control": "no-store"})
+
+
+@router.get("/search/cache", response_model=SearchCacheStatsResponse)
+async def get_search_cache_stats(
+    music_service: MusicService = Depends(get_music_service),
+) -> SearchCacheStatsResponse:
+    return SearchCacheStatsResponse(**music_service.search_cache_stats())
+
+
+@router.get("/quota", response_model=YouTubeQuotaResponse)
+async def get_youtube_quota(music_service: MusicService = Depends(get_music_service)) -> YouTubeQuotaResponse:
+    if music_service.quota_budget is None:
+        raise HTTPException(status_code=404, detail="quota budget not configured")
+    return YouTubeQuotaResponse(**await asyncio.to_thread(music_service.quota_budget.stats))
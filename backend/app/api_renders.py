@@ -1,25 +1,29 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
 
 from .schemas import (
+    BackendStatusResponse,
+    NodeProfileResponse,
     RenderCreateRequest,
     RenderCreateResponse,
     RenderHistoryClearResponse,
-    RenderHistoryItem,
     RenderHistoryResponse,
     RenderStatusResponse,
+    RenderWorkersResponse,
 )
+from .serialization import join_items
 from .services_queue import RenderQueueService
 
 
 router = APIRouter(prefix="/renders", tags=["renders"])
 
 
-def get_queue_service() -> RenderQueueService:
-    from .main import app_state
-
-    return app_state.queue_service
+def get_queue_service(request: Request) -> RenderQueueService:
+    return request.app.state.services.queue_service
 
 
 @router.post("", response_model=RenderCreateResponse, status_code=status.HTTP_202_ACCEPTED)
@@ -35,25 +39,9 @@ async def get_render_history(
     limit: int = Query(default=6, ge=1, le=50),
     include_failed: bool = Query(default=False),
     queue_service: RenderQueueService = Depends(get_queue_service),
-) -> RenderHistoryResponse:
-    records = await queue_service.list_history(limit=limit, include_failed=include_failed)
-    return RenderHistoryResponse(
-        items=[
-            RenderHistoryItem(
-                job_id=record.job_id,
-                status=record.status,  # type: ignore[arg-type]
-                track={
-                    **record.track,
-                    "album_art_url": record.track.get("album_art_url")
-                    or (f"/static/inputs/{record.image_filename}" if record.image_filename else None),
-                },
-                result=record.result,
-                created_at=record.created_at,
-                updated_at=record.updated_at,
-            )
-            for record in records
-        ]
-    )
+) -> Response:
+    items = await queue_service.list_history_json(limit=limit, include_failed=include_failed)
+    return Response(content=join_items(items), media_type="application/json")
 
 
 @router.delete("/history", response_model=RenderHistoryClearResponse)
@@ -65,9 +53,62 @@ async def clear_render_history(
     return RenderHistoryClearResponse(deleted_count=deleted_count)
 
 
-@router.get("/{job_id}", response_model=RenderStatusResponse)
-async def get_render_job(job_id: str, queue_service: RenderQueueService = Depends(get_queue_service)) -> RenderStatusResponse:
-    status_result = await queue_service.get_job(job_id)
-    if not status_result:
+@router.get("/backend", response_model=BackendStatusResponse)
+async def get_backend_status(queue_service: RenderQueueService = Depends(get_queue_service)) -> BackendStatusResponse:
+    return BackendStatusResponse(**queue_service.backend_state)
+
+
+@router.get("/workers", response_model=RenderWorkersResponse)
+async def get_render_workers(queue_service: RenderQueueService = Depends(get_queue_service)) -> RenderWorkersResponse:
+    return RenderWorkersResponse(
+        queue_backend="sqlite" if queue_service.job_store is not None else "memory",
+        queue_depth=await asyncio.to_thread(queue_service.queue_depth),
+        items=await asyncio.to_thread(queue_service.list_workers),
+    )
+
+
+@router.get("/profile/nodes", response_model=NodeProfileResponse)
+async def get_node_profile(queue_service: RenderQueueService = Depends(get_queue_service)) -> NodeProfileResponse:
+    render_count, items = await asyncio.to_thread(queue_service.node_profile)
+    return NodeProfileResponse(render_count=render_count, items=items)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in {candidate.removeprefix("W/") for candidate in candidates}
+
+
+@router.get("/{job_id}", response_model=RenderStatusResponse, responses={304: {"description": "Not modified"}})
+async def get_render_job(
+    job_id: str,
+    wait: float = Query(default=0, ge=0, le=60),
+    if_none_match: Optional[str] = Header(default=None),
+    queue_service: RenderQueueService = Depends(get_queue_service),
+) -> Response:
+    if if_none_match:
+        etag = await queue_service.job_etag(job_id)
+        if etag is None:
+            raise HTTPException(status_code=404, detail="job not found")
+        if wait > 0 and _etag_matches(if_none_match, etag):
+            etag = await queue_service.wait_for_change(job_id, etag, wait)
+            if etag is None:
+                raise HTTPException(status_code=404, detail="job not found")
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    encoded = await queue_service.get_job_json(job_id)
+    if encoded is None:
         raise HTTPException(status_code=404, detail="job not found")
-    return status_result
+    body, etag = encoded
+    return Response(content=body, media_type="application/json", headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+@router.get("/{job_id}/preview")
+async def get_render_preview(job_id: str, queue_service: RenderQueueService = Depends(get_queue_service)) -> Response:
+    preview = await queue_service.get_preview(job_id)
+    if not preview:
+        raise HTTPException(status_code=404, detail="preview not available")
+    image, media_type = preview
+    return Response(content=image, media_type=media_type, headers={"Cache-Control": "no-store"})
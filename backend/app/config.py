@@ -4,6 +4,7 @@ import os
 from dataclasses import dataclass
 from functools import lru_cache
 from pathlib import Path
+from typing import Optional
 
 try:
     from dotenv import load_dotenv
@@ -26,9 +27,48 @@ class Settings:
     youtube_lookup_top_k: int
     youtube_cache_ttl_sec: int
     youtube_cache_max_size: int
+    youtube_negative_cache_ttl_sec: int
+    youtube_cache_stale_ttl_sec: int
+    youtube_stats_cache_ttl_sec: int
+    youtube_quota_daily_units: int
+    youtube_quota_burst_units: int
+    youtube_quota_reserve_units: int
+    youtube_cache_db_path: Optional[Path]
+    itunes_cache_ttl_sec: int
+    itunes_cache_max_size: int
+    search_enrichment_deadline_ms: int
+    search_render_cached_boost: float
+    artwork_prefetch_top_n: int
+    artwork_prefetch_ttl_sec: int
+    artwork_prefetch_max_entries: int
+    artwork_prefetch_concurrency: int
+    suggest_index_path: Path
+    suggest_index_max_entries: int
     workflow_version: str
     render_preset: str
     render_timeout_sec: int
+    render_hls_enabled: bool
+    preview_max_size: int
+    preview_buffer_max_jobs: int
+    comfy_warmup_enabled: bool
+    comfy_warmup_timeout_sec: int
+    queue_backend: str
+    queue_db_path: Path
+    queue_lease_sec: int
+    queue_poll_interval_ms: int
+    queue_max_attempts: int
+    render_worker_enabled: bool
+    trace_sample_rate: float
+    trace_exporter: str
+    trace_file_path: Path
+    rate_limit_backend: str
+    rate_limit_db_path: Path
+    rate_limit_search_per_min: float
+    rate_limit_search_burst: int
+    rate_limit_render_per_min: float
+    rate_limit_render_burst: int
+    rate_limit_api_keys: frozenset[str]
+    rate_limit_trust_forwarded: bool
     polling_interval_sec: int
     estimated_job_sec: int
 
@@ -54,6 +94,25 @@ def get_settings() -> Settings:
     if not comfy_workflow_path.is_absolute():
         comfy_workflow_path = (project_root / comfy_workflow_path).resolve()
 
+    queue_db_path = Path(os.getenv("QUEUE_DB_PATH", str(data_dir / "queue.sqlite3"))).expanduser()
+    if not queue_db_path.is_absolute():
+        queue_db_path = (project_root / queue_db_path).resolve()
+
+    trace_file_path = Path(os.getenv("TRACE_FILE_PATH", str(data_dir / "traces.jsonl"))).expanduser()
+    if not trace_file_path.is_absolute():
+        trace_file_path = (project_root / trace_file_path).resolve()
+
+    rate_limit_db_path = Path(os.getenv("RATE_LIMIT_DB_PATH", str(data_dir / "ratelimit.sqlite3"))).expanduser()
+    if not rate_limit_db_path.is_absolute():
+        rate_limit_db_path = (project_root / rate_limit_db_path).resolve()
+
+    youtube_cache_db_raw = os.getenv("YOUTUBE_CACHE_DB_PATH", str(data_dir / "youtube_cache.sqlite3")).strip()
+    youtube_cache_db_path: Optional[Path] = None
+    if youtube_cache_db_raw:
+        youtube_cache_db_path = Path(youtube_cache_db_raw).expanduser()
+        if not youtube_cache_db_path.is_absolute():
+            youtube_cache_db_path = (project_root / youtube_cache_db_path).resolve()
+
     return Settings(
         project_root=project_root,
         api_prefix=os.getenv("API_PREFIX", "/api/v1"),
@@ -68,9 +127,48 @@ def get_settings() -> Settings:
         youtube_lookup_top_k=int(os.getenv("YOUTUBE_LOOKUP_TOP_K", "1")),
         youtube_cache_ttl_sec=int(os.getenv("YOUTUBE_CACHE_TTL_SEC", "86400")),
         youtube_cache_max_size=int(os.getenv("YOUTUBE_CACHE_MAX_SIZE", "2000")),
+        youtube_negative_cache_ttl_sec=int(os.getenv("YOUTUBE_NEGATIVE_CACHE_TTL_SEC", "3600")),
+        youtube_cache_stale_ttl_sec=int(os.getenv("YOUTUBE_CACHE_STALE_TTL_SEC", "604800")),
+        youtube_stats_cache_ttl_sec=int(os.getenv("YOUTUBE_STATS_CACHE_TTL_SEC", "21600")),
+        youtube_quota_daily_units=int(os.getenv("YOUTUBE_QUOTA_DAILY_UNITS", "10000")),
+        youtube_quota_burst_units=int(os.getenv("YOUTUBE_QUOTA_BURST_UNITS", "1000")),
+        youtube_quota_reserve_units=int(os.getenv("YOUTUBE_QUOTA_RESERVE_UNITS", "500")),
+        youtube_cache_db_path=youtube_cache_db_path,
+        itunes_cache_ttl_sec=int(os.getenv("ITUNES_CACHE_TTL_SEC", "600")),
+        itunes_cache_max_size=int(os.getenv("ITUNES_CACHE_MAX_SIZE", "1000")),
+        search_enrichment_deadline_ms=int(os.getenv("SEARCH_ENRICHMENT_DEADLINE_MS", "2500")),
+        search_render_cached_boost=float(os.getenv("SEARCH_RENDER_CACHED_BOOST", "0.05")),
+        artwork_prefetch_top_n=int(os.getenv("ARTWORK_PREFETCH_TOP_N", "3")),
+        artwork_prefetch_ttl_sec=int(os.getenv("ARTWORK_PREFETCH_TTL_SEC", "300")),
+        artwork_prefetch_max_entries=int(os.getenv("ARTWORK_PREFETCH_MAX_ENTRIES", "64")),
+        artwork_prefetch_concurrency=int(os.getenv("ARTWORK_PREFETCH_CONCURRENCY", "4")),
+        suggest_index_path=data_dir / "suggest_index.json",
+        suggest_index_max_entries=int(os.getenv("SUGGEST_INDEX_MAX_ENTRIES", "50000")),
         workflow_version=os.getenv("WORKFLOW_VERSION", "qwen_enhancer_v1"),
         render_preset=os.getenv("RENDER_PRESET", "mp4_loop_v1"),
         render_timeout_sec=int(os.getenv("RENDER_TIMEOUT_SEC", "900")),
+        render_hls_enabled=os.getenv("RENDER_HLS_ENABLED", "0") == "1",
+        preview_max_size=int(os.getenv("PREVIEW_MAX_SIZE", "256")),
+        preview_buffer_max_jobs=int(os.getenv("PREVIEW_BUFFER_MAX_JOBS", "32")),
+        comfy_warmup_enabled=os.getenv("COMFY_WARMUP_ENABLED", "0") == "1",
+        comfy_warmup_timeout_sec=int(os.getenv("COMFY_WARMUP_TIMEOUT_SEC", "600")),
+        queue_backend=os.getenv("QUEUE_BACKEND", "memory").strip().lower(),
+        queue_db_path=queue_db_path,
+        queue_lease_sec=int(os.getenv("QUEUE_LEASE_SEC", "60")),
+        queue_poll_interval_ms=int(os.getenv("QUEUE_POLL_INTERVAL_MS", "500")),
+        queue_max_attempts=int(os.getenv("QUEUE_MAX_ATTEMPTS", "3")),
+        render_worker_enabled=os.getenv("RENDER_WORKER_ENABLED", "1") == "1",
+        trace_sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0")),
+        trace_exporter=os.getenv("TRACE_EXPORTER", "file").strip().lower(),
+        trace_file_path=trace_file_path,
+        rate_limit_backend=os.getenv("RATE_LIMIT_BACKEND", "memory").strip().lower(),
+        rate_limit_db_path=rate_limit_db_path,
+        rate_limit_search_per_min=float(os.getenv("RATE_LIMIT_SEARCH_PER_MIN", "30")),
+        rate_limit_search_burst=int(os.getenv("RATE_LIMIT_SEARCH_BURST", "10")),
+        rate_limit_render_per_min=float(os.getenv("RATE_LIMIT_RENDER_PER_MIN", "6")),
+        rate_limit_render_burst=int(os.getenv("RATE_LIMIT_RENDER_BURST", "3")),
+        rate_limit_api_keys=frozenset(key.strip() for key in os.getenv("RATE_LIMIT_API_KEYS", "").split(",") if key.strip()),
+        rate_limit_trust_forwarded=os.getenv("RATE_LIMIT_TRUST_FORWARDED", "0") == "1",
         polling_interval_sec=int(os.getenv("POLLING_INTERVAL_SEC", "3")),
         estimated_job_sec=int(os.getenv("ESTIMATED_JOB_SEC", "300")),
     )
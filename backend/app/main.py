@@ -1,85 +1,244 @@
 from __future__ import annotations
 
+import asyncio
+import atexit
 import logging
-from dataclasses import dataclass
+from contextlib import asynccontextmanager
+from functools import cached_property
+from typing import Any, AsyncIterator, Optional
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
 from .api_music import router as music_router
 from .api_renders import router as renders_router
-from .config import get_settings
+from .config import Settings, get_settings
+from .metrics import REGISTRY, RENDER_QUEUE_DEPTH, EventLoopLagMonitor
+from .ratelimit import MemoryBucketStore, RateLimiter, RateLimitMiddleware, RateLimitRule, SQLiteBucketStore
 from .services_comfy import ComfyService
+from .services_jobstore import SQLiteJobStore
 from .services_music import MusicService
+from .services_prefetch import ArtworkPrefetcher
 from .services_queue import RenderQueueService
+from .services_quota import YouTubeQuotaBudget
+from .services_render_index import RenderCacheIndex
+from .services_suggest import TrackSuggestIndex
 from .services_youtube import YouTubeService
 from .storage import Storage
+from .tracing import TRACER, TracingMiddleware, configure_tracing
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-@dataclass
 class AppState:
-    storage: Storage
-    youtube_service: YouTubeService
-    music_service: MusicService
-    comfy_service: ComfyService
-    queue_service: RenderQueueService
-
-
-settings = get_settings()
-
-storage = Storage(settings)
-youtube_service = YouTubeService(
-    api_key=settings.youtube_api_key,
-    cache_ttl_sec=settings.youtube_cache_ttl_sec,
-    cache_max_size=settings.youtube_cache_max_size,
-)
-music_service = MusicService(
-    youtube_service=youtube_service,
-    youtube_lookup_top_k=settings.youtube_lookup_top_k,
-)
-comfy_service = ComfyService(settings=settings)
-queue_service = RenderQueueService(settings=settings, storage=storage, comfy_service=comfy_service)
-
-app_state = AppState(
-    storage=storage,
-    youtube_service=youtube_service,
-    music_service=music_service,
-    comfy_service=comfy_service,
-    queue_service=queue_service,
-)
-
-app = FastAPI(title="Music Search + Live2D Render API", version="0.1.0")
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-app.mount("/static", StaticFiles(directory=str(settings.data_dir)), name="static")
-
-app.include_router(music_router, prefix=settings.api_prefix)
-app.include_router(renders_router, prefix=settings.api_prefix)
-
-
-@app.on_event("startup")
-async def on_startup() -> None:
-    logger.info("starting queue worker")
-    queue_service.start()
-
-
-@app.on_event("shutdown")
-async def on_shutdown() -> None:
-    logger.info("stopping queue worker")
-    await queue_service.stop()
-
-
-@app.get("/")
-async def health() -> dict[str, str]:
-    return {"status": "ok"}
+    # Services for one app instance, each built on first use so importing the app stays cheap.
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self.loop_lag_monitor = EventLoopLagMonitor()
+
+    def is_built(self, name: str) -> bool:
+        return name in self.__dict__
+
+    @cached_property
+    def storage(self) -> Storage:
+        return Storage(self.settings)
+
+    @cached_property
+    def render_index(self) -> RenderCacheIndex:
+        return RenderCacheIndex(self.storage, self.settings.workflow_version, self.settings.render_preset)
+
+    @cached_property
+    def artwork_prefetcher(self) -> ArtworkPrefetcher:
+        settings = self.settings
+        return ArtworkPrefetcher(
+            self.storage,
+            settings.workflow_version,
+            settings.render_preset,
+            ttl_sec=settings.artwork_prefetch_ttl_sec,
+            max_entries=settings.artwork_prefetch_max_entries,
+            concurrency=settings.artwork_prefetch_concurrency,
+        )
+
+    @cached_property
+    def track_index(self) -> TrackSuggestIndex:
+        return TrackSuggestIndex(path=self.settings.suggest_index_path, max_entries=self.settings.suggest_index_max_entries)
+
+    @cached_property
+    def youtube_quota_budget(self) -> YouTubeQuotaBudget:
+        return YouTubeQuotaBudget(
+            daily_limit=self.settings.youtube_quota_daily_units,
+            burst_units=self.settings.youtube_quota_burst_units,
+            reserve_units=self.settings.youtube_quota_reserve_units,
+            db_path=self.settings.youtube_cache_db_path,
+        )
+
+    @cached_property
+    def youtube_service(self) -> YouTubeService:
+        settings = self.settings
+        return YouTubeService(
+            api_key=settings.youtube_api_key,
+            cache_ttl_sec=settings.youtube_cache_ttl_sec,
+            cache_max_size=settings.youtube_cache_max_size,
+            negative_cache_ttl_sec=settings.youtube_negative_cache_ttl_sec,
+            stale_ttl_sec=settings.youtube_cache_stale_ttl_sec,
+            cache_db_path=settings.youtube_cache_db_path,
+            stats_cache_ttl_sec=settings.youtube_stats_cache_ttl_sec,
+            quota_budget=self.youtube_quota_budget,
+        )
+
+    @cached_property
+    def music_service(self) -> MusicService:
+        settings = self.settings
+        return MusicService(
+            youtube_service=self.youtube_service,
+            youtube_lookup_top_k=settings.youtube_lookup_top_k,
+            search_cache_ttl_sec=settings.itunes_cache_ttl_sec,
+            search_cache_max_size=settings.itunes_cache_max_size,
+            quota_budget=self.youtube_quota_budget,
+            enrichment_deadline_ms=settings.search_enrichment_deadline_ms,
+            suggest_index=self.track_index,
+            render_index=self.render_index,
+            render_cached_boost=settings.search_render_cached_boost,
+            artwork_prefetcher=self.artwork_prefetcher,
+            artwork_prefetch_top_n=settings.artwork_prefetch_top_n,
+        )
+
+    @cached_property
+    def comfy_service(self) -> ComfyService:
+        return ComfyService(settings=self.settings)
+
+    @cached_property
+    def job_store(self) -> Optional[SQLiteJobStore]:
+        return SQLiteJobStore(self.settings.queue_db_path) if self.settings.queue_backend == "sqlite" else None
+
+    @cached_property
+    def queue_service(self) -> RenderQueueService:
+        return RenderQueueService(
+            settings=self.settings,
+            storage=self.storage,
+            comfy_service=self.comfy_service,
+            track_index=self.track_index,
+            render_index=self.render_index,
+            artwork_prefetcher=self.artwork_prefetcher,
+            job_store=self.job_store,
+        )
+
+    @cached_property
+    def rate_limiter(self) -> RateLimiter:
+        settings = self.settings
+        rules = {
+            "search": RateLimitRule(settings.rate_limit_search_burst, settings.rate_limit_search_per_min / 60),
+            "render": RateLimitRule(settings.rate_limit_render_burst, settings.rate_limit_render_per_min / 60),
+        }
+        if settings.rate_limit_backend == "sqlite":
+            return RateLimiter(rules, SQLiteBucketStore(settings.rate_limit_db_path))
+        return RateLimiter(rules, MemoryBucketStore())
+
+    async def startup(self) -> None:
+        logger.info("starting queue worker")
+        self.queue_service.start()
+        self.loop_lag_monitor.start()
+
+    async def shutdown(self) -> None:
+        logger.info("stopping queue worker")
+        await self.loop_lag_monitor.stop()
+        # Only tear down what this instance actually built.
+        if self.is_built("queue_service"):
+            await self.queue_service.stop()
+        if self.is_built("artwork_prefetcher"):
+            await self.artwork_prefetcher.close()
+        if self.is_built("youtube_service"):
+            self.youtube_service.close()
+        if self.is_built("youtube_quota_budget"):
+            self.youtube_quota_budget.close()
+        if self.is_built("job_store") and self.job_store is not None:
+            self.job_store.close()
+        if self.is_built("track_index"):
+            await self.track_index.close()
+        if self.is_built("rate_limiter"):
+            self.rate_limiter.close()
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    settings = settings or get_settings()
+    state = AppState(settings)
+
+    @asynccontextmanager
+    async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+        await state.startup()
+        try:
+            yield
+        finally:
+            await state.shutdown()
+
+    app = FastAPI(title="Music Search + Live2D Render API", version="0.1.0", lifespan=lifespan)
+    app.state.services = state
+
+    # Added before CORS so that 429 responses still carry the CORS headers.
+    app.add_middleware(
+        RateLimitMiddleware,
+        routes={
+            ("GET", f"{settings.api_prefix}/music/search"): "search",
+            ("GET", f"{settings.api_prefix}/music/search/stream"): "search",
+            ("POST", f"{settings.api_prefix}/renders"): "render",
+        },
+        limiter=lambda: state.rate_limiter,
+        api_keys=settings.rate_limit_api_keys,
+        trust_forwarded=settings.rate_limit_trust_forwarded,
+    )
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["ETag", "X-Trace-Id", "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "Retry-After"],
+    )
+    app.add_middleware(TracingMiddleware)
+
+    # Storage creates data_dir on first use, so the mount must not check for it up front.
+    app.mount("/static", StaticFiles(directory=str(settings.data_dir), check_dir=False), name="static")
+
+    app.include_router(music_router, prefix=settings.api_prefix)
+    app.include_router(renders_router, prefix=settings.api_prefix)
+
+    @app.get("/")
+    async def health() -> dict[str, str]:
+        return {"status": "ok"}
+
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    async def metrics() -> PlainTextResponse:
+        # Collecting runs gauge callbacks such as the shared queue depth, which reads SQLite.
+        return PlainTextResponse(await asyncio.to_thread(REGISTRY.render), media_type="text/plain; version=0.0.4")
+
+    return app
+
+
+# Tracing and the metrics registry are process-wide, so they are bound to this module-level app only; other
+# create_app() instances (tests, embedding) share them without reconfiguring, rebinding or closing them.
+_settings = get_settings()
+configure_tracing(_settings.trace_sample_rate, _settings.trace_exporter, _settings.trace_file_path)
+atexit.register(TRACER.close)
+app = create_app(_settings)
+app_state: AppState = app.state.services
+RENDER_QUEUE_DEPTH.set_function(lambda: app_state.queue_service.queue_depth() if app_state.is_built("queue_service") else 0)
+
+
+def __getattr__(name: str) -> Any:
+    # Keeps `from app.main import queue_service` working without building services at import time.
+    if name in {
+        "storage",
+        "youtube_service",
+        "music_service",
+        "comfy_service",
+        "queue_service",
+        "track_index",
+        "render_index",
+        "artwork_prefetcher",
+        "job_store",
+    }:
+        return getattr(app_state, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Optional, Protocol
+
+from .metrics import REGISTRY
+
+
+RATE_LIMIT_REJECTIONS_TOTAL = REGISTRY.counter(
+    "rate_limit_rejections_total", "Requests rejected by the per-client rate limiter.", ("bucket",)
+)
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    capacity: int
+    refill_per_sec: float
+
+    @property
+    def window_sec(self) -> int:
+        return max(1, math.ceil(self.capacity / self.refill_per_sec))
+
+
+@dataclass(frozen=True)
+class RateLimitDecision:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_sec: int
+    retry_after_sec: int
+    policy: str
+
+    def headers(self) -> list[tuple[bytes, bytes]]:
+        headers = [
+            (b"ratelimit-limit", str(self.limit).encode()),
+            (b"ratelimit-remaining", str(self.remaining).encode()),
+            (b"ratelimit-reset", str(self.reset_sec).encode()),
+            (b"ratelimit-policy", self.policy.encode()),
+        ]
+        if not self.allowed:
+            headers.append((b"retry-after", str(self.retry_after_sec).encode()))
+        return headers
+
+
+def refill(tokens: float, updated_ts: float, now: float, rule: RateLimitRule) -> float:
+    return min(float(rule.capacity), tokens + max(0.0, now - updated_ts) * rule.refill_per_sec)
+
+
+class BucketStore(Protocol):
+    def take(self, key: str, rule: RateLimitRule, cost: float) -> tuple[bool, float]: ...
+
+    def close(self) -> None: ...
+
+
+class MemoryBucketStore:
+    def __init__(self, max_keys: int = 10_000, clock: Callable[[], float] = time.time) -> None:
+        self.max_keys = max(1, max_keys)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def take(self, key: str, rule: RateLimitRule, cost: float) -> tuple[bool, float]:
+        now = self._clock()
+        with self._lock:
+            entry = self.buckets.get(key)
+            tokens = refill(entry[0], entry[1], now, rule) if entry else float(rule.capacity)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self.buckets[key] = (tokens, now)
+            self.buckets.move_to_end(key)
+            # The least recently seen clients have refilled the most, so they are the cheapest to forget.
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return allowed, tokens
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteBucketStore:
+    PRUNE_EVERY_WRITES = 500
+
+    def __init__(self, path: Path, idle_sec: float = 3_600, clock: Callable[[], float] = time.time) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.idle_sec = max(1.0, idle_sec)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(str(path), timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_ts REAL NOT NULL
+            )
+            """
+        )
+
+    def take(self, key: str, rule: RateLimitRule, cost: float) -> tuple[bool, float]:
+        now = self._clock()
+        with self._lock:
+            # BEGIN IMMEDIATE serialises the read-modify-write across API processes sharing the file.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT tokens, updated_ts FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+                tokens = refill(float(row[0]), float(row[1]), now, rule) if row else float(rule.capacity)
+                allowed = tokens >= cost
+                if allowed:
+                    tokens -= cost
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated_ts) VALUES (?, ?, ?)",
+                    (key, tokens, now),
+                )
+                self._writes += 1
+                if self._writes % self.PRUNE_EVERY_WRITES == 0:
+                    self._conn.execute("DELETE FROM rate_limit_buckets WHERE updated_ts < ?", (now - self.idle_sec,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return allowed, tokens
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class RateLimiter:
+    def __init__(self, rules: dict[str, RateLimitRule], store: BucketStore) -> None:
+        # A bucket with no rule (or a zero rate) is unlimited.
+        self.rules = {name: rule for name, rule in rules.items() if rule.capacity > 0 and rule.refill_per_sec > 0}
+        self.store = store
+
+    def check(self, bucket: str, client: str, cost: float = 1.0) -> Optional[RateLimitDecision]:
+        rule = self.rules.get(bucket)
+        if rule is None:
+            return None
+        allowed, tokens = self.store.take(f"{bucket}:{client}", rule, cost)
+        if not allowed:
+            RATE_LIMIT_REJECTIONS_TOTAL.inc(bucket=bucket)
+        return RateLimitDecision(
+            allowed=allowed,
+            limit=rule.capacity,
+            remaining=max(0, int(tokens)),
+            reset_sec=math.ceil((rule.capacity - tokens) / rule.refill_per_sec),
+            retry_after_sec=0 if allowed else max(1, math.ceil((cost - tokens) / rule.refill_per_sec)),
+            policy=f"{rule.capacity};w={rule.window_sec}",
+        )
+
+    async def check_async(self, bucket: str, client: str, cost: float = 1.0) -> Optional[RateLimitDecision]:
+        # The SQLite store can wait out another process's write lock, so it is never consulted on the event loop.
+        if bucket in self.rules and isinstance(self.store, SQLiteBucketStore):
+            return await asyncio.to_thread(self.check, bucket, client, cost)
+        return self.check(bucket, client, cost)
+
+    def close(self) -> None:
+        self.store.close()
+
+
+def client_identity(
+    scope: dict[str, Any],
+    api_keys: frozenset[str] = frozenset(),
+    trust_forwarded: bool = False,
+) -> str:
+    headers = dict(scope.get("headers") or [])
+    # Only configured keys get their own bucket; otherwise rotating made-up keys would dodge the limit.
+    api_key = headers.get(b"x-api-key", b"").decode("latin-1").strip()
+    if api_key and api_key in api_keys:
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    if trust_forwarded:
+        forwarded = headers.get(b"x-forwarded-for", b"").decode("latin-1")
+        # The proxy appends the address it saw, so the last entry is the only one a client cannot forge.
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        if hops:
+            return "ip:" + hops[-1]
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+class RateLimitMiddleware:
+    def __init__(
+        self,
+        app: Any,
+        routes: dict[tuple[str, str], str],
+        limiter: Callable[[], RateLimiter],
+        api_keys: frozenset[str] = frozenset(),
+        trust_forwarded: bool = False,
+    ) -> None:
+        self.app = app
+        self.routes = routes
+        # Resolved per request so the limiter (and its store) is only built once a limited route is hit.
+        self.limiter = limiter
+        self.api_keys = api_keys
+        self.trust_forwarded = trust_forwarded
+
+    async def __call__(self, scope: dict[str, Any], receive: Any, send: Any) -> None:
+        bucket = self.routes.get((scope.get("method", ""), scope.get("path", ""))) if scope["type"] == "http" else None
+        if bucket is None:
+            await self.app(scope, receive, send)
+            return
+
+        client = client_identity(scope, self.api_keys, self.trust_forwarded)
+        decision = await self.limiter().check_async(bucket, client)
+        if decision is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not decision.allowed:
+            body = json.dumps({"detail": "rate limit exceeded", "bucket": bucket}).encode("utf-8")
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 429,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                        *decision.headers(),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message: dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), *decision.headers()]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
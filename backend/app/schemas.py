@@ -17,6 +17,8 @@ class TrackItem(BaseModel):
     album_art_url: str
     youtube_video_id: Optional[str] = None
     youtube_embed_url: Optional[str] = None
+    render_cached: bool = False
+    video_url: Optional[str] = None
     score: float
 
 
@@ -24,6 +26,44 @@ class MusicSearchResponse(BaseModel):
     items: list[TrackItem]
 
 
+class SuggestItem(BaseModel):
+    track_id: str
+    album_id: Optional[str] = None
+    title: str
+    artist: str
+    album_art_url: Optional[str] = None
+    youtube_video_id: Optional[str] = None
+    youtube_embed_url: Optional[str] = None
+    popularity: int = 0
+    render_cached: bool = False
+    video_url: Optional[str] = None
+
+
+class MusicSuggestResponse(BaseModel):
+    source: Literal["local", "itunes"]
+    items: list[SuggestItem]
+
+
+class SearchCacheStatsResponse(BaseModel):
+    hits: int
+    misses: int
+    coalesced: int
+    hit_ratio: float
+    size: int
+    max_size: int
+    inflight: int
+
+
+class YouTubeQuotaResponse(BaseModel):
+    daily_limit: int
+    used_today: int
+    remaining_today: int
+    spendable_units: int
+    reserve_units: int
+    rejected: int
+    resets_at: str
+
+
 class RenderCreateRequest(BaseModel):
     track_id: str
     album_id: Optional[str] = None
@@ -53,6 +93,7 @@ class RenderTrackInfo(BaseModel):
 class RenderResult(BaseModel):
     video_url: Optional[str] = None
     thumbnail_url: Optional[str] = None
+    hls_url: Optional[str] = None
     cache_key: Optional[str] = None
 
 
@@ -68,6 +109,8 @@ class RenderStatusResponse(BaseModel):
     progress: int = Field(ge=0, le=100)
     queue_position: int = Field(ge=0)
     estimated_wait_sec: int = Field(ge=0)
+    version: int = Field(default=0, ge=0)
+    trace_id: Optional[str] = None
     track: RenderTrackInfo
     result: RenderResult
     error: RenderError
@@ -88,3 +131,49 @@ class RenderHistoryResponse(BaseModel):
 
 class RenderHistoryClearResponse(BaseModel):
     deleted_count: int
+
+
+class NodeProfileBucket(BaseModel):
+    le: Optional[float] = None
+    count: int
+
+
+class NodeProfileItem(BaseModel):
+    node_id: str
+    class_type: str
+    executed_count: int
+    cached_count: int
+    total_sec: float
+    mean_sec: float
+    p50_sec: float
+    p95_sec: float
+    max_sec: float
+    histogram: list[NodeProfileBucket]
+
+
+class NodeProfileResponse(BaseModel):
+    render_count: int
+    items: list[NodeProfileItem]
+
+
+class RenderWorkerItem(BaseModel):
+    worker_id: str
+    alive: bool
+    heartbeat_age_sec: float = Field(ge=0)
+    active_job_id: Optional[str] = None
+
+
+class RenderWorkersResponse(BaseModel):
+    queue_backend: str
+    queue_depth: int = Field(ge=0)
+    items: list[RenderWorkerItem]
+
+
+class BackendStatusResponse(BaseModel):
+    base_url: str
+    ready: bool
+    warmed_up: bool
+    resident: bool
+    resident_vram_bytes: int = Field(ge=0)
+    warmup_sec: Optional[float] = None
+    error: Optional[str] = None
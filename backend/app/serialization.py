@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+
+def dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def model_bytes(model: BaseModel) -> bytes:
+    return dumps(model.model_dump(mode="json"))
+
+
+def join_items(items: list[bytes]) -> bytes:
+    return b'{"items":[' + b",".join(items) + b"]}"
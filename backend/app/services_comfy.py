@@ -2,11 +2,15 @@ from __future__ import annotations
 
 import asyncio
 import copy
+import io
 import json
 import logging
+import os
+import shutil
 import subprocess
 import time
 import uuid
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any, Awaitable, Callable, Optional
 from urllib.parse import urlencode, urlparse, urlunparse
@@ -16,14 +20,40 @@ try:
     import websockets
 except ImportError:  # pragma: no cover
     websockets = None
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover
+    Image = None
 
 from .config import Settings
+from .metrics import observe_upstream
+from .services_profiler import NodeCostModel, NodeExecutionProfiler
+from .tracing import TRACER
 
 
 logger = logging.getLogger(__name__)
 
 PhaseCallback = Callable[[str], Awaitable[None]]
 SamplingProgressCallback = Callable[[float], Awaitable[None]]
+PreviewCallback = Callable[[bytes, str], Awaitable[None]]
+
+# ComfyUI binary websocket frames start with a big-endian event type.
+BINARY_EVENT_PREVIEW_IMAGE = 1
+BINARY_EVENT_PREVIEW_IMAGE_WITH_METADATA = 4
+PREVIEW_IMAGE_TYPES = {1: "image/jpeg", 2: "image/png"}
+
+# Input overrides that keep the warm-up prompt cheap while still loading every model and keeping it loaded.
+WARMUP_INPUT_OVERRIDES: dict[str, dict[str, Any]] = {
+    "217": {"Xi": 1, "Xf": 1},
+    "571": {"Number": "256"},
+    "573": {"max_tokens": 16, "keep_model_loaded": True},
+    "574": {"max_tokens": 16, "keep_model_loaded": True},
+    "341": {"save_output": False, "filename_prefix": "Live2D/_warmup"},
+}
+# "easy cleanGpuUsed" pass-through nodes; they would unload the models the warm-up has just loaded.
+WARMUP_BYPASS_NODES = ("518", "519", "522", "523", "568", "577")
+# Reserved torch VRAM above this is treated as models being resident on the device.
+RESIDENT_VRAM_THRESHOLD_BYTES = 1 << 30
 
 
 class ComfyError(RuntimeError):
@@ -33,10 +63,19 @@ class ComfyError(RuntimeError):
         self.message = message
 
 
+@dataclass
+class RenderOutputs:
+    video_path: Path
+    thumb_path: Path
+    hls_playlist_path: Optional[Path] = None
+    node_timings: list[dict[str, Any]] = field(default_factory=list)
+
+
 class ComfyService:
     def __init__(self, settings: Settings) -> None:
         self.settings = settings
         self._workflow_template = self._load_workflow_template()
+        self.cost_model = NodeCostModel()
 
     def _load_workflow_template(self) -> dict[str, Any]:
         return json.loads(self.settings.comfy_workflow_path.read_text(encoding="utf-8"))
@@ -47,16 +86,76 @@ class ComfyService:
         prompt["341"]["inputs"]["filename_prefix"] = f"Live2D/{cache_key}"
         return prompt
 
+    def build_warmup_prompt(self, image_filename: str) -> dict[str, Any]:
+        prompt = self.build_prompt(image_filename=image_filename, cache_key="_warmup")
+        for node_id, overrides in WARMUP_INPUT_OVERRIDES.items():
+            inputs = prompt.get(node_id, {}).get("inputs")
+            if not isinstance(inputs, dict):
+                continue
+            for key, value in overrides.items():
+                if key in inputs:
+                    inputs[key] = value
+        bypassed = {node_id: prompt.pop(node_id) for node_id in WARMUP_BYPASS_NODES if node_id in prompt}
+        for node in prompt.values():
+            inputs = node.get("inputs")
+            if not isinstance(inputs, dict):
+                continue
+            for key, value in inputs.items():
+                # Rewire anything fed by a bypassed node straight to that node's own input.
+                while isinstance(value, list) and len(value) == 2 and value[0] in bypassed:
+                    value = bypassed[value[0]]["inputs"]["anything"]
+                inputs[key] = value
+        return prompt
+
+    async def get_system_stats(self) -> dict[str, Any]:
+        try:
+            with observe_upstream("comfyui", "system_stats"):
+                async with httpx.AsyncClient(timeout=5) as client:
+                    resp = await client.get(f"{self.settings.comfy_base_url}/system_stats")
+                    resp.raise_for_status()
+                    return resp.json()
+        except Exception as exc:  # noqa: BLE001
+            raise ComfyError("COMFY_HTTP_ERROR", f"failed to read system stats: {exc}") from exc
+
+    @staticmethod
+    def resident_vram_bytes(system_stats: dict[str, Any]) -> int:
+        devices = system_stats.get("devices")
+        if not isinstance(devices, list):
+            return 0
+        reserved = 0
+        for device in devices:
+            if not isinstance(device, dict):
+                continue
+            try:
+                reserved += max(0, int(device.get("torch_vram_total", 0)))
+            except (TypeError, ValueError):
+                continue
+        return reserved
+
+    def is_resident(self, system_stats: dict[str, Any]) -> bool:
+        return self.resident_vram_bytes(system_stats) >= RESIDENT_VRAM_THRESHOLD_BYTES
+
+    async def warm_up(self, image_filename: str) -> float:
+        prompt = self.build_warmup_prompt(image_filename)
+        start = time.monotonic()
+        prompt_id = await self._post_prompt(prompt, client_id=uuid.uuid4().hex)
+        history = await self._wait_for_history(prompt_id, timeout_sec=self.settings.comfy_warmup_timeout_sec)
+        status = history.get("status", {})
+        if isinstance(status, dict) and status.get("status_str") == "error":
+            raise ComfyError("COMFY_EXEC_ERROR", self._summarize_execution_error(status))
+        return round(time.monotonic() - start, 2)
+
     async def _post_prompt(self, prompt: dict[str, Any], client_id: str) -> str:
         payload = {
             "prompt": prompt,
             "client_id": client_id,
         }
         try:
-            async with httpx.AsyncClient(timeout=20) as client:
-                resp = await client.post(f"{self.settings.comfy_base_url}/prompt", json=payload)
-                resp.raise_for_status()
-                data = resp.json()
+            with observe_upstream("comfyui", "post_prompt"):
+                async with httpx.AsyncClient(timeout=20) as client:
+                    resp = await client.post(f"{self.settings.comfy_base_url}/prompt", json=payload)
+                    resp.raise_for_status()
+                    data = resp.json()
             node_errors = data.get("node_errors")
             if isinstance(node_errors, dict) and node_errors:
                 details = self._summarize_node_errors(node_errors)
@@ -67,6 +166,17 @@ class ComfyService:
                 raise
             raise ComfyError("COMFY_HTTP_ERROR", f"failed to queue prompt: {exc}") from exc
 
+    async def cancel_prompt(self, prompt_id: str) -> None:
+        try:
+            with observe_upstream("comfyui", "interrupt"):
+                async with httpx.AsyncClient(timeout=5) as client:
+                    # Drop it if still pending, and interrupt it only if it is the one executing.
+                    await client.post(f"{self.settings.comfy_base_url}/queue", json={"delete": [prompt_id]})
+                    resp = await client.post(f"{self.settings.comfy_base_url}/interrupt", json={"prompt_id": prompt_id})
+                    resp.raise_for_status()
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("failed to cancel comfy prompt %s: %s", prompt_id, exc)
+
     def _build_ws_url(self, client_id: str) -> str:
         parsed = urlparse(self.settings.comfy_base_url)
         scheme = "wss" if parsed.scheme == "https" else "ws"
@@ -92,23 +202,30 @@ class ComfyService:
         text = str(value).strip()
         return text or None
 
+    def expected_render_sec(self) -> float:
+        return self.cost_model.expected_total_sec(self._workflow_template)
+
     def _compute_execution_ratio(
         self,
-        total_nodes: int,
+        node_weights: dict[str, float],
         done_nodes: set[str],
         running_node_ratios: dict[str, float],
     ) -> float:
-        total = max(1, total_nodes)
-        done_count = min(total, len(done_nodes))
-        remaining = max(0, total - done_count)
+        total = sum(node_weights.values())
+        if total <= 0:
+            return 0.0
+
+        done_cost = 0.0
+        for node_id in done_nodes:
+            done_cost += node_weights.get(node_id, 0.0)
 
         running_partial = 0.0
         for node_id, ratio in running_node_ratios.items():
             if node_id in done_nodes:
                 continue
-            running_partial += self._clamp_ratio(ratio)
-        running_partial = min(float(remaining), running_partial)
-        return self._clamp_ratio((done_count + running_partial) / float(total))
+            running_partial += node_weights.get(node_id, 0.0) * self._clamp_ratio(ratio)
+        running_partial = min(max(0.0, total - done_cost), running_partial)
+        return self._clamp_ratio((done_cost + running_partial) / total)
 
     def _mark_done_nodes(self, payload: dict[str, Any], done_nodes: set[str], running_node_ratios: dict[str, float]) -> None:
         nodes = payload.get("nodes")
@@ -162,12 +279,53 @@ class ComfyService:
                 continue
             running_node_ratios[node_id] = self._clamp_ratio(current_value / max_value)
 
+    @staticmethod
+    def _decode_preview_frame(raw: bytes) -> Optional[tuple[bytes, str]]:
+        if len(raw) < 8:
+            return None
+        event_type = int.from_bytes(raw[:4], "big")
+        if event_type == BINARY_EVENT_PREVIEW_IMAGE:
+            image_type = int.from_bytes(raw[4:8], "big")
+            media_type = PREVIEW_IMAGE_TYPES.get(image_type)
+            if not media_type:
+                return None
+            return raw[8:], media_type
+        if event_type == BINARY_EVENT_PREVIEW_IMAGE_WITH_METADATA:
+            metadata_len = int.from_bytes(raw[4:8], "big")
+            try:
+                metadata = json.loads(raw[8 : 8 + metadata_len])
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                return None
+            media_type = str(metadata.get("image_type", "")) if isinstance(metadata, dict) else ""
+            if media_type not in PREVIEW_IMAGE_TYPES.values():
+                return None
+            return raw[8 + metadata_len :], media_type
+        return None
+
+    def _downscale_preview(self, image_bytes: bytes, media_type: str) -> tuple[bytes, str]:
+        max_size = self.settings.preview_max_size
+        if Image is None or max_size <= 0:
+            return image_bytes, media_type
+        try:
+            with Image.open(io.BytesIO(image_bytes)) as image:
+                if max(image.size) <= max_size:
+                    return image_bytes, media_type
+                image.thumbnail((max_size, max_size))
+                buffer = io.BytesIO()
+                image.convert("RGB").save(buffer, format="JPEG", quality=80)
+            return buffer.getvalue(), "image/jpeg"
+        except Exception as exc:  # noqa: BLE001
+            logger.debug("failed to downscale preview: %s", exc)
+            return image_bytes, media_type
+
     async def _stream_sampling_progress(
         self,
         client_id: str,
         prompt_id_ref: dict[str, Optional[str]],
-        total_nodes: int,
-        sampling_progress_callback: SamplingProgressCallback,
+        node_weights: dict[str, float],
+        sampling_progress_callback: Optional[SamplingProgressCallback] = None,
+        preview_callback: Optional[PreviewCallback] = None,
+        profiler: Optional[NodeExecutionProfiler] = None,
     ) -> None:
         if websockets is None:
             return
@@ -176,89 +334,100 @@ class ComfyService:
         done_nodes: set[str] = set()
         running_node_ratios: dict[str, float] = {}
         last_ratio = 0.0
-        try:
-            async with websockets.connect(
-                ws_url,
-                open_timeout=15,
-                close_timeout=3,
-                ping_interval=20,
-                ping_timeout=20,
-            ) as ws:
-                while True:
-                    raw = await ws.recv()
-                    if not isinstance(raw, str):
-                        continue
-
-                    try:
-                        message = json.loads(raw)
-                    except json.JSONDecodeError:
-                        continue
-
-                    message_type = str(message.get("type", ""))
-                    payload = message.get("data")
-                    if not isinstance(payload, dict):
-                        continue
-
-                    target_prompt_id = prompt_id_ref.get("value")
-                    payload_prompt_id = payload.get("prompt_id")
-                    if payload_prompt_id is not None:
-                        payload_prompt_id = str(payload_prompt_id)
-
-                    if not target_prompt_id:
-                        continue
-                    if target_prompt_id and payload_prompt_id and payload_prompt_id != target_prompt_id:
-                        continue
-
-                    should_emit = False
-                    if message_type == "execution_cached":
-                        self._mark_done_nodes(payload, done_nodes, running_node_ratios)
-                        should_emit = True
-                    elif message_type == "executed":
-                        node_id = self._normalize_node_id(payload.get("node"))
-                        if node_id:
-                            done_nodes.add(node_id)
-                            running_node_ratios.pop(node_id, None)
+        with TRACER.span("comfyui.websocket", upstream="comfyui") as span:
+            try:
+                async with websockets.connect(
+                    ws_url,
+                    open_timeout=15,
+                    close_timeout=3,
+                    ping_interval=20,
+                    ping_timeout=20,
+                ) as ws:
+                    while True:
+                        raw = await ws.recv()
+                        if not isinstance(raw, str):
+                            if preview_callback is None or not prompt_id_ref.get("value"):
+                                continue
+                            preview = self._decode_preview_frame(raw)
+                            if preview:
+                                await preview_callback(*await asyncio.to_thread(self._downscale_preview, *preview))
+                            continue
+
+                        try:
+                            message = json.loads(raw)
+                        except json.JSONDecodeError:
+                            continue
+
+                        message_type = str(message.get("type", ""))
+                        payload = message.get("data")
+                        if not isinstance(payload, dict):
+                            continue
+
+                        target_prompt_id = prompt_id_ref.get("value")
+                        payload_prompt_id = payload.get("prompt_id")
+                        if payload_prompt_id is not None:
+                            payload_prompt_id = str(payload_prompt_id)
+
+                        if not target_prompt_id:
+                            continue
+                        if target_prompt_id and payload_prompt_id and payload_prompt_id != target_prompt_id:
+                            continue
+
+                        if profiler:
+                            profiler.observe(message_type, payload)
+
+                        should_emit = False
+                        if message_type == "execution_cached":
+                            self._mark_done_nodes(payload, done_nodes, running_node_ratios)
                             should_emit = True
-                    elif message_type == "progress":
-                        self._update_from_progress_event(payload, done_nodes, running_node_ratios)
-                        should_emit = True
-                    elif message_type == "progress_state":
-                        self._update_from_progress_state(payload, done_nodes, running_node_ratios)
-                        should_emit = True
-
-                    if should_emit:
-                        ratio = self._compute_execution_ratio(total_nodes, done_nodes, running_node_ratios)
-                        if ratio > last_ratio:
-                            last_ratio = ratio
-                            await sampling_progress_callback(ratio)
-
-                    if (
-                        target_prompt_id
-                        and payload_prompt_id == target_prompt_id
-                        and message_type in {"execution_success", "execution_error", "execution_interrupted"}
-                    ):
-                        if last_ratio < 1.0:
-                            await sampling_progress_callback(1.0)
-                        break
-                    if (
-                        target_prompt_id
-                        and payload_prompt_id == target_prompt_id
-                        and message_type == "executing"
-                        and payload.get("node") is None
-                    ):
-                        if last_ratio < 1.0:
-                            await sampling_progress_callback(1.0)
-                        break
-        except asyncio.CancelledError:
-            raise
-        except Exception as exc:  # noqa: BLE001
-            logger.debug("failed to stream Comfy progress: %s", exc)
+                        elif message_type == "executed":
+                            node_id = self._normalize_node_id(payload.get("node"))
+                            if node_id:
+                                done_nodes.add(node_id)
+                                running_node_ratios.pop(node_id, None)
+                                should_emit = True
+                        elif message_type == "progress":
+                            self._update_from_progress_event(payload, done_nodes, running_node_ratios)
+                            should_emit = True
+                        elif message_type == "progress_state":
+                            self._update_from_progress_state(payload, done_nodes, running_node_ratios)
+                            should_emit = True
+
+                        if should_emit and sampling_progress_callback:
+                            ratio = self._compute_execution_ratio(node_weights, done_nodes, running_node_ratios)
+                            if ratio > last_ratio:
+                                last_ratio = ratio
+                                await sampling_progress_callback(ratio)
+
+                        if (
+                            target_prompt_id
+                            and payload_prompt_id == target_prompt_id
+                            and message_type in {"execution_success", "execution_error", "execution_interrupted"}
+                        ):
+                            if sampling_progress_callback and last_ratio < 1.0:
+                                await sampling_progress_callback(1.0)
+                            break
+                        if (
+                            target_prompt_id
+                            and payload_prompt_id == target_prompt_id
+                            and message_type == "executing"
+                            and payload.get("node") is None
+                        ):
+                            if sampling_progress_callback and last_ratio < 1.0:
+                                await sampling_progress_callback(1.0)
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # noqa: BLE001
+                logger.debug("failed to stream Comfy progress: %s", exc)
+                span.set(error=str(exc)[:200])
 
     async def _get_history(self, prompt_id: str) -> Optional[dict[str, Any]]:
-        async with httpx.AsyncClient(timeout=20) as client:
-            resp = await client.get(f"{self.settings.comfy_base_url}/history/{prompt_id}")
-            resp.raise_for_status()
-            data = resp.json()
+        with observe_upstream("comfyui", "history"):
+            async with httpx.AsyncClient(timeout=20) as client:
+                resp = await client.get(f"{self.settings.comfy_base_url}/history/{prompt_id}")
+                resp.raise_for_status()
+                data = resp.json()
         return data.get(prompt_id)
 
     async def _wait_for_history(self, prompt_id: str, timeout_sec: int) -> dict[str, Any]:
@@ -267,6 +436,9 @@ class ComfyService:
             history = await self._get_history(prompt_id)
             if history and history.get("outputs"):
                 return history
+            status = history.get("status") if history else None
+            if isinstance(status, dict) and status.get("status_str") == "error":
+                return history
             if time.monotonic() - start > timeout_sec:
                 raise ComfyError("COMFY_TIMEOUT", f"prompt timed out in {timeout_sec}s")
             await asyncio.sleep(2)
@@ -354,50 +526,99 @@ class ComfyService:
         url = f"{self.settings.comfy_base_url}/view?{query}"
 
         try:
-            async with httpx.AsyncClient(timeout=90) as client:
-                resp = await client.get(url)
-                resp.raise_for_status()
-                target_path.write_bytes(resp.content)
+            with observe_upstream("comfyui", "download"):
+                async with httpx.AsyncClient(timeout=90) as client:
+                    resp = await client.get(url)
+                    resp.raise_for_status()
+                    target_path.write_bytes(resp.content)
         except Exception as exc:  # noqa: BLE001
             raise ComfyError("DOWNLOAD_FAILED", f"failed to download output: {exc}") from exc
 
-    def _ensure_mp4(self, downloaded_path: Path, final_video_path: Path) -> None:
-        if downloaded_path.suffix.lower() == ".mp4":
-            if downloaded_path.resolve() == final_video_path.resolve():
-                return
-            downloaded_path.replace(final_video_path)
-            return
-
-        cmd = [
-            "ffmpeg",
-            "-y",
-            "-i",
-            str(downloaded_path),
-            "-c:v",
-            "libx264",
-            "-pix_fmt",
-            "yuv420p",
-            str(final_video_path),
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            raise ComfyError("DOWNLOAD_FAILED", f"ffmpeg convert failed: {result.stderr[-300:]}")
+    @staticmethod
+    def _build_finalize_command(
+        source_path: Path,
+        final_video_path: Path,
+        thumb_path: Path,
+        hls_dir: Optional[Path] = None,
+    ) -> list[str]:
+        if source_path.suffix.lower() == ".mp4":
+            video_codec = ["-c:v", "copy"]
+        else:
+            video_codec = ["-c:v", "libx264", "-pix_fmt", "yuv420p"]
+
+        if hls_dir is None:
+            video_output = ["-movflags", "+faststart", str(final_video_path)]
+        else:
+            # One encode fanned out by the tee muxer: the HLS segments are a copy
+            # of the mp4 stream. Slave paths are relative to the render dir (the
+            # command's cwd) so they never need tee escaping.
+            hls_rel = Path(os.path.relpath(hls_dir, final_video_path.parent)).as_posix()
+            tee_spec = "|".join(
+                [
+                    f"[f=mp4:movflags=+faststart]{final_video_path.name}",
+                    f"[f=hls:hls_time=2:hls_playlist_type=vod:hls_segment_filename={hls_rel}/segment_%03d.ts]"
+                    f"{hls_rel}/index.m3u8",
+                ]
+            )
+            video_output = ["-f", "tee", tee_spec]
+            if video_codec[1] != "copy":
+                video_output = ["-flags", "+global_header", *video_output]
 
-    def make_thumbnail(self, video_path: Path, thumb_path: Path) -> None:
-        cmd = [
+        return [
             "ffmpeg",
             "-y",
             "-i",
-            str(video_path),
+            str(source_path),
+            "-map",
+            "0:v:0",
+            *video_codec,
+            *video_output,
+            "-map",
+            "0:v:0",
             "-vf",
             "thumbnail,scale=640:-1",
             "-frames:v",
             "1",
             str(thumb_path),
         ]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            raise ComfyError("DOWNLOAD_FAILED", f"thumbnail generation failed: {result.stderr[-300:]}")
+
+    def finalize_outputs(self, downloaded_path: Path, render_dir: Path) -> RenderOutputs:
+        final_video_path = render_dir / "video.mp4"
+        thumb_path = render_dir / "thumb.jpg"
+        source_path = downloaded_path
+        if source_path.resolve() == final_video_path.resolve():
+            source_path = downloaded_path.replace(render_dir / f"source{downloaded_path.suffix}")
+
+        hls_dir: Optional[Path] = None
+        if self.settings.render_hls_enabled:
+            hls_dir = render_dir / "hls"
+            shutil.rmtree(hls_dir, ignore_errors=True)
+            hls_dir.mkdir(parents=True, exist_ok=True)
+
+        cmd = self._build_finalize_command(source_path, final_video_path, thumb_path, hls_dir=hls_dir)
+        succeeded = False
+        try:
+            with TRACER.span("ffmpeg.finalize", hls=hls_dir is not None) as span:
+                result = subprocess.run(cmd, capture_output=True, text=True, cwd=render_dir)
+                span.set(returncode=result.returncode)
+            if result.returncode != 0:
+                raise ComfyError("DOWNLOAD_FAILED", f"ffmpeg finalize failed: {result.stderr[-300:]}")
+            succeeded = True
+        finally:
+            source_path.unlink(missing_ok=True)
+            if not succeeded:
+                # Partial outputs must not be mistaken for a finished render on retry.
+                final_video_path.unlink(missing_ok=True)
+                thumb_path.unlink(missing_ok=True)
+                if hls_dir is not None:
+                    shutil.rmtree(hls_dir, ignore_errors=True)
+
+        source_path.unlink(missing_ok=True)
+        return RenderOutputs(
+            video_path=final_video_path,
+            thumb_path=thumb_path,
+            hls_playlist_path=(hls_dir / "index.m3u8") if hls_dir is not None else None,
+        )
 
     async def render(
         self,
@@ -406,23 +627,25 @@ class ComfyService:
         render_dir: Path,
         phase_callback: Optional[PhaseCallback] = None,
         sampling_progress_callback: Optional[SamplingProgressCallback] = None,
-    ) -> tuple[Path, Path]:
+        preview_callback: Optional[PreviewCallback] = None,
+    ) -> RenderOutputs:
         if phase_callback:
             await phase_callback("prompting")
         prompt = self.build_prompt(image_filename=image_filename, cache_key=cache_key)
-        total_nodes = max(1, len(prompt))
+        node_weights = self.cost_model.weights(prompt)
         client_id = uuid.uuid4().hex
         prompt_id_ref: dict[str, Optional[str]] = {"value": None}
-        sampling_task: Optional[asyncio.Task[None]] = None
-        if sampling_progress_callback:
-            sampling_task = asyncio.create_task(
-                self._stream_sampling_progress(
-                    client_id=client_id,
-                    prompt_id_ref=prompt_id_ref,
-                    total_nodes=total_nodes,
-                    sampling_progress_callback=sampling_progress_callback,
-                )
+        profiler = NodeExecutionProfiler(prompt)
+        sampling_task = asyncio.create_task(
+            self._stream_sampling_progress(
+                client_id=client_id,
+                prompt_id_ref=prompt_id_ref,
+                node_weights=node_weights,
+                sampling_progress_callback=sampling_progress_callback,
+                preview_callback=preview_callback,
+                profiler=profiler,
             )
+        )
 
         try:
             prompt_id = await self._post_prompt(prompt, client_id=client_id)
@@ -431,13 +654,18 @@ class ComfyService:
             if phase_callback:
                 await phase_callback("sampling")
             history = await self._wait_for_history(prompt_id, timeout_sec=self.settings.render_timeout_sec)
+        except asyncio.CancelledError:
+            # The job goes back to the queue; without this ComfyUI would keep rendering it for nobody.
+            if prompt_id_ref["value"]:
+                await self.cancel_prompt(prompt_id_ref["value"])
+            raise
         finally:
-            if sampling_task:
-                sampling_task.cancel()
-                try:
-                    await sampling_task
-                except asyncio.CancelledError:
-                    pass
+            sampling_task.cancel()
+            try:
+                await sampling_task
+            except asyncio.CancelledError:
+                pass
+            profiler.finish()
 
         if phase_callback:
             await phase_callback("assembling")
@@ -448,9 +676,7 @@ class ComfyService:
 
         if phase_callback:
             await phase_callback("postprocessing")
-        final_video_path = render_dir / "video.mp4"
-        self._ensure_mp4(downloaded_path, final_video_path)
-        thumb_path = render_dir / "thumb.jpg"
-        self.make_thumbnail(final_video_path, thumb_path)
-
-        return final_video_path, thumb_path
+        outputs = await asyncio.to_thread(self.finalize_outputs, downloaded_path, render_dir)
+        outputs.node_timings = profiler.as_list()
+        self.cost_model.observe(outputs.node_timings)
+        return outputs
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+
+class SQLiteJobStore:
+    def __init__(self, path: Path, clock: Callable[[], float] = time.time) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=10000")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS render_jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                data TEXT NOT NULL,
+                updated_ts REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS render_jobs_updated ON render_jobs (updated_ts)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS render_jobs_status_updated ON render_jobs (status, updated_ts)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS render_queue (
+                job_id TEXT PRIMARY KEY,
+                enqueued_ts REAL NOT NULL,
+                lease_owner TEXT,
+                lease_expires_ts REAL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS render_queue_order ON render_queue (enqueued_ts)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS render_workers (
+                worker_id TEXT PRIMARY KEY,
+                started_ts REAL NOT NULL,
+                heartbeat_ts REAL NOT NULL,
+                active_job_id TEXT
+            )
+            """
+        )
+
+    def save_job(self, data: dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO render_jobs (job_id, status, data, updated_ts) VALUES (?, ?, ?, ?)",
+                (data["job_id"], data["status"], json.dumps(data, ensure_ascii=True), self._clock()),
+            )
+
+    def load_job(self, job_id: str) -> Optional[dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM render_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load_jobs(self, updated_since: float = 0.0) -> list[dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM render_jobs WHERE updated_ts >= ? ORDER BY updated_ts",
+                (updated_since,),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def load_jobs_by_status(self, statuses: tuple[str, ...], limit: Optional[int] = None) -> list[dict[str, Any]]:
+        # Most recently written first; served from render_jobs_status_updated without decoding the other rows.
+        placeholders = ", ".join("?" for _ in statuses)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT data FROM render_jobs WHERE status IN ({placeholders}) ORDER BY updated_ts DESC LIMIT ?",
+                (*statuses, -1 if limit is None else limit),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def delete_job(self, job_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM render_jobs WHERE job_id = ?", (job_id,))
+
+    def enqueue(self, job_id: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO render_queue (job_id, enqueued_ts) VALUES (?, ?)",
+                (job_id, self._clock()),
+            )
+
+    def claim(self, worker_id: str, lease_sec: float) -> Optional[tuple[str, int]]:
+        now = self._clock()
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front, so two processes can never claim the same row.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    """
+                    SELECT job_id, attempts FROM render_queue
+                    WHERE lease_owner IS NULL OR lease_expires_ts < ?
+                    ORDER BY enqueued_ts
+                    LIMIT 1
+                    """,
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                job_id, attempts = row[0], int(row[1]) + 1
+                self._conn.execute(
+                    "UPDATE render_queue SET lease_owner = ?, lease_expires_ts = ?, attempts = ? WHERE job_id = ?",
+                    (worker_id, now + lease_sec, attempts, job_id),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return job_id, attempts
+
+    def renew(self, job_id: str, worker_id: str, lease_sec: float) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE render_queue SET lease_expires_ts = ? WHERE job_id = ? AND lease_owner = ?",
+                (self._clock() + lease_sec, job_id, worker_id),
+            )
+        return cursor.rowcount == 1
+
+    def ack(self, job_id: str, worker_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM render_queue WHERE job_id = ? AND lease_owner = ?", (job_id, worker_id))
+
+    def release(self, job_id: str, worker_id: str) -> None:
+        # A graceful hand-back is not a failed attempt; only expired leases count towards QUEUE_MAX_ATTEMPTS.
+        with self._lock:
+            self._conn.execute(
+                """
+                UPDATE render_queue SET lease_owner = NULL, lease_expires_ts = NULL, attempts = MAX(0, attempts - 1)
+                WHERE job_id = ? AND lease_owner = ?
+                """,
+                (job_id, worker_id),
+            )
+
+    def heartbeat(self, worker_id: str, active_job_id: Optional[str]) -> None:
+        now = self._clock()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO render_workers (worker_id, started_ts, heartbeat_ts, active_job_id) VALUES (?, ?, ?, ?)
+                ON CONFLICT(worker_id) DO UPDATE SET heartbeat_ts = excluded.heartbeat_ts, active_job_id = excluded.active_job_id
+                """,
+                (worker_id, now, now, active_job_id),
+            )
+
+    def remove_worker(self, worker_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM render_workers WHERE worker_id = ?", (worker_id,))
+
+    def list_workers(self, stale_after_sec: float, retention_sec: float = 3_600) -> list[dict[str, Any]]:
+        now = self._clock()
+        with self._lock:
+            self._conn.execute("DELETE FROM render_workers WHERE heartbeat_ts < ?", (now - retention_sec,))
+            rows = self._conn.execute(
+                "SELECT worker_id, started_ts, heartbeat_ts, active_job_id FROM render_workers ORDER BY started_ts"
+            ).fetchall()
+        return [
+            {
+                "worker_id": worker_id,
+                "started_ts": started_ts,
+                "heartbeat_ts": heartbeat_ts,
+                "heartbeat_age_sec": round(max(0.0, now - heartbeat_ts), 3),
+                "alive": (now - heartbeat_ts) <= stale_after_sec,
+                "active_job_id": active_job_id,
+            }
+            for worker_id, started_ts, heartbeat_ts, active_job_id in rows
+        ]
+
+    def waiting_job_ids(self) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id FROM render_queue WHERE lease_owner IS NULL OR lease_expires_ts < ? ORDER BY enqueued_ts",
+                (self._clock(),),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM render_queue WHERE lease_owner IS NULL OR lease_expires_ts < ?",
+                (self._clock(),),
+            ).fetchone()
+        return int(row[0])
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
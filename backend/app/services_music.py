@@ -2,12 +2,23 @@ from __future__ import annotations
 
 import asyncio
 import math
-from typing import Any
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import Any, AsyncIterator, Optional
 
 import httpx
 
+from .metrics import observe_upstream
 from .schemas import TrackItem
+from .services_prefetch import ArtworkPrefetcher
+from .services_quota import YouTubeQuotaBudget
+from .services_render_index import RenderCacheIndex
+from .services_suggest import TrackSuggestIndex
 from .services_youtube import YouTubeService
+from .singleflight import SingleFlight
 
 
 def compute_track_score(rank_index: int, view_count: int) -> float:
@@ -16,33 +27,190 @@ def compute_track_score(rank_index: int, view_count: int) -> float:
     return round((rank_component * 0.7) + (youtube_component * 0.3), 6)
 
 
+# Only re-issue and credit markers: words like "version", "live" or "acoustic" name a different recording.
+_VERSION_WORDS = (
+    r"feat\.?|ft\.?|featuring|remaster(?:ed)?|deluxe(?: edition)?|expanded edition|anniversary edition|bonus track"
+)
+_BRACKETED_VERSION_RE = re.compile(rf"[\(\[][^\)\]]*\b(?:{_VERSION_WORDS})\b[^\)\]]*[\)\]]")
+_DASH_VERSION_RE = re.compile(rf"\s+-\s+[^-]*\b(?:{_VERSION_WORDS})\b.*$")
+_FEATURING_RE = re.compile(r"\s+(?:feat\.?|ft\.?|featuring)\s+.*$")
+TRACK_DEDUP_ARTIST_SIMILARITY = 0.8
+# Time left before a streaming search's deadline for the batched videos.list call.
+STREAM_STATS_RESERVE_SEC = 0.5
+
+
+def _fold(value: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def _squash(value: str) -> str:
+    return " ".join("".join(ch if ch.isalnum() else " " for ch in value).split())
+
+
+def normalize_track_title(title: str) -> str:
+    text = _fold(title)
+    text = _BRACKETED_VERSION_RE.sub(" ", text)
+    text = _DASH_VERSION_RE.sub("", text)
+    text = _FEATURING_RE.sub("", text)
+    return _squash(text) or _squash(_fold(title))
+
+
+def normalize_artist(artist: str) -> str:
+    text = _FEATURING_RE.sub("", _fold(artist))
+    return _squash(text) or _squash(_fold(artist))
+
+
+def _similar(left: str, right: str, threshold: float) -> bool:
+    if left == right:
+        return True
+    return SequenceMatcher(None, left, right).ratio() >= threshold
+
+
+def _same_artist(left: str, right: str) -> bool:
+    if _similar(left, right, TRACK_DEDUP_ARTIST_SIMILARITY):
+        return True
+    # "Artist" vs "Artist & Guest" credits for the same recording.
+    left_tokens, right_tokens = set(left.split()), set(right.split())
+    return bool(left_tokens and right_tokens) and (left_tokens <= right_tokens or right_tokens <= left_tokens)
+
+
+def cluster_track_candidates(candidates: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    clusters: list[list[tuple[str, str, dict[str, Any]]]] = []
+    # Titles must match exactly once normalised: fuzzy title matching merged "Lover"/"Lovers" and "Part 1"/"Part 2".
+    clusters_by_title: dict[str, list[list[tuple[str, str, dict[str, Any]]]]] = {}
+    for candidate in candidates:
+        title_key = normalize_track_title(candidate["title"])
+        artist_key = normalize_artist(candidate["artist"])
+        same_title = clusters_by_title.setdefault(title_key, [])
+        for cluster in same_title:
+            if _same_artist(artist_key, cluster[0][1]):
+                cluster.append((title_key, artist_key, candidate))
+                break
+        else:
+            cluster = [(title_key, artist_key, candidate)]
+            same_title.append(cluster)
+            clusters.append(cluster)
+
+    representatives: list[dict[str, Any]] = []
+    for cluster in clusters:
+        # Keep the cluster at its best iTunes rank but prefer the plain (unsuffixed) release as representative.
+        plain = [item for item in cluster if _squash(_fold(item[2]["title"])) == item[0]]
+        chosen = (plain or cluster)[0][2]
+        representative = dict(chosen)
+        representative["duplicate_track_ids"] = [item[2]["track_id"] for item in cluster if item[2] is not chosen]
+        representatives.append(representative)
+    return representatives
+
+
 class MusicService:
     ITUNES_URL = "https://itunes.apple.com/search"
 
-    def __init__(self, youtube_service: YouTubeService, youtube_lookup_top_k: int = 1) -> None:
+    def __init__(
+        self,
+        youtube_service: YouTubeService,
+        youtube_lookup_top_k: int = 1,
+        search_cache_ttl_sec: int = 600,
+        search_cache_max_size: int = 1_000,
+        quota_budget: Optional[YouTubeQuotaBudget] = None,
+        enrichment_deadline_ms: int = 2_500,
+        suggest_index: Optional[TrackSuggestIndex] = None,
+        render_index: Optional[RenderCacheIndex] = None,
+        render_cached_boost: float = 0.0,
+        artwork_prefetcher: Optional[ArtworkPrefetcher] = None,
+        artwork_prefetch_top_n: int = 3,
+    ) -> None:
         self.youtube_service = youtube_service
         self.youtube_lookup_top_k = max(0, min(youtube_lookup_top_k, 10))
+        self.search_cache_ttl_sec = max(0, search_cache_ttl_sec)
+        self.search_cache_max_size = max(0, search_cache_max_size)
+        self.search_cache: OrderedDict[str, tuple[float, list[dict[str, Any]]]] = OrderedDict()
+        self.search_flight: SingleFlight[list[dict[str, Any]]] = SingleFlight()
+        self.search_cache_hits = 0
+        self.search_cache_misses = 0
+        self.quota_budget = quota_budget
+        self.enrichment_deadline_ms = max(0, enrichment_deadline_ms)
+        self.suggest_index = suggest_index
+        self.render_index = render_index
+        self.render_cached_boost = max(0.0, render_cached_boost)
+        self.artwork_prefetcher = artwork_prefetcher
+        self.artwork_prefetch_top_n = max(0, artwork_prefetch_top_n)
+
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def _search_cache_get(self, key: str) -> Optional[list[dict[str, Any]]]:
+        if self.search_cache_ttl_sec <= 0 or self.search_cache_max_size <= 0:
+            return None
+
+        entry = self.search_cache.get(key)
+        if not entry:
+            return None
+
+        created_ts, results = entry
+        if (time.monotonic() - created_ts) > self.search_cache_ttl_sec:
+            self.search_cache.pop(key, None)
+            return None
+
+        self.search_cache.move_to_end(key)
+        return results
+
+    def _search_cache_set(self, key: str, results: list[dict[str, Any]]) -> None:
+        if self.search_cache_ttl_sec <= 0 or self.search_cache_max_size <= 0:
+            return
+
+        self.search_cache[key] = (time.monotonic(), results)
+        self.search_cache.move_to_end(key)
+
+        while len(self.search_cache) > self.search_cache_max_size:
+            self.search_cache.popitem(last=False)
+
+    def search_cache_stats(self) -> dict[str, Any]:
+        lookups = self.search_cache_hits + self.search_cache_misses
+        return {
+            "hits": self.search_cache_hits,
+            "misses": self.search_cache_misses,
+            "coalesced": self.search_flight.coalesced,
+            "hit_ratio": round(self.search_cache_hits / lookups, 4) if lookups else 0.0,
+            "size": len(self.search_cache),
+            "max_size": self.search_cache_max_size,
+            "inflight": self.search_flight.inflight_count,
+        }
 
     async def _itunes_search(self, query: str) -> list[dict[str, Any]]:
-        async with httpx.AsyncClient(timeout=10) as client:
-            resp = await client.get(
-                self.ITUNES_URL,
-                params={
-                    "term": query,
-                    "entity": "song",
-                    "limit": 25,
-                },
-            )
-            resp.raise_for_status()
-            payload = resp.json()
+        with observe_upstream("itunes", "search"):
+            async with httpx.AsyncClient(timeout=10) as client:
+                resp = await client.get(
+                    self.ITUNES_URL,
+                    params={
+                        "term": query,
+                        "entity": "song",
+                        "limit": 25,
+                    },
+                )
+                resp.raise_for_status()
+                payload = resp.json()
         return payload.get("results", [])
 
-    async def search_tracks(self, query: str, limit: int = 3) -> list[TrackItem]:
-        itunes_results = await self._itunes_search(query)
-        if not itunes_results:
-            return []
+    async def _cached_itunes_search(self, query: str) -> list[dict[str, Any]]:
+        key = self._normalize_query(query)
+        cached = self._search_cache_get(key)
+        if cached is not None:
+            self.search_cache_hits += 1
+            return cached
 
-        limit = max(1, min(limit, 10))
+        self.search_cache_misses += 1
+
+        async def fetch() -> list[dict[str, Any]]:
+            results = await self._itunes_search(key)
+            self._search_cache_set(key, results)
+            return results
+
+        return await self.search_flight.do(key, fetch)
+
+    @staticmethod
+    def _extract_candidates(itunes_results: list[dict[str, Any]]) -> list[dict[str, Any]]:
         candidates = []
         seen: set[str] = set()
         for item in itunes_results:
@@ -65,43 +233,158 @@ class MusicService:
                     "album_art_url": artwork,
                 }
             )
+        return cluster_track_candidates(candidates)
 
-        if not candidates:
-            return []
-
+    async def _plan_lookups(self, candidates: list[dict[str, Any]], limit: int) -> tuple[list[dict[str, Any]], int]:
         candidate_window = min(len(candidates), max(limit, self.youtube_lookup_top_k))
         scoped_candidates = candidates[:candidate_window]
         lookup_count = min(self.youtube_lookup_top_k, candidate_window)
+        if self.quota_budget is not None and lookup_count:
+            # Cached lookups are served without touching the API, so only the misses are charged against the budget.
+            is_cached = getattr(self.youtube_service, "is_cached", None)
+            cached = [
+                bool(is_cached and await is_cached(candidate["title"], candidate["artist"]))
+                for candidate in scoped_candidates[:lookup_count]
+            ]
+            affordable = await asyncio.to_thread(self.quota_budget.lookup_depth, cached.count(False))
+            lookup_count = 0
+            for hit in cached:
+                if not hit:
+                    if not affordable:
+                        break
+                    affordable -= 1
+                lookup_count += 1
+        return scoped_candidates, lookup_count
 
-        lookups = [
-            self.youtube_service.lookup_track(candidate["title"], candidate["artist"])
-            for candidate in scoped_candidates[:lookup_count]
-        ]
-        youtube_results = await asyncio.gather(*lookups, return_exceptions=True) if lookups else []
-
-        ranked_items: list[TrackItem] = []
-        for rank, candidate in enumerate(scoped_candidates):
-            youtube_video_id = None
-            youtube_embed_url = None
-            view_count = 0
-            if rank < lookup_count:
-                lookup_result = youtube_results[rank]
-                if not isinstance(lookup_result, Exception):
-                    youtube_video_id, youtube_embed_url, view_count = lookup_result
-
-            score = compute_track_score(rank, view_count)
-            ranked_items.append(
-                TrackItem(
-                    track_id=candidate["track_id"],
-                    album_id=candidate.get("album_id"),
-                    title=candidate["title"],
-                    artist=candidate["artist"],
-                    album_art_url=candidate["album_art_url"],
-                    youtube_video_id=youtube_video_id,
-                    youtube_embed_url=youtube_embed_url,
-                    score=score,
+    def _to_track_item(self, candidate: dict[str, Any], rank: int, lookup_result: Any = None) -> TrackItem:
+        youtube_video_id = None
+        youtube_embed_url = None
+        view_count = 0
+        if lookup_result is not None and not isinstance(lookup_result, BaseException):
+            youtube_video_id, youtube_embed_url, view_count = lookup_result
+
+        video_url = None
+        if self.render_index is not None:
+            video_url = self.render_index.video_url(candidate.get("album_id"), candidate["album_art_url"])
+        score = compute_track_score(rank, view_count)
+        if video_url is not None:
+            score = round(score + self.render_cached_boost, 6)
+
+        return TrackItem(
+            track_id=candidate["track_id"],
+            album_id=candidate.get("album_id"),
+            title=candidate["title"],
+            artist=candidate["artist"],
+            album_art_url=candidate["album_art_url"],
+            youtube_video_id=youtube_video_id,
+            youtube_embed_url=youtube_embed_url,
+            render_cached=video_url is not None,
+            video_url=video_url,
+            score=score,
+        )
+
+    def _prefetch_artwork(self, items: list[TrackItem]) -> None:
+        if self.artwork_prefetcher is None or self.artwork_prefetch_top_n <= 0:
+            return
+        self.artwork_prefetcher.schedule(
+            item.album_art_url for item in items[: self.artwork_prefetch_top_n] if not item.render_cached
+        )
+
+    def _remember_tracks(self, items: list[TrackItem]) -> None:
+        if self.suggest_index is not None and items:
+            self.suggest_index.observe_tracks(item.model_dump() for item in items)
+
+    async def suggest_tracks(self, query: str, limit: int = 5) -> tuple[list[dict[str, Any]], str]:
+        if self.suggest_index is not None:
+            local = self.suggest_index.suggest(query, limit=limit)
+            if local:
+                return local, "local"
+
+        itunes_results = await self._cached_itunes_search(query)
+        candidates = self._extract_candidates(itunes_results)[:limit] if itunes_results else []
+        if self.suggest_index is not None and candidates:
+            self.suggest_index.observe_tracks(candidates)
+        return candidates, "itunes"
+
+    async def search_tracks(self, query: str, limit: int = 3) -> list[TrackItem]:
+        itunes_results = await self._cached_itunes_search(query)
+        if not itunes_results:
+            return []
+
+        limit = max(1, min(limit, 10))
+        candidates = self._extract_candidates(itunes_results)
+        if not candidates:
+            return []
+
+        scoped_candidates, lookup_count = await self._plan_lookups(candidates, limit)
+
+        youtube_results: list[Any] = []
+        if lookup_count:
+            try:
+                youtube_results = await self.youtube_service.lookup_tracks(
+                    [(candidate["title"], candidate["artist"]) for candidate in scoped_candidates[:lookup_count]]
                 )
-            )
+            except Exception as exc:  # noqa: BLE001
+                youtube_results = [exc] * lookup_count
 
+        ranked_items = [
+            self._to_track_item(candidate, rank, youtube_results[rank] if rank < lookup_count else None)
+            for rank, candidate in enumerate(scoped_candidates)
+        ]
         ranked_items.sort(key=lambda item: item.score, reverse=True)
+        self._prefetch_artwork(ranked_items[:limit])
+        self._remember_tracks(ranked_items[:limit])
         return ranked_items[:limit]
+
+    async def stream_search(self, query: str, limit: int = 3, deadline_sec: float = 2.5) -> AsyncIterator[dict[str, Any]]:
+        limit = max(1, min(limit, 10))
+        itunes_results = await self._cached_itunes_search(query)
+        candidates = self._extract_candidates(itunes_results) if itunes_results else []
+        scoped_candidates, lookup_count = await self._plan_lookups(candidates, limit) if candidates else ([], 0)
+
+        items = [self._to_track_item(candidate, rank) for rank, candidate in enumerate(scoped_candidates)]
+        self._prefetch_artwork(items[:limit])
+        yield {"type": "candidates", "limit": limit, "items": [item.model_dump() for item in items]}
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(0.0, deadline_sec)
+        # Cached lookups stream at once; misses share one batched statistics call, sent early enough to land
+        # before the deadline, and searches still running by then share a second one.
+        futures = await self.youtube_service.lookup_futures(
+            [(candidate["title"], candidate["artist"]) for candidate in scoped_candidates[:lookup_count]],
+            search_timeout_sec=max(0.0, deadline_sec - STREAM_STATS_RESERVE_SEC),
+        )
+        tasks: dict[asyncio.Future[Any], list[int]] = {}
+        for rank, future in enumerate(futures):
+            tasks.setdefault(future, []).append(rank)
+        pending = set(tasks)
+        try:
+            while pending:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled() or task.exception() is not None:
+                        continue
+                    for rank in tasks[task]:
+                        item = self._to_track_item(scoped_candidates[rank], rank, task.result())
+                        items[rank] = item
+                        yield {
+                            "type": "update",
+                            "track_id": item.track_id,
+                            "youtube_video_id": item.youtube_video_id,
+                            "youtube_embed_url": item.youtube_embed_url,
+                            "score": item.score,
+                        }
+        finally:
+            for task in pending:
+                task.cancel()
+
+        ranked_items = sorted(items, key=lambda item: item.score, reverse=True)[:limit]
+        self._remember_tracks(ranked_items)
+        yield {
+            "type": "done",
+            "timed_out": bool(pending),
+            "items": [item.model_dump() for item in ranked_items],
+        }
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from .singleflight import SingleFlight
+from .storage import Storage
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PrefetchedArtwork:
+    content: bytes
+    ext: str
+    cache_key: str
+
+
+class ArtworkPrefetcher:
+    def __init__(
+        self,
+        storage: Storage,
+        workflow_version: str,
+        render_preset: str,
+        ttl_sec: int = 300,
+        max_entries: int = 64,
+        concurrency: int = 4,
+    ) -> None:
+        self.storage = storage
+        self.workflow_version = workflow_version
+        self.render_preset = render_preset
+        self.ttl_sec = max(0, ttl_sec)
+        self.max_entries = max(0, max_entries)
+        self.entries: OrderedDict[str, tuple[float, PrefetchedArtwork]] = OrderedDict()
+        self.flight: SingleFlight[PrefetchedArtwork] = SingleFlight()
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.tasks: dict[str, asyncio.Task[None]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_sec > 0 and self.max_entries > 0
+
+    def _get(self, url: str) -> Optional[PrefetchedArtwork]:
+        entry = self.entries.get(url)
+        if entry is None:
+            return None
+        created_ts, artwork = entry
+        if (time.monotonic() - created_ts) > self.ttl_sec:
+            self.entries.pop(url, None)
+            return None
+        self.entries.move_to_end(url)
+        return artwork
+
+    def _set(self, url: str, artwork: PrefetchedArtwork) -> None:
+        if not self.enabled:
+            return
+        self.entries[url] = (time.monotonic(), artwork)
+        self.entries.move_to_end(url)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def _download(self, url: str) -> PrefetchedArtwork:
+        content, ext = await self.storage.download_album_art(url)
+        cache_key = self.storage.compute_cache_key(content, self.workflow_version, self.render_preset)
+        artwork = PrefetchedArtwork(content=content, ext=ext, cache_key=cache_key)
+        self._set(url, artwork)
+        return artwork
+
+    async def fetch(self, url: str) -> PrefetchedArtwork:
+        artwork = self._get(url)
+        if artwork is not None:
+            self.hits += 1
+            return artwork
+        # Joins a speculative download that is still in flight instead of starting a second one.
+        if not self.flight.is_inflight(url):
+            self.misses += 1
+        return await self.flight.do(url, lambda: self._download(url))
+
+    async def _prefetch(self, url: str) -> None:
+        async with self.semaphore:
+            if self._get(url) is not None:
+                return
+            try:
+                await self.flight.do(url, lambda: self._download(url))
+            except Exception as exc:  # noqa: BLE001
+                logger.debug("artwork prefetch failed for %s: %s", url, exc)
+
+    def schedule(self, urls: Iterable[str]) -> int:
+        if not self.enabled:
+            return 0
+        scheduled = 0
+        for url in urls:
+            if not url or url in self.tasks or self._get(url) is not None or self.flight.is_inflight(url):
+                continue
+            if len(self.tasks) >= self.max_entries:
+                break
+            task = asyncio.create_task(self._prefetch(url))
+            self.tasks[url] = task
+            task.add_done_callback(lambda _, url=url: self.tasks.pop(url, None))
+            scheduled += 1
+        return scheduled
+
+    async def close(self) -> None:
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self.tasks.clear()
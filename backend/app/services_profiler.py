@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import math
+import time
+from typing import Any, Callable, Iterable, Optional
+
+
+HISTOGRAM_BUCKETS_SEC = (0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class NodeExecutionProfiler:
+    def __init__(self, prompt: dict[str, Any], clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._origin = clock()
+        self._class_types = {
+            str(node_id): str(node.get("class_type", "unknown"))
+            for node_id, node in prompt.items()
+            if isinstance(node, dict)
+        }
+        self._running: dict[str, float] = {}
+        self._current: Optional[str] = None
+        self.timings: dict[str, dict[str, Any]] = {}
+
+    def _elapsed(self) -> float:
+        return round(self._clock() - self._origin, 3)
+
+    def _start(self, node_id: str) -> None:
+        if node_id in self._running or node_id in self.timings:
+            return
+        self._running[node_id] = self._elapsed()
+
+    def _finish(self, node_id: str, status: str = "executed") -> None:
+        start = self._running.pop(node_id, None)
+        if node_id in self.timings:
+            return
+        end = self._elapsed()
+        if start is None:
+            start = end
+        self.timings[node_id] = {
+            "node_id": node_id,
+            "class_type": self._class_types.get(node_id, "unknown"),
+            "status": status,
+            "start_sec": start,
+            "end_sec": end,
+            "duration_sec": round(max(0.0, end - start), 3),
+        }
+        if self._current == node_id:
+            self._current = None
+
+    def observe(self, message_type: str, payload: dict[str, Any]) -> None:
+        if message_type == "execution_cached":
+            nodes = payload.get("nodes")
+            if isinstance(nodes, list):
+                for item in nodes:
+                    if item is not None:
+                        self._finish(str(item), status="cached")
+        elif message_type == "executing":
+            node = payload.get("node")
+            if self._current is not None:
+                self._finish(self._current)
+            if node is not None:
+                self._current = str(node)
+                self._start(self._current)
+        elif message_type == "executed":
+            node = payload.get("node")
+            if node is not None:
+                self._finish(str(node))
+        elif message_type == "progress_state":
+            nodes = payload.get("nodes")
+            if not isinstance(nodes, dict):
+                return
+            for node_id, node_payload in nodes.items():
+                if not isinstance(node_payload, dict):
+                    continue
+                state = str(node_payload.get("state", ""))
+                if state == "running":
+                    self._start(str(node_id))
+                elif state == "finished":
+                    self._finish(str(node_id))
+        elif message_type in {"execution_success", "execution_error", "execution_interrupted"}:
+            self.finish()
+
+    def finish(self) -> None:
+        for node_id in list(self._running):
+            self._finish(node_id)
+
+    def as_list(self) -> list[dict[str, Any]]:
+        return sorted(self.timings.values(), key=lambda item: (item["start_sec"], item["node_id"]))
+
+
+def _percentile(sorted_values: list[float], ratio: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(ratio * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize_node_timings(profiles: Iterable[list[dict[str, Any]]]) -> list[dict[str, Any]]:
+    durations: dict[tuple[str, str], list[float]] = {}
+    cached_counts: dict[tuple[str, str], int] = {}
+    for timings in profiles:
+        for timing in timings:
+            if not isinstance(timing, dict) or timing.get("node_id") is None:
+                continue
+            key = (str(timing["node_id"]), str(timing.get("class_type", "unknown")))
+            if timing.get("status") == "cached":
+                cached_counts[key] = cached_counts.get(key, 0) + 1
+                durations.setdefault(key, [])
+                continue
+            try:
+                duration = max(0.0, float(timing.get("duration_sec", 0.0)))
+            except (TypeError, ValueError):
+                continue
+            durations.setdefault(key, []).append(duration)
+
+    items: list[dict[str, Any]] = []
+    for (node_id, class_type), values in durations.items():
+        values.sort()
+        histogram: list[dict[str, Any]] = []
+        for bound in HISTOGRAM_BUCKETS_SEC:
+            histogram.append({"le": bound, "count": sum(1 for value in values if value <= bound)})
+        histogram.append({"le": None, "count": len(values)})
+        total = sum(values)
+        items.append(
+            {
+                "node_id": node_id,
+                "class_type": class_type,
+                "executed_count": len(values),
+                "cached_count": cached_counts.get((node_id, class_type), 0),
+                "total_sec": round(total, 3),
+                "mean_sec": round(total / len(values), 3) if values else 0.0,
+                "p50_sec": round(_percentile(values, 0.5), 3),
+                "p95_sec": round(_percentile(values, 0.95), 3),
+                "max_sec": round(values[-1], 3) if values else 0.0,
+                "histogram": histogram,
+            }
+        )
+
+    items.sort(key=lambda item: item["total_sec"], reverse=True)
+    return items
+
+
+# Bootstrap per-class cost (seconds) used until real node timings have been observed.
+DEFAULT_NODE_COST_SEC: dict[str, float] = {
+    "WanVideoSampler": 150.0,
+    "AILab_QwenVL_Advanced": 20.0,
+    "AILab_QwenVL_PromptEnhancer": 15.0,
+    "WanVideoDecode": 20.0,
+    "RIFE VFI": 10.0,
+    "WanVideoModelLoader": 15.0,
+    "LoadWanVideoT5TextEncoder": 10.0,
+    "VHS_VideoCombine": 8.0,
+    "WanVideoEncode": 5.0,
+    "RIFE_FPS_Resample": 5.0,
+    "WanVideoTextEncode": 4.0,
+    "WanVideoVAELoader": 3.0,
+    "ColorMatch": 3.0,
+}
+DEFAULT_UNKNOWN_NODE_COST_SEC = 0.1
+MIN_NODE_COST_SEC = 0.05
+
+
+class NodeCostModel:
+    def __init__(self, smoothing: float = 0.3, defaults: Optional[dict[str, float]] = None) -> None:
+        self.smoothing = max(0.0, min(1.0, smoothing))
+        self.defaults = dict(DEFAULT_NODE_COST_SEC if defaults is None else defaults)
+        self.node_costs: dict[str, float] = {}
+        self.class_costs: dict[str, float] = {}
+        self.observed_runs = 0
+
+    @property
+    def has_history(self) -> bool:
+        return self.observed_runs > 0
+
+    def _blend(self, costs: dict[str, float], key: str, duration: float) -> None:
+        previous = costs.get(key)
+        if previous is None:
+            costs[key] = duration
+        else:
+            costs[key] = previous + self.smoothing * (duration - previous)
+
+    def observe(self, timings: list[dict[str, Any]]) -> None:
+        observed = False
+        for timing in timings:
+            if not isinstance(timing, dict) or timing.get("status") != "executed" or timing.get("node_id") is None:
+                continue
+            try:
+                duration = max(0.0, float(timing.get("duration_sec", 0.0)))
+            except (TypeError, ValueError):
+                continue
+            self._blend(self.node_costs, str(timing["node_id"]), duration)
+            self._blend(self.class_costs, str(timing.get("class_type", "unknown")), duration)
+            observed = True
+        if observed:
+            self.observed_runs += 1
+
+    def node_cost(self, node_id: str, class_type: str) -> float:
+        cost = self.node_costs.get(node_id)
+        if cost is None:
+            cost = self.class_costs.get(class_type)
+        if cost is None:
+            cost = self.defaults.get(class_type, DEFAULT_UNKNOWN_NODE_COST_SEC)
+        return max(MIN_NODE_COST_SEC, cost)
+
+    def weights(self, prompt: dict[str, Any]) -> dict[str, float]:
+        return {
+            str(node_id): self.node_cost(str(node_id), str(node.get("class_type", "unknown")))
+            for node_id, node in prompt.items()
+            if isinstance(node, dict)
+        }
+
+    def expected_total_sec(self, prompt: dict[str, Any]) -> float:
+        return sum(self.weights(prompt).values())
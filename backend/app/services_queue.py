@@ -1,26 +1,46 @@
 from __future__ import annotations
 
 import asyncio
+import logging
+import os
+import socket
 import time
 import uuid
+from collections import OrderedDict
 from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
 from .config import Settings
+from .metrics import (
+    RENDER_CACHE_LOOKUPS_TOTAL,
+    RENDER_JOBS_TOTAL,
+    RENDER_PHASE_SECONDS,
+    RENDER_QUEUE_WAIT_SECONDS,
+)
 from .schemas import (
     RenderCreateRequest,
     RenderCreateResponse,
     RenderError,
+    RenderHistoryItem,
     RenderResult,
     RenderStatusResponse,
     RenderTrackInfo,
 )
 from .services_comfy import ComfyError, ComfyService
+from .services_jobstore import SQLiteJobStore
+from .services_prefetch import ArtworkPrefetcher
+from .services_profiler import summarize_node_timings
+from .services_render_index import RenderCacheIndex
+from .services_suggest import TrackSuggestIndex
+from .serialization import model_bytes
+from .tracing import TRACER
 from .storage import Storage
 
 
+logger = logging.getLogger(__name__)
+
 PHASE_PROGRESS = {
     "queued": 0,
     "preparing": 8,
@@ -35,6 +55,15 @@ PHASE_PROGRESS = {
 
 SAMPLING_PROGRESS_START = PHASE_PROGRESS["sampling"]
 SAMPLING_PROGRESS_END = PHASE_PROGRESS["assembling"] - 1
+WARMUP_RETRY_MIN_SEC = 5.0
+WARMUP_RETRY_MAX_SEC = 60.0
+# How often a worker sharing the job store writes the latest preview frame where other processes can read it.
+PREVIEW_PERSIST_INTERVAL_SEC = 1.0
+
+
+def status_etag(version: int, queue_position: int, estimated_wait_sec: int) -> str:
+    # The ETA moves with the active job's progress, which never bumps a waiting job's version.
+    return f'"{version}-{queue_position}-{estimated_wait_sec}"'
 
 
 @dataclass
@@ -50,6 +79,35 @@ class JobRecord:
     image_filename: Optional[str]
     created_at: str
     updated_at: str
+    version: int = 0
+    trace_id: Optional[str] = None
+    trace_span_id: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        # Encoded response bodies by view, reused until the record changes; not a field, so never persisted.
+        self._encoded: dict[str, tuple[Any, bytes]] = {}
+
+    def encoded(self, view: str, key: Any, build: Callable[[], bytes]) -> bytes:
+        cached = self._encoded.get(view)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        body = build()
+        self._encoded[view] = (key, body)
+        return body
+
+    def to_history_item(self) -> RenderHistoryItem:
+        return RenderHistoryItem(
+            job_id=self.job_id,
+            status=self.status,  # type: ignore[arg-type]
+            track={
+                **self.track,
+                "album_art_url": self.track.get("album_art_url")
+                or (f"/static/inputs/{self.image_filename}" if self.image_filename else None),
+            },
+            result=self.result,
+            created_at=self.created_at,
+            updated_at=self.updated_at,
+        )
 
     def to_status(self, queue_position: int, estimated_wait_sec: int) -> RenderStatusResponse:
         return RenderStatusResponse(
@@ -59,6 +117,8 @@ class JobRecord:
             progress=self.progress,
             queue_position=queue_position,
             estimated_wait_sec=estimated_wait_sec,
+            version=self.version,
+            trace_id=self.trace_id,
             track=RenderTrackInfo(**self.track),
             result=RenderResult(**self.result),
             error=RenderError(**self.error),
@@ -66,31 +126,113 @@ class JobRecord:
 
 
 class RenderQueueService:
-    def __init__(self, settings: Settings, storage: Storage, comfy_service: ComfyService) -> None:
+    def __init__(
+        self,
+        settings: Settings,
+        storage: Storage,
+        comfy_service: ComfyService,
+        track_index: Optional[TrackSuggestIndex] = None,
+        render_index: Optional[RenderCacheIndex] = None,
+        artwork_prefetcher: Optional[ArtworkPrefetcher] = None,
+        job_store: Optional[SQLiteJobStore] = None,
+    ) -> None:
         self.settings = settings
         self.storage = storage
         self.comfy_service = comfy_service
+        self.track_index = track_index
+        self.render_index = render_index
+        self.artwork_prefetcher = artwork_prefetcher
+        self.job_store = job_store
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
         self.jobs: dict[str, JobRecord] = {}
         self.queue: asyncio.Queue[str] = asyncio.Queue()
         self.lock = asyncio.Lock()
         self.worker_task: Optional[asyncio.Task[None]] = None
+        self.heartbeat_task: Optional[asyncio.Task[None]] = None
+        self.follow_task: Optional[asyncio.Task[None]] = None
+        self.preview_persisted: dict[str, float] = {}
+        self.previews: OrderedDict[str, tuple[bytes, str]] = OrderedDict()
+        self.sampling_ratios: dict[str, float] = {}
+        self.phase_started: dict[str, tuple[str, float]] = {}
+        self.active_job_id: Optional[str] = None
+        self.process_task: Optional[asyncio.Task[None]] = None
+        # Jobs whose lease was reclaimed by another worker mid-render; this worker must not write them again.
+        self.lost_leases: set[str] = set()
+        self._changed = asyncio.Event()
+        self.backend_state: dict[str, Any] = {
+            "base_url": settings.comfy_base_url,
+            "ready": not settings.comfy_warmup_enabled,
+            "warmed_up": False,
+            "resident": False,
+            "resident_vram_bytes": 0,
+            "warmup_sec": None,
+            "error": None,
+        }
 
     def start(self) -> None:
         self._load_existing_jobs()
-        self.worker_task = asyncio.create_task(self._worker(), name="render-queue-worker")
+        self._load_cost_model()
+        if self.render_index is not None:
+            self.render_index.rebuild()
+        if self.settings.render_worker_enabled:
+            self.worker_task = asyncio.create_task(self._worker(), name="render-queue-worker")
+            if self.job_store is not None:
+                self.heartbeat_task = asyncio.create_task(self._heartbeat(), name="render-worker-heartbeat")
+        if self.job_store is not None:
+            self.follow_task = asyncio.create_task(self._follow_shared_store(), name="render-store-follower")
 
     async def stop(self) -> None:
-        if self.worker_task:
-            self.worker_task.cancel()
+        for task in (self.worker_task, self.heartbeat_task, self.follow_task):
+            if task is None:
+                continue
+            task.cancel()
             try:
-                await self.worker_task
+                await task
             except asyncio.CancelledError:
                 pass
+        if self.job_store is not None and self.heartbeat_task is not None:
+            await asyncio.to_thread(self.job_store.remove_worker, self.worker_id)
 
     def _now(self) -> str:
         return datetime.now(timezone.utc).isoformat()
 
+    def _note_rendered(self, job: JobRecord) -> None:
+        if not job.cache_key:
+            return
+        if self.render_index is not None:
+            self.render_index.record(job.track, job.cache_key)
+        if self.track_index is not None:
+            self.track_index.mark_rendered(job.track, job.result.get("video_url"))
+
+    @staticmethod
+    def _stamp(job: JobRecord) -> dict[str, Any]:
+        job.version += 1
+        job._encoded.clear()  # noqa: SLF001
+        return asdict(job)
+
+    def _write_job(self, payload: dict[str, Any]) -> None:
+        self.storage.write_job(payload["job_id"], payload)
+        if self.job_store is not None:
+            self.job_store.save_job(payload)
+
+    async def _persist(self, job: JobRecord) -> None:
+        # The shared store may sit out another process's write lock, so the write never runs on the event loop.
+        await asyncio.to_thread(self._write_job, self._stamp(job))
+        # Wake every long-poller; each re-checks its own job, which also covers queue positions shifting.
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def queue_depth(self) -> int:
+        if self.job_store is not None:
+            return self.job_store.queue_depth()
+        return self.queue.qsize()
+
     def _load_existing_jobs(self) -> None:
+        if self.job_store is not None:
+            # Other processes may still own queued or processing jobs; expired leases are reclaimed instead.
+            for raw in self.job_store.load_jobs():
+                self.jobs[raw["job_id"]] = JobRecord(**raw)
+            return
         existing = self.storage.load_jobs()
         for job_id, raw in existing.items():
             record = JobRecord(**raw)
@@ -103,16 +245,81 @@ class RenderQueueService:
                     "message": "job was interrupted by server restart",
                 }
                 record.updated_at = self._now()
-                self.storage.write_job(job_id, asdict(record))
+                self._write_job(self._stamp(record))
             self.jobs[job_id] = record
 
+    async def _probe_residency(self) -> bool:
+        stats = await self.comfy_service.get_system_stats()
+        resident_vram = self.comfy_service.resident_vram_bytes(stats)
+        self.backend_state["resident_vram_bytes"] = resident_vram
+        self.backend_state["resident"] = self.comfy_service.is_resident(stats)
+        return self.backend_state["resident"]
+
+    async def _warm_up(self) -> None:
+        try:
+            if await self._probe_residency():
+                logger.info("comfy backend %s already resident; skipping warm-up", self.settings.comfy_base_url)
+            else:
+                image_filename = self.storage.ensure_warmup_image()
+                logger.info("warming up comfy backend %s", self.settings.comfy_base_url)
+                self.backend_state["warmup_sec"] = await self.comfy_service.warm_up(image_filename)
+                self.backend_state["warmed_up"] = True
+                if not await self._probe_residency():
+                    # The first real job would pay the model load again, so keep retrying instead of reporting ready.
+                    logger.warning("comfy backend %s warmed up but its models are not resident", self.settings.comfy_base_url)
+                    self.backend_state["error"] = "models not resident after warm-up"
+                    return
+            self.backend_state["ready"] = True
+            self.backend_state["error"] = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # noqa: BLE001
+            message = exc.message if isinstance(exc, ComfyError) else str(exc)
+            logger.warning("comfy warm-up failed: %s", message)
+            self.backend_state["error"] = message
+
+    def _load_cost_model(self) -> None:
+        metas = sorted(self.storage.load_render_metas(), key=lambda meta: str(meta.get("created_at", "")))
+        for meta in metas:
+            timings = meta.get("node_timings")
+            if isinstance(timings, list):
+                self.comfy_service.cost_model.observe(timings)
+
+    def _expected_job_sec(self) -> float:
+        if self.comfy_service.cost_model.has_history:
+            return self.comfy_service.expected_render_sec()
+        return float(self.settings.estimated_job_sec)
+
+    def _remaining_job_sec(self, job: JobRecord) -> float:
+        if job.status != "processing":
+            return 0.0
+        if job.phase in {"assembling", "postprocessing"}:
+            return 0.0
+        ratio = self.sampling_ratios.get(job.job_id, 0.0) if job.phase == "sampling" else 0.0
+        return self._expected_job_sec() * (1.0 - ratio)
+
     async def create_job(self, req: RenderCreateRequest) -> RenderCreateResponse:
-        album_bytes, ext = await self.storage.download_album_art(req.album_art_url)
-        content_cache_key = self.storage.compute_cache_key(
-            album_bytes,
-            self.settings.workflow_version,
-            self.settings.render_preset,
-        )
+        with TRACER.span("render.create_job", track_id=req.track_id) as span:
+            response = await self._create_job(req)
+            span.set(job_id=response.job_id, cache_hit=response.cache_hit)
+            return response
+
+    async def _create_job(self, req: RenderCreateRequest) -> RenderCreateResponse:
+        with TRACER.span("render.fetch_art", prefetched=self.artwork_prefetcher is not None):
+            if self.artwork_prefetcher is not None:
+                artwork = await self.artwork_prefetcher.fetch(req.album_art_url)
+                album_bytes, ext, content_cache_key = artwork.content, artwork.ext, artwork.cache_key
+            else:
+                album_bytes, ext = await self.storage.download_album_art(req.album_art_url)
+                with TRACER.span("render.hash_art", bytes=len(album_bytes)):
+                    content_cache_key = self.storage.compute_cache_key(
+                        album_bytes,
+                        self.settings.workflow_version,
+                        self.settings.render_preset,
+                    )
+        current = TRACER.current()
+        trace_id = current.trace_id if current else None
+        trace_span_id = current.span_id if current else None
         cache_key_candidates = [content_cache_key]
         if req.album_id:
             legacy_album_cache_key = self.storage.compute_album_identity_cache_key(
@@ -124,6 +331,7 @@ class RenderQueueService:
                 cache_key_candidates.append(legacy_album_cache_key)
 
         cached_key = next((candidate for candidate in cache_key_candidates if self.storage.cache_exists(candidate)), None)
+        RENDER_CACHE_LOOKUPS_TOTAL.inc(result="hit" if cached_key else "miss")
         if cached_key:
             cache_key = cached_key
 
@@ -143,20 +351,30 @@ class RenderQueueService:
                     "album_art_url": req.album_art_url,
                     "youtube_video_id": req.youtube_video_id,
                 },
-                result={"video_url": video_url, "thumbnail_url": thumb_url, "cache_key": cache_key},
+                result={
+                    "video_url": video_url,
+                    "thumbnail_url": thumb_url,
+                    "hls_url": self.storage.hls_url(cache_key),
+                    "cache_key": cache_key,
+                },
                 error={"code": None, "message": None},
                 cache_key=cache_key,
                 image_filename=None,
                 created_at=now,
                 updated_at=now,
+                trace_id=trace_id,
+                trace_span_id=trace_span_id,
             )
             async with self.lock:
                 self.jobs[job_id] = job
-            self.storage.write_job(job_id, asdict(job))
+            with TRACER.span("render.persist"):
+                await self._persist(job)
+            self._note_rendered(job)
             return RenderCreateResponse(job_id=job_id, status="completed", cache_hit=True, poll_url=f"/api/v1/renders/{job_id}")
 
         cache_key = content_cache_key
-        image_filename = self.storage.persist_album_art(album_bytes, cache_key, ext)
+        with TRACER.span("render.persist_art", bytes=len(album_bytes)):
+            image_filename = self.storage.persist_album_art(album_bytes, cache_key, ext)
 
         job_id = str(uuid.uuid4())
         now = self._now()
@@ -173,42 +391,182 @@ class RenderQueueService:
                 "album_art_url": req.album_art_url,
                 "youtube_video_id": req.youtube_video_id,
             },
-            result={"video_url": None, "thumbnail_url": None, "cache_key": cache_key},
+            result={"video_url": None, "thumbnail_url": None, "hls_url": None, "cache_key": cache_key},
             error={"code": None, "message": None},
             cache_key=cache_key,
             image_filename=image_filename,
             created_at=now,
             updated_at=now,
+            trace_id=trace_id,
+            trace_span_id=trace_span_id,
         )
 
-        async with self.lock:
-            self.jobs[job_id] = job
-            await self.queue.put(job_id)
-        self.storage.write_job(job_id, asdict(job))
+        with TRACER.span("render.persist"):
+            async with self.lock:
+                self.jobs[job_id] = job
+                self.phase_started[job_id] = ("queued", time.monotonic())
+                if self.job_store is None:
+                    await self.queue.put(job_id)
+            await self._persist(job)
+            if self.job_store is not None:
+                await asyncio.to_thread(self.job_store.enqueue, job_id)
 
         return RenderCreateResponse(job_id=job_id, status="queued", cache_hit=False, poll_url=f"/api/v1/renders/{job_id}")
 
-    async def get_job(self, job_id: str) -> Optional[RenderStatusResponse]:
+    async def _shared_job(self, job_id: str) -> Optional[JobRecord]:
+        if self.job_store is None:
+            return None
+        raw = await asyncio.to_thread(self.job_store.load_job, job_id)
+        return JobRecord(**raw) if raw is not None else None
+
+    def _sync_shared(self, job_id: str, shared: JobRecord) -> JobRecord:
+        previous = self.jobs.get(job_id)
+        if previous is not None and previous.version >= shared.version:
+            # Keep the resident record so its encoded responses stay warm between polls, and never let a
+            # snapshot read before a local write replace the newer record.
+            return previous
+        self.jobs[job_id] = shared
+        if shared.status == "completed" and (previous is None or previous.status != "completed"):
+            self._note_rendered(shared)
+        return shared
+
+    async def _follow_shared_store(self) -> None:
+        # Jobs finished by other processes reach the render and suggest indexes here, not only when someone polls them.
+        assert self.job_store is not None
+        interval = max(0.05, self.settings.queue_poll_interval_ms / 1000)
+        since = time.time()
+        while True:
+            await asyncio.sleep(interval)
+            cursor = time.time()
+            try:
+                raws = await asyncio.to_thread(self.job_store.load_jobs, since - interval)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("failed to follow the shared job store: %s", exc)
+                continue
+            since = cursor
+            async with self.lock:
+                for raw in raws:
+                    self._sync_shared(raw["job_id"], JobRecord(**raw))
+
+    async def _status_snapshot(self, job_id: str) -> Optional[tuple[JobRecord, int, int]]:
+        shared = await self._shared_job(job_id)
+        waiting = await self._waiting_job_ids(shared or self.jobs.get(job_id))
         async with self.lock:
+            if shared is not None:
+                self._sync_shared(job_id, shared)
             job = self.jobs.get(job_id)
             if not job:
                 return None
-            queue_position = self._queue_position(job)
+            queue_position = self._queue_position(job, waiting)
+            active_job = self.jobs.get(self.active_job_id) if self.active_job_id else None
 
-        estimated_wait = 0
-        if job.status == "queued":
-            estimated_wait = max(0, queue_position) * self.settings.estimated_job_sec
+            estimated_wait = 0.0
+            if job.status == "queued":
+                active_remaining = self._remaining_job_sec(active_job) if active_job else 0.0
+                estimated_wait = active_remaining + max(0, queue_position - 1) * self._expected_job_sec()
+            elif job.status == "processing":
+                estimated_wait = self._remaining_job_sec(job)
 
+        return job, queue_position, int(round(estimated_wait))
+
+    async def get_job(self, job_id: str) -> Optional[RenderStatusResponse]:
+        snapshot = await self._status_snapshot(job_id)
+        if snapshot is None:
+            return None
+        job, queue_position, estimated_wait = snapshot
         return job.to_status(queue_position=queue_position, estimated_wait_sec=estimated_wait)
 
-    async def list_history(self, limit: int = 6, include_failed: bool = False) -> list[JobRecord]:
-        async with self.lock:
-            records = list(self.jobs.values())
+    async def get_job_json(self, job_id: str) -> Optional[tuple[bytes, str]]:
+        snapshot = await self._status_snapshot(job_id)
+        if snapshot is None:
+            return None
+        job, queue_position, estimated_wait = snapshot
+        body = job.encoded(
+            "status",
+            (job.version, queue_position, estimated_wait),
+            lambda: model_bytes(job.to_status(queue_position=queue_position, estimated_wait_sec=estimated_wait)),
+        )
+        return body, status_etag(job.version, queue_position, estimated_wait)
+
+    async def job_etag(self, job_id: str) -> Optional[str]:
+        snapshot = await self._status_snapshot(job_id)
+        if snapshot is None:
+            return None
+        job, queue_position, estimated_wait = snapshot
+        return status_etag(job.version, queue_position, estimated_wait)
+
+    async def wait_for_change(self, job_id: str, etag: str, timeout_sec: float) -> Optional[str]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(0.0, timeout_sec)
+        while True:
+            changed = self._changed
+            current = await self.job_etag(job_id)
+            remaining = deadline - loop.time()
+            if current != etag or remaining <= 0:
+                return current
+            if self.job_store is not None:
+                # Other processes update the shared store without waking this one, so poll it as well.
+                remaining = min(remaining, max(0.05, self.settings.queue_poll_interval_ms / 1000))
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def get_preview(self, job_id: str) -> Optional[tuple[bytes, str]]:
+        preview = self.previews.get(job_id)
+        if preview is not None or self.job_store is None:
+            return preview
+        # Rendered by another process: serve the frame its worker last persisted.
+        job = await self._shared_job(job_id)
+        if job is None or job.status != "processing" or not job.cache_key:
+            return None
+        return await asyncio.to_thread(self.storage.read_preview, job.cache_key)
+
+    async def _persist_preview(self, job_id: str, image: bytes, media_type: str) -> None:
+        if self.job_store is None or self.settings.preview_buffer_max_jobs <= 0:
+            return
+        job = self.jobs.get(job_id)
+        now = time.monotonic()
+        if job is None or not job.cache_key or now - self.preview_persisted.get(job_id, 0.0) < PREVIEW_PERSIST_INTERVAL_SEC:
+            return
+        self.preview_persisted[job_id] = now
+        try:
+            await asyncio.to_thread(self.storage.write_preview, job.cache_key, image, media_type)
+        except OSError as exc:
+            logger.debug("failed to persist preview for %s: %s", job_id, exc)
+
+    def _drop_preview(self, job: JobRecord) -> None:
+        self.previews.pop(job.job_id, None)
+        if self.preview_persisted.pop(job.job_id, None) is not None and job.cache_key:
+            self.storage.delete_preview(job.cache_key)
+
+    def _store_preview(self, job_id: str, image: bytes, media_type: str) -> None:
+        max_jobs = self.settings.preview_buffer_max_jobs
+        if max_jobs <= 0:
+            return
+        self.previews[job_id] = (image, media_type)
+        self.previews.move_to_end(job_id)
+        while len(self.previews) > max_jobs:
+            self.previews.popitem(last=False)
+
+    def node_profile(self) -> tuple[int, list[dict[str, Any]]]:
+        profiles = [
+            meta["node_timings"]
+            for meta in self.storage.load_render_metas()
+            if isinstance(meta.get("node_timings"), list) and meta["node_timings"]
+        ]
+        return len(profiles), summarize_node_timings(profiles)
 
-        if include_failed:
-            filtered = [record for record in records if record.status in {"completed", "failed"}]
+    async def list_history(self, limit: int = 6, include_failed: bool = False) -> list[JobRecord]:
+        statuses = ("completed", "failed") if include_failed else ("completed",)
+        if self.job_store is not None:
+            filtered = []
+            for raw in await asyncio.to_thread(self.job_store.load_jobs_by_status, statuses, limit):
+                resident = self.jobs.get(raw["job_id"])
+                filtered.append(resident if resident is not None and resident.version == raw.get("version") else JobRecord(**raw))
         else:
-            filtered = [record for record in records if record.status == "completed"]
+            async with self.lock:
+                filtered = [record for record in self.jobs.values() if record.status in statuses]
 
         def sort_key(record: JobRecord) -> tuple[float, float]:
             return (self._parse_iso_timestamp(record.updated_at), self._parse_iso_timestamp(record.created_at))
@@ -216,16 +574,33 @@ class RenderQueueService:
         filtered.sort(key=sort_key, reverse=True)
         return filtered[:limit]
 
+    async def list_history_json(self, limit: int = 6, include_failed: bool = False) -> list[bytes]:
+        records = await self.list_history(limit=limit, include_failed=include_failed)
+        return [
+            record.encoded("history", record.version, lambda record=record: model_bytes(record.to_history_item()))
+            for record in records
+        ]
+
     async def clear_history(self, include_failed: bool = False) -> int:
         async with self.lock:
+            if self.job_store is not None:
+                statuses = ("completed", "failed") if include_failed else ("completed",)
+                records = {
+                    raw["job_id"]: JobRecord(**raw)
+                    for raw in await asyncio.to_thread(self.job_store.load_jobs_by_status, statuses)
+                }
+            else:
+                records = self.jobs
             target_ids = [
                 job_id
-                for job_id, record in self.jobs.items()
+                for job_id, record in records.items()
                 if record.status == "completed" or (include_failed and record.status == "failed")
             ]
             for job_id in target_ids:
                 self.jobs.pop(job_id, None)
                 self.storage.delete_job(job_id)
+                if self.job_store is not None:
+                    await asyncio.to_thread(self.job_store.delete_job, job_id)
         return len(target_ids)
 
     @staticmethod
@@ -237,27 +612,60 @@ class RenderQueueService:
         except ValueError:
             return 0.0
 
-    def _queue_position(self, job: JobRecord) -> int:
+    async def _waiting_job_ids(self, job: Optional[JobRecord]) -> Optional[list[str]]:
+        # Read before taking self.lock, so a slow shared store never holds up other requests.
+        if self.job_store is None or job is None or job.status != "queued":
+            return None
+        return await asyncio.to_thread(self.job_store.waiting_job_ids)
+
+    def _queue_position(self, job: JobRecord, waiting: Optional[list[str]] = None) -> int:
         if job.status == "processing":
             return 0
         if job.status != "queued":
             return 0
 
-        queued_ids = list(self.queue._queue)  # noqa: SLF001
+        queued_ids = waiting if waiting is not None else list(self.queue._queue)  # noqa: SLF001
         try:
             return queued_ids.index(job.job_id) + 1
         except ValueError:
             return 1
 
+    def _record_phase(self, job_id: str, next_phase: Optional[str]) -> None:
+        now = time.monotonic()
+        previous = self.phase_started.get(job_id)
+        if previous is not None and previous[0] == next_phase:
+            return
+        if previous is not None:
+            phase, started = previous
+            RENDER_PHASE_SECONDS.observe(now - started, phase=phase)
+            if phase == "queued":
+                RENDER_QUEUE_WAIT_SECONDS.observe(now - started)
+            job = self.jobs.get(job_id)
+            if job is not None and job.trace_id:
+                end_ts = time.time()
+                TRACER.record(
+                    "render.queue_wait" if phase == "queued" else f"render.phase.{phase}",
+                    job.trace_id,
+                    start_ts=end_ts - (now - started),
+                    end_ts=end_ts,
+                    parent_id=job.trace_span_id if phase == "queued" else None,
+                    job_id=job_id,
+                )
+        if next_phase is None:
+            self.phase_started.pop(job_id, None)
+        else:
+            self.phase_started[job_id] = (next_phase, now)
+
     async def _update_phase(self, job_id: str, phase: str) -> None:
         async with self.lock:
+            self._record_phase(job_id, phase)
             job = self.jobs[job_id]
             job.phase = phase
             job.progress = PHASE_PROGRESS[phase]
             job.updated_at = self._now()
             if phase != "queued":
                 job.status = "processing"
-            self.storage.write_job(job_id, asdict(job))
+            await self._persist(job)
 
     async def _update_sampling_progress(self, job_id: str, ratio: float) -> None:
         ratio = max(0.0, min(1.0, ratio))
@@ -266,26 +674,35 @@ class RenderQueueService:
             job = self.jobs[job_id]
             if job.phase != "sampling" or job.status not in {"processing", "queued"}:
                 return
+            self.sampling_ratios[job_id] = max(ratio, self.sampling_ratios.get(job_id, 0.0))
             if mapped <= job.progress:
                 return
             job.progress = mapped
             job.status = "processing"
             job.updated_at = self._now()
-            self.storage.write_job(job_id, asdict(job))
+            await self._persist(job)
 
     async def _complete_job(self, job_id: str, cache_key: str) -> None:
         video_url, thumb_url = self.storage.result_urls(cache_key)
+        hls_url = self.storage.hls_url(cache_key)
         async with self.lock:
             job = self.jobs[job_id]
             job.status = "completed"
             job.phase = "done"
             job.progress = PHASE_PROGRESS["done"]
-            job.result = {"video_url": video_url, "thumbnail_url": thumb_url, "cache_key": cache_key}
+            job.result = {"video_url": video_url, "thumbnail_url": thumb_url, "hls_url": hls_url, "cache_key": cache_key}
             job.error = {"code": None, "message": None}
             job.updated_at = self._now()
-            self.storage.write_job(job_id, asdict(job))
+            self._drop_preview(job)
+            self.sampling_ratios.pop(job_id, None)
+            self._record_phase(job_id, None)
+            await self._persist(job)
+            RENDER_JOBS_TOTAL.inc(outcome="completed", code="")
+            self._note_rendered(job)
 
     async def _fail_job(self, job_id: str, code: str, message: str) -> None:
+        if job_id in self.lost_leases:
+            return
         async with self.lock:
             job = self.jobs[job_id]
             job.status = "failed"
@@ -293,56 +710,187 @@ class RenderQueueService:
             job.progress = PHASE_PROGRESS["error"]
             job.error = {"code": code, "message": message}
             job.updated_at = self._now()
-            self.storage.write_job(job_id, asdict(job))
+            self._drop_preview(job)
+            self.sampling_ratios.pop(job_id, None)
+            self._record_phase(job_id, None)
+            await self._persist(job)
+            RENDER_JOBS_TOTAL.inc(outcome="failed", code=code)
 
-    async def _worker(self) -> None:
+    async def _claim_next_job(self) -> str:
+        if self.job_store is None:
+            return await self.queue.get()
+
+        poll_interval = max(0.05, self.settings.queue_poll_interval_ms / 1000)
+        while True:
+            claimed = await asyncio.to_thread(self.job_store.claim, self.worker_id, self.settings.queue_lease_sec)
+            if claimed is None:
+                await asyncio.sleep(poll_interval)
+                continue
+            job_id, attempts = claimed
+            raw = await asyncio.to_thread(self.job_store.load_job, job_id)
+            if raw is None:
+                await asyncio.to_thread(self.job_store.ack, job_id, self.worker_id)
+                continue
+            record = JobRecord(**raw)
+            async with self.lock:
+                self.jobs[job_id] = record
+                if job_id not in self.phase_started:
+                    waited = max(0.0, time.time() - self._parse_iso_timestamp(record.created_at))
+                    self.phase_started[job_id] = ("queued", time.monotonic() - waited)
+            if attempts > self.settings.queue_max_attempts:
+                await self._fail_job(job_id, "LEASE_EXPIRED", "job was abandoned by its worker too many times")
+                await asyncio.to_thread(self.job_store.ack, job_id, self.worker_id)
+                continue
+            return job_id
+
+    async def _beat(self) -> None:
+        if self.job_store is None:
+            return
+        job_id = self.active_job_id
+        await asyncio.to_thread(self.job_store.heartbeat, self.worker_id, job_id)
+        if job_id and not await asyncio.to_thread(self.job_store.renew, job_id, self.worker_id, self.settings.queue_lease_sec):
+            logger.warning("lost queue lease on job %s; abandoning it", job_id)
+            self.lost_leases.add(job_id)
+            if self.process_task is not None and self.active_job_id == job_id:
+                self.process_task.cancel()
+
+    async def _heartbeat(self) -> None:
+        interval = max(1.0, self.settings.queue_lease_sec / 3)
         while True:
-            job_id = await self.queue.get()
             try:
-                await self._update_phase(job_id, "preparing")
-
-                async with self.lock:
-                    job = self.jobs[job_id]
-                    cache_key = job.cache_key
-                    image_filename = job.image_filename
-                if not cache_key or not image_filename:
-                    raise ComfyError("OUTPUT_NOT_FOUND", "missing cache key or image file")
-
-                render_dir = self.storage.ensure_render_dir(cache_key)
-
-                async def phase_callback(phase: str) -> None:
-                    await self._update_phase(job_id, phase)
-
-                async def sampling_progress_callback(ratio: float) -> None:
-                    await self._update_sampling_progress(job_id, ratio)
-
-                start_ts = time.monotonic()
-                video_path, thumb_path = await self.comfy_service.render(
-                    image_filename=image_filename,
-                    cache_key=cache_key,
-                    render_dir=render_dir,
-                    phase_callback=phase_callback,
-                    sampling_progress_callback=sampling_progress_callback,
-                )
+                await self._beat()
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("worker heartbeat failed: %s", exc)
+            await asyncio.sleep(interval)
+
+    def list_workers(self) -> list[dict[str, Any]]:
+        if self.job_store is None:
+            return []
+        return self.job_store.list_workers(stale_after_sec=self.settings.queue_lease_sec)
+
+    async def _requeue_interrupted(self, job_id: str) -> None:
+        if self.job_store is None:
+            return
+        job = self.jobs.get(job_id)
+        if job is not None and job.status not in {"completed", "failed"}:
+            job.status = "queued"
+            job.phase = "queued"
+            job.progress = PHASE_PROGRESS["queued"]
+            job.updated_at = self._now()
+            await self._persist(job)
+        # Hand the job straight back to the queue instead of waiting for its lease to expire.
+        await asyncio.to_thread(self.job_store.release, job_id, self.worker_id)
 
-                self.storage.write_meta(
-                    cache_key,
-                    {
-                        "track": job.track,
-                        "cache_key": cache_key,
-                        "video_path": str(video_path),
-                        "thumb_path": str(thumb_path),
-                        "elapsed_sec": round(time.monotonic() - start_ts, 2),
-                        "workflow_version": self.settings.workflow_version,
-                        "render_preset": self.settings.render_preset,
-                        "created_at": self._now(),
-                    },
-                )
+    async def _release_job(self, job_id: str) -> None:
+        if self.job_store is not None:
+            await asyncio.to_thread(self.job_store.ack, job_id, self.worker_id)
+        else:
+            self.queue.task_done()
+
+    async def _wait_until_ready(self) -> None:
+        # Jobs stay queued (and claimable by workers whose backend is ready) until this backend has warmed up.
+        delay = WARMUP_RETRY_MIN_SEC
+        while not self.backend_state["ready"]:
+            await self._warm_up()
+            if self.backend_state["ready"]:
+                return
+            logger.info("comfy backend not ready; retrying warm-up in %.0fs", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WARMUP_RETRY_MAX_SEC)
 
-                await self._complete_job(job_id, cache_key=cache_key)
-            except ComfyError as exc:
-                await self._fail_job(job_id, exc.code, exc.message)
-            except Exception as exc:  # noqa: BLE001
-                await self._fail_job(job_id, "COMFY_HTTP_ERROR", str(exc))
-            finally:
-                self.queue.task_done()
+    async def _worker(self) -> None:
+        await self._wait_until_ready()
+        while True:
+            job_id = await self._claim_next_job()
+            self.active_job_id = job_id
+            await self._beat()
+            claimed = self.jobs.get(job_id)
+            with TRACER.continued(
+                "render.job",
+                claimed.trace_id if claimed else None,
+                parent_id=claimed.trace_span_id if claimed else None,
+                job_id=job_id,
+                worker_id=self.worker_id,
+            ) as span:
+                if job_id not in self.lost_leases:
+                    self.process_task = asyncio.ensure_future(self._process_job(job_id))
+                    try:
+                        await self.process_task
+                    except asyncio.CancelledError:
+                        current = asyncio.current_task()
+                        if job_id not in self.lost_leases or (current is not None and current.cancelling()):
+                            raise
+                    finally:
+                        self.process_task = None
+                self.active_job_id = None
+                finished = self.jobs.get(job_id)
+                if job_id in self.lost_leases:
+                    span.set(status="abandoned", error_code="LEASE_LOST")
+                elif finished is not None:
+                    span.set(status=finished.status, error_code=finished.error.get("code"))
+            self.lost_leases.discard(job_id)
+
+    async def _process_job(self, job_id: str) -> None:
+        try:
+            await self._update_phase(job_id, "preparing")
+
+            async with self.lock:
+                job = self.jobs[job_id]
+                cache_key = job.cache_key
+                image_filename = job.image_filename
+            if not cache_key or not image_filename:
+                raise ComfyError("OUTPUT_NOT_FOUND", "missing cache key or image file")
+
+            render_dir = self.storage.ensure_render_dir(cache_key)
+
+            async def phase_callback(phase: str) -> None:
+                await self._update_phase(job_id, phase)
+
+            async def sampling_progress_callback(ratio: float) -> None:
+                await self._update_sampling_progress(job_id, ratio)
+
+            async def preview_callback(image: bytes, media_type: str) -> None:
+                self._store_preview(job_id, image, media_type)
+                await self._persist_preview(job_id, image, media_type)
+
+            start_ts = time.monotonic()
+            outputs = await self.comfy_service.render(
+                image_filename=image_filename,
+                cache_key=cache_key,
+                render_dir=render_dir,
+                phase_callback=phase_callback,
+                sampling_progress_callback=sampling_progress_callback,
+                preview_callback=preview_callback,
+            )
+            if job_id in self.lost_leases:
+                return
+
+            self.storage.write_meta(
+                cache_key,
+                {
+                    "track": job.track,
+                    "cache_key": cache_key,
+                    "video_path": str(outputs.video_path),
+                    "thumb_path": str(outputs.thumb_path),
+                    "hls_path": str(outputs.hls_playlist_path) if outputs.hls_playlist_path else None,
+                    "faststart": True,
+                    "node_timings": outputs.node_timings,
+                    "elapsed_sec": round(time.monotonic() - start_ts, 2),
+                    "workflow_version": self.settings.workflow_version,
+                    "render_preset": self.settings.render_preset,
+                    "created_at": self._now(),
+                },
+            )
+
+            await self._complete_job(job_id, cache_key=cache_key)
+        except ComfyError as exc:
+            await self._fail_job(job_id, exc.code, exc.message)
+        except asyncio.CancelledError:
+            if job_id not in self.lost_leases:
+                await self._requeue_interrupted(job_id)
+            raise
+        except Exception as exc:  # noqa: BLE001
+            await self._fail_job(job_id, "COMFY_HTTP_ERROR", str(exc))
+        finally:
+            self.active_job_id = None
+            await self._release_job(job_id)
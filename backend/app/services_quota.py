@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone, tzinfo
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+try:
+    from zoneinfo import ZoneInfo
+
+    QUOTA_TIMEZONE: tzinfo = ZoneInfo("America/Los_Angeles")
+except Exception:  # noqa: BLE001  # pragma: no cover
+    QUOTA_TIMEZONE = timezone.utc
+
+
+YOUTUBE_SEARCH_COST = 100
+YOUTUBE_VIDEOS_LIST_COST = 1
+# One enrichment lookup is a search.list plus its share of a batched videos.list.
+YOUTUBE_LOOKUP_COST = YOUTUBE_SEARCH_COST + YOUTUBE_VIDEOS_LIST_COST
+
+
+class QuotaExhaustedError(RuntimeError):
+    pass
+
+
+class YouTubeQuotaBudget:
+    def __init__(
+        self,
+        daily_limit: int = 10_000,
+        burst_units: int = 1_000,
+        reserve_units: int = 500,
+        clock: Callable[[], float] = time.time,
+        db_path: Optional[Path] = None,
+    ) -> None:
+        self.daily_limit = max(0, daily_limit)
+        self.burst_units = max(0, min(burst_units, self.daily_limit))
+        self.reserve_units = max(0, min(reserve_units, self.daily_limit))
+        self.refill_per_sec = self.daily_limit / 86_400
+        self._clock = clock
+        self.tokens = float(self.burst_units)
+        self.used_today = 0
+        self.rejected = 0
+        self._last_refill = clock()
+        self._reset_at = self._next_reset(self._last_refill)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if db_path is not None:
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(db_path), timeout=5, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS youtube_quota (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    tokens REAL NOT NULL,
+                    used_today INTEGER NOT NULL,
+                    rejected INTEGER NOT NULL,
+                    last_refill_ts REAL NOT NULL,
+                    reset_at REAL NOT NULL
+                )
+                """
+            )
+
+    @staticmethod
+    def _next_reset(now: float) -> float:
+        local_now = datetime.fromtimestamp(now, QUOTA_TIMEZONE)
+        next_midnight = (local_now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return next_midnight.timestamp()
+
+    @contextmanager
+    def _state(self) -> Iterator[None]:
+        with self._lock:
+            if self._conn is None:
+                self._refresh()
+                yield
+                return
+            # The quota is per API key, so every process sharing the DB spends from the one row; BEGIN IMMEDIATE
+            # serialises their read-modify-write.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT tokens, used_today, rejected, last_refill_ts, reset_at FROM youtube_quota WHERE id = 1"
+                ).fetchone()
+                if row:
+                    self.tokens, self.used_today, self.rejected = float(row[0]), int(row[1]), int(row[2])
+                    self._last_refill, self._reset_at = float(row[3]), float(row[4])
+                self._refresh()
+                yield
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO youtube_quota (id, tokens, used_today, rejected, last_refill_ts, reset_at) "
+                    "VALUES (1, ?, ?, ?, ?, ?)",
+                    (self.tokens, self.used_today, self.rejected, self._last_refill, self._reset_at),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _refresh(self) -> None:
+        now = self._clock()
+        if now >= self._reset_at:
+            self.used_today = 0
+            self.tokens = float(self.burst_units)
+            self._reset_at = self._next_reset(now)
+        elapsed = max(0.0, now - self._last_refill)
+        self.tokens = min(float(self.burst_units), self.tokens + elapsed * self.refill_per_sec)
+        self._last_refill = max(self._last_refill, now)
+
+    def _spendable(self) -> float:
+        hard_remaining = self.daily_limit - self.reserve_units - self.used_today
+        return max(0.0, min(self.tokens, float(hard_remaining)))
+
+    def remaining_today(self) -> int:
+        with self._state():
+            return max(0, self.daily_limit - self.used_today)
+
+    def spendable_units(self) -> float:
+        with self._state():
+            return self._spendable()
+
+    def try_consume(self, units: int) -> bool:
+        with self._state():
+            if self._spendable() < units:
+                self.rejected += 1
+                return False
+            self.tokens -= units
+            self.used_today += units
+            return True
+
+    def consume(self, units: int) -> None:
+        if not self.try_consume(units):
+            raise QuotaExhaustedError(f"youtube quota budget exhausted ({units} units requested)")
+
+    def lookup_depth(self, requested: int) -> int:
+        if requested <= 0:
+            return 0
+        affordable = int(self.spendable_units() // YOUTUBE_LOOKUP_COST)
+        return max(0, min(requested, affordable))
+
+    def stats(self) -> dict[str, Any]:
+        with self._state():
+            return {
+                "daily_limit": self.daily_limit,
+                "used_today": self.used_today,
+                "remaining_today": max(0, self.daily_limit - self.used_today),
+                "spendable_units": int(self._spendable()),
+                "reserve_units": self.reserve_units,
+                "rejected": self.rejected,
+                "resets_at": datetime.fromtimestamp(self._reset_at, timezone.utc).isoformat(),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
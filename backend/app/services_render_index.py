@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from typing import Any, Optional
+
+from .storage import Storage
+
+
+class RenderCacheIndex:
+    def __init__(self, storage: Storage, workflow_version: str, render_preset: str) -> None:
+        self.storage = storage
+        self.workflow_version = workflow_version
+        self.render_preset = render_preset
+        self.by_album_id: dict[str, str] = {}
+        self.by_art_url: dict[str, str] = {}
+
+    def rebuild(self) -> None:
+        self.by_album_id.clear()
+        self.by_art_url.clear()
+        metas = sorted(self.storage.load_render_metas(), key=lambda meta: str(meta.get("created_at", "")))
+        for meta in metas:
+            if meta.get("workflow_version") != self.workflow_version or meta.get("render_preset") != self.render_preset:
+                continue
+            track = meta.get("track")
+            cache_key = meta.get("cache_key")
+            if isinstance(track, dict) and cache_key:
+                self.record(track, str(cache_key))
+
+    def record(self, track: dict[str, Any], cache_key: str) -> None:
+        album_id = track.get("album_id")
+        album_art_url = track.get("album_art_url")
+        if album_id:
+            self.by_album_id[str(album_id)] = cache_key
+        if album_art_url:
+            self.by_art_url[str(album_art_url)] = cache_key
+
+    def lookup(self, album_id: Optional[str], album_art_url: Optional[str]) -> Optional[str]:
+        for index, key in ((self.by_art_url, album_art_url), (self.by_album_id, album_id)):
+            if not key:
+                continue
+            cache_key = index.get(key)
+            if cache_key is None:
+                continue
+            if self.storage.cache_exists(cache_key):
+                return cache_key
+            index.pop(key, None)
+        return None
+
+    def video_url(self, album_id: Optional[str], album_art_url: Optional[str]) -> Optional[str]:
+        cache_key = self.lookup(album_id, album_art_url)
+        if cache_key is None:
+            return None
+        video_url, _ = self.storage.result_urls(cache_key)
+        return video_url
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import heapq
+import json
+import logging
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+MAX_PREFIX_LEN = 24
+SEARCH_POPULARITY = 1
+RENDER_POPULARITY = 5
+# Each prefix keeps its best RANKED_PER_PREFIX tracks pre-sorted; prefixes matching at most EXACT_SCAN_MAX tracks
+# are intersected exactly instead.
+RANKED_PER_PREFIX = 64
+EXACT_SCAN_MAX = 512
+
+RankKey = tuple[int, int, float]
+
+
+def _rank(record: dict[str, Any]) -> RankKey:
+    # Negated so that ascending order is best-first.
+    return (-int(bool(record["render_cached"])), -int(record["popularity"]), -float(record["last_seen"]))
+
+
+class TrackSuggestIndex:
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        max_entries: int = 50_000,
+        save_every: int = 50,
+        save_delay_sec: float = 5.0,
+    ) -> None:
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self.save_every = max(1, save_every)
+        self.save_delay_sec = max(0.0, save_delay_sec)
+        # Least recently seen first, so eviction is a popitem.
+        self.tracks: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self.prefixes: dict[str, set[str]] = {}
+        # A prefix missing here is rebuilt from its postings on the next suggest.
+        self.ranked: dict[str, list[str]] = {}
+        self._dirty = 0
+        self._save_task: Optional[asyncio.Task[None]] = None
+        self.load()
+
+    @staticmethod
+    def _tokens(value: str) -> list[str]:
+        text = unicodedata.normalize("NFKC", value).lower()
+        cleaned = "".join(ch if ch.isalnum() else " " for ch in text)
+        return cleaned.split()
+
+    def _index_keys(self, record: dict[str, Any]) -> set[str]:
+        keys: set[str] = set()
+        for token in self._tokens(f"{record['title']} {record['artist']}"):
+            for end in range(1, min(len(token), MAX_PREFIX_LEN) + 1):
+                keys.add(token[:end])
+        return keys
+
+    def _add_to_index(self, track_id: str, record: dict[str, Any]) -> None:
+        for key in self._index_keys(record):
+            self.prefixes.setdefault(key, set()).add(track_id)
+
+    def _remove_from_index(self, track_id: str, record: dict[str, Any]) -> None:
+        for key in self._index_keys(record):
+            postings = self.prefixes.get(key)
+            if postings is None:
+                continue
+            postings.discard(track_id)
+            if not postings:
+                self.prefixes.pop(key, None)
+                self.ranked.pop(key, None)
+                continue
+            ranked = self.ranked.get(key)
+            if ranked is not None and track_id in ranked:
+                ranked.remove(track_id)
+                if len(ranked) < len(postings):
+                    self.ranked.pop(key, None)
+
+    def _promote(self, track_id: str, record: dict[str, Any]) -> None:
+        # Ranks only ever rise (popularity, render_cached and last_seen grow), so a track can enter a prefix's
+        # top list but never needs to be demoted out of it by its own update.
+        rank = _rank(record)
+        for key in self._index_keys(record):
+            ranked = self.ranked.get(key)
+            if ranked is None:
+                if len(self.prefixes.get(key, ())) == 1:
+                    self.ranked[key] = [track_id]
+                continue
+            if track_id in ranked:
+                ranked.remove(track_id)
+            elif len(ranked) >= RANKED_PER_PREFIX and rank >= _rank(self.tracks[ranked[-1]]):
+                continue
+            ranked.insert(bisect.bisect_left(ranked, rank, key=lambda other: _rank(self.tracks[other])), track_id)
+            if len(ranked) > RANKED_PER_PREFIX:
+                ranked.pop()
+
+    def _ranked(self, key: str) -> list[str]:
+        ranked = self.ranked.get(key)
+        if ranked is None:
+            ranked = heapq.nsmallest(RANKED_PER_PREFIX, self.prefixes.get(key, ()), key=lambda track_id: _rank(self.tracks[track_id]))
+            self.ranked[key] = ranked
+        return ranked
+
+    def _evict(self) -> None:
+        while len(self.tracks) > self.max_entries:
+            track_id, record = self.tracks.popitem(last=False)
+            self._remove_from_index(track_id, record)
+
+    def _upsert(self, track: dict[str, Any], popularity: int) -> Optional[dict[str, Any]]:
+        track_id = str(track.get("track_id") or "")
+        title = str(track.get("title") or "").strip()
+        artist = str(track.get("artist") or "").strip()
+        if not track_id or not title or not artist:
+            return None
+
+        record = self.tracks.get(track_id)
+        if record is None:
+            record = {
+                "track_id": track_id,
+                "album_id": None,
+                "title": title,
+                "artist": artist,
+                "album_art_url": None,
+                "youtube_video_id": None,
+                "youtube_embed_url": None,
+                "popularity": 0,
+                "render_cached": False,
+                "video_url": None,
+                "last_seen": 0.0,
+            }
+            self.tracks[track_id] = record
+            self._add_to_index(track_id, record)
+        else:
+            self.tracks.move_to_end(track_id)
+
+        for field in ("album_id", "album_art_url", "youtube_video_id", "youtube_embed_url"):
+            if track.get(field):
+                record[field] = track[field]
+        record["popularity"] += popularity
+        record["last_seen"] = time.time()
+        return record
+
+    def _touch(self, changes: int = 1) -> None:
+        self._evict()
+        self._dirty += changes
+        if self._dirty >= self.save_every:
+            self._schedule_save()
+
+    def observe_tracks(self, tracks: Iterable[dict[str, Any]]) -> None:
+        changes = 0
+        for track in tracks:
+            record = self._upsert(track, SEARCH_POPULARITY)
+            if record is not None:
+                self._promote(record["track_id"], record)
+                changes += 1
+        if changes:
+            self._touch(changes)
+
+    def mark_rendered(self, track: dict[str, Any], video_url: Optional[str]) -> None:
+        record = self._upsert(track, RENDER_POPULARITY)
+        if record is None:
+            return
+        record["render_cached"] = True
+        record["video_url"] = video_url or record.get("video_url")
+        self._promote(record["track_id"], record)
+        self._touch()
+
+    def suggest(self, query: str, limit: int = 5) -> list[dict[str, Any]]:
+        keys = [token[:MAX_PREFIX_LEN] for token in self._tokens(query)]
+        if not keys:
+            return []
+        postings = [self.prefixes.get(key) for key in keys]
+        if any(not posting for posting in postings):
+            return []
+
+        by_size = sorted(zip(keys, postings), key=lambda item: len(item[1]))  # type: ignore[arg-type]
+        smallest = by_size[0][1]
+        if len(smallest) <= EXACT_SCAN_MAX or limit > RANKED_PER_PREFIX:
+            candidates: Iterable[str] = smallest
+            others = [posting for _, posting in by_size[1:]]
+        else:
+            # Every token is broad: only each prefix's pre-ranked leaders are considered.
+            candidates = {track_id for key, _ in by_size for track_id in self._ranked(key)}
+            others = [posting for _, posting in by_size]
+        matches = [track_id for track_id in candidates if all(track_id in posting for posting in others)]
+        ranked = heapq.nsmallest(limit, matches, key=lambda track_id: _rank(self.tracks[track_id]))
+        return [dict(self.tracks[track_id]) for track_id in ranked]
+
+    def load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            records = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as exc:
+            logger.warning("failed to load suggest index: %s", exc)
+            return
+        valid = [record for record in records if isinstance(record, dict) and record.get("track_id")] if isinstance(records, list) else []
+        for record in sorted(valid, key=lambda record: float(record.get("last_seen") or 0.0)):
+            track_id = str(record["track_id"])
+            self.tracks[track_id] = record
+            self.tracks.move_to_end(track_id)
+            self._add_to_index(track_id, record)
+        self._evict()
+
+    def _schedule_save(self) -> None:
+        if self.path is None:
+            self._dirty = 0
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.save()
+            return
+        if self._save_task is None or self._save_task.done():
+            self._save_task = loop.create_task(self._save_later(), name="suggest-index-save")
+
+    async def _save_later(self) -> None:
+        # Debounced: one snapshot per save_delay_sec, serialised and written off the event loop.
+        await asyncio.sleep(self.save_delay_sec)
+        self._dirty = 0
+        # Records only ever change values, never keys, so the worker thread can serialise them while the loop runs.
+        await asyncio.to_thread(self._write, list(self.tracks.values()))
+
+    def _write(self, records: list[dict[str, Any]]) -> None:
+        if self.path is None:
+            return
+        tmp_path = self.path.with_suffix(".tmp")
+        try:
+            tmp_path.write_text(json.dumps(records, ensure_ascii=True), encoding="utf-8")
+            tmp_path.replace(self.path)
+        except OSError as exc:
+            logger.warning("failed to save suggest index: %s", exc)
+
+    def save(self) -> None:
+        self._dirty = 0
+        self._write(list(self.tracks.values()))
+
+    async def close(self) -> None:
+        if self._save_task is not None and not self._save_task.done():
+            self._save_task.cancel()
+            try:
+                await self._save_task
+            except asyncio.CancelledError:
+                pass
+        self._save_task = None
+        self._dirty = 0
+        await asyncio.to_thread(self._write, list(self.tracks.values()))
@@ -1,25 +1,116 @@
 from __future__ import annotations
 
+import asyncio
 import time
 from collections import OrderedDict
 import logging
+import sqlite3
+import threading
+from functools import partial
+from pathlib import Path
 from typing import Optional
 
 import httpx
 
+from .metrics import observe_upstream
+from .services_quota import (
+    YOUTUBE_SEARCH_COST,
+    YOUTUBE_VIDEOS_LIST_COST,
+    QuotaExhaustedError,
+    YouTubeQuotaBudget,
+)
+from .singleflight import SingleFlight
+
 
 logger = logging.getLogger(__name__)
 
+LookupResult = tuple[Optional[str], Optional[str], int]
+
+
+class YouTubeLookupStore:
+    PRUNE_EVERY_WRITES = 200
+
+    def __init__(self, path: Path, retention_sec: int) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.retention_sec = max(0, retention_sec)
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS youtube_lookup (
+                key TEXT PRIMARY KEY,
+                video_id TEXT,
+                embed_url TEXT,
+                view_count INTEGER NOT NULL,
+                created_ts REAL NOT NULL
+            )
+            """
+        )
+
+    def get(self, key: str) -> Optional[tuple[float, LookupResult]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_ts, video_id, embed_url, view_count FROM youtube_lookup WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if not row:
+            return None
+        created_ts, video_id, embed_url, view_count = row
+        return float(created_ts), (video_id, embed_url, int(view_count))
+
+    def set(self, key: str, created_ts: float, result: LookupResult) -> None:
+        video_id, embed_url, view_count = result
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO youtube_lookup (key, video_id, embed_url, view_count, created_ts) VALUES (?, ?, ?, ?, ?)",
+                (key, video_id, embed_url, int(view_count), created_ts),
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY_WRITES == 0:
+                self._conn.execute("DELETE FROM youtube_lookup WHERE created_ts < ?", (created_ts - self.retention_sec,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
 
 class YouTubeService:
     SEARCH_URL = "https://www.googleapis.com/youtube/v3/search"
     VIDEOS_URL = "https://www.googleapis.com/youtube/v3/videos"
+    SEARCH_MAX_RESULTS = 3
+    VIDEOS_MAX_IDS = 50
 
-    def __init__(self, api_key: str, cache_ttl_sec: int = 86_400, cache_max_size: int = 2_000) -> None:
+    def __init__(
+        self,
+        api_key: str,
+        cache_ttl_sec: int = 86_400,
+        cache_max_size: int = 2_000,
+        negative_cache_ttl_sec: int = 3_600,
+        stale_ttl_sec: int = 0,
+        cache_db_path: Optional[Path] = None,
+        stats_cache_ttl_sec: int = 21_600,
+        quota_budget: Optional[YouTubeQuotaBudget] = None,
+    ) -> None:
         self.api_key = api_key
         self.cache_ttl_sec = max(0, cache_ttl_sec)
         self.cache_max_size = max(0, cache_max_size)
-        self.cache: OrderedDict[str, tuple[float, tuple[Optional[str], Optional[str], int]]] = OrderedDict()
+        self.negative_cache_ttl_sec = max(0, min(negative_cache_ttl_sec, self.cache_ttl_sec))
+        self.stale_ttl_sec = max(0, stale_ttl_sec)
+        self.cache: OrderedDict[str, tuple[float, LookupResult]] = OrderedDict()
+        self.lookup_flight: SingleFlight[LookupResult] = SingleFlight()
+        self.store: Optional[YouTubeLookupStore] = None
+        if cache_db_path is not None and self._cache_enabled():
+            self.store = YouTubeLookupStore(cache_db_path, retention_sec=self.cache_ttl_sec + self.stale_ttl_sec)
+        self._refresh_tasks: set[asyncio.Task[LookupResult]] = set()
+        self._batch_tasks: set[asyncio.Task[None]] = set()
+        self.stats_cache_ttl_sec = max(0, stats_cache_ttl_sec)
+        # Each lookup stores statistics for up to SEARCH_MAX_RESULTS videos.
+        self.stats_cache_max_size = self.cache_max_size * self.SEARCH_MAX_RESULTS
+        self.stats_cache: OrderedDict[str, tuple[float, int]] = OrderedDict()
+        self.quota_budget = quota_budget
 
     @staticmethod
     def _normalize(value: str) -> str:
@@ -28,44 +119,291 @@ class YouTubeService:
     def _cache_key(self, title: str, artist: str) -> str:
         return f"{self._normalize(title)}::{self._normalize(artist)}"
 
-    def _cache_get(self, key: str) -> Optional[tuple[Optional[str], Optional[str], int]]:
-        if self.cache_ttl_sec <= 0 or self.cache_max_size <= 0:
+    def _cache_enabled(self) -> bool:
+        return self.cache_ttl_sec > 0 and self.cache_max_size > 0
+
+    def _ttl_for(self, result: LookupResult) -> int:
+        return self.cache_ttl_sec if result[0] else self.negative_cache_ttl_sec
+
+    def _remember(self, key: str, created_ts: float, result: LookupResult) -> None:
+        self.cache[key] = (created_ts, result)
+        self.cache.move_to_end(key)
+
+        while len(self.cache) > self.cache_max_size:
+            self.cache.popitem(last=False)
+
+    async def _cache_entry(self, key: str) -> Optional[tuple[float, LookupResult]]:
+        if not self._cache_enabled():
             return None
 
+        now = time.time()
         entry = self.cache.get(key)
+        if entry and (now - entry[0]) <= self._ttl_for(entry[1]):
+            self.cache.move_to_end(key)
+            return entry
+
+        if self.store is not None:
+            # Off the event loop: another process may hold the DB's write lock for up to its busy timeout.
+            try:
+                stored = await asyncio.to_thread(self.store.get, key)
+            except sqlite3.Error as exc:
+                logger.warning("youtube cache read failed: %s", exc)
+                stored = None
+            # Re-read: a lookup may have finished while the store was being queried.
+            entry = self.cache.get(key)
+            if stored and (not entry or stored[0] > entry[0]):
+                self._remember(key, *stored)
+                entry = stored
+
+        if entry and (now - entry[0]) > self._ttl_for(entry[1]) + self.stale_ttl_sec:
+            self.cache.pop(key, None)
+            return None
+        return entry
+
+    async def _cache_get(self, key: str) -> Optional[LookupResult]:
+        entry = await self._cache_entry(key)
         if not entry:
             return None
 
         created_ts, result = entry
-        if (time.monotonic() - created_ts) > self.cache_ttl_sec:
-            self.cache.pop(key, None)
+        if (time.time() - created_ts) > self._ttl_for(result):
             return None
-
-        self.cache.move_to_end(key)
         return result
 
-    def _cache_set(self, key: str, result: tuple[Optional[str], Optional[str], int]) -> None:
-        if self.cache_ttl_sec <= 0 or self.cache_max_size <= 0:
+    async def is_cached(self, title: str, artist: str) -> bool:
+        return await self._cache_entry(self._cache_key(title, artist)) is not None
+
+    async def _cache_set(self, key: str, result: LookupResult) -> None:
+        if not self._cache_enabled():
             return
 
-        self.cache[key] = (time.monotonic(), result)
-        self.cache.move_to_end(key)
+        created_ts = time.time()
+        self._remember(key, created_ts, result)
+        if self.store is not None:
+            try:
+                await asyncio.to_thread(self.store.set, key, created_ts, result)
+            except sqlite3.Error as exc:
+                logger.warning("youtube cache write failed: %s", exc)
 
-        while len(self.cache) > self.cache_max_size:
-            self.cache.popitem(last=False)
+    def _stats_cache_get(self, video_id: str) -> Optional[int]:
+        if self.stats_cache_ttl_sec <= 0 or self.stats_cache_max_size <= 0:
+            return None
+
+        entry = self.stats_cache.get(video_id)
+        if not entry:
+            return None
+
+        created_ts, view_count = entry
+        if (time.time() - created_ts) > self.stats_cache_ttl_sec:
+            self.stats_cache.pop(video_id, None)
+            return None
+
+        self.stats_cache.move_to_end(video_id)
+        return view_count
+
+    def _stats_cache_set(self, video_id: str, view_count: int) -> None:
+        if self.stats_cache_ttl_sec <= 0 or self.stats_cache_max_size <= 0:
+            return
+
+        self.stats_cache[video_id] = (time.time(), view_count)
+        self.stats_cache.move_to_end(video_id)
+
+        while len(self.stats_cache) > self.stats_cache_max_size:
+            self.stats_cache.popitem(last=False)
+
+    def close(self) -> None:
+        if self.store is not None:
+            self.store.close()
+            self.store = None
 
-    async def lookup_track(self, title: str, artist: str) -> tuple[Optional[str], Optional[str], int]:
+    def _schedule_refresh(self, cache_key: str, title: str, artist: str) -> None:
+        if self.lookup_flight.is_inflight(cache_key):
+            return
+        task = asyncio.ensure_future(
+            self.lookup_flight.do(cache_key, lambda: self._lookup_and_cache(cache_key, title, artist))
+        )
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def lookup_track(self, title: str, artist: str) -> LookupResult:
         cache_key = self._cache_key(title, artist)
-        cached = self._cache_get(cache_key)
-        if cached is not None:
-            return cached
+        entry = await self._cache_entry(cache_key)
+        if entry is not None:
+            created_ts, result = entry
+            if (time.time() - created_ts) > self._ttl_for(result) and self.api_key:
+                # Serve the stale entry immediately and refresh it in the background.
+                self._schedule_refresh(cache_key, title, artist)
+            return result
 
         if not self.api_key:
             return None, None, 0
 
-        query = f"{title} {artist} official audio"
+        return await self.lookup_flight.do(cache_key, lambda: self._lookup_and_cache(cache_key, title, artist))
+
+    async def _lookup_and_cache(self, cache_key: str, title: str, artist: str) -> LookupResult:
+        try:
+            result = await self._request_lookup(title, artist)
+        except QuotaExhaustedError as exc:
+            # Not cached: the lookup should run once budget is available again.
+            logger.info("youtube lookup skipped: %s", exc)
+            return None, None, 0
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("youtube lookup failed: %s", exc)
+            result = (None, None, 0)
+        await self._cache_set(cache_key, result)
+        return result
+
+    async def lookup_tracks(self, tracks: list[tuple[str, str]]) -> list[LookupResult]:
+        futures = await self.lookup_futures(tracks)
+        if futures:
+            await asyncio.wait(futures)
+        return [(None, None, 0) if future.exception() else future.result() for future in futures]
+
+    async def lookup_futures(
+        self,
+        tracks: list[tuple[str, str]],
+        search_timeout_sec: Optional[float] = None,
+    ) -> list[asyncio.Future[LookupResult]]:
+        # One future per track: cache hits are already resolved, misses share one batched statistics call.
+        loop = asyncio.get_running_loop()
+        resolved: dict[int, LookupResult] = {}
+        pending: dict[str, tuple[str, str]] = {}
+        for index, (title, artist) in enumerate(tracks):
+            cache_key = self._cache_key(title, artist)
+            entry = await self._cache_entry(cache_key)
+            if entry is not None:
+                created_ts, result = entry
+                if (time.time() - created_ts) > self._ttl_for(result) and self.api_key:
+                    self._schedule_refresh(cache_key, title, artist)
+                resolved[index] = result
+            elif not self.api_key:
+                resolved[index] = (None, None, 0)
+            elif cache_key not in pending and not self.lookup_flight.is_inflight(cache_key):
+                pending[cache_key] = (title, artist)
+
+        waits: dict[str, asyncio.Future[LookupResult]] = {}
+        if pending:
+            batch: dict[str, asyncio.Future[LookupResult]] = {cache_key: loop.create_future() for cache_key in pending}
+            driver = asyncio.ensure_future(self._lookup_batch(pending, batch, search_timeout_sec))
+            self._batch_tasks.add(driver)
+            driver.add_done_callback(self._batch_tasks.discard)
+            for cache_key in pending:
+                waits[cache_key] = asyncio.ensure_future(
+                    self.lookup_flight.do(cache_key, partial(self._batch_result, batch[cache_key]))
+                )
 
+        futures: list[asyncio.Future[LookupResult]] = []
+        for index, (title, artist) in enumerate(tracks):
+            if index in resolved:
+                future: asyncio.Future[LookupResult] = loop.create_future()
+                future.set_result(resolved[index])
+                futures.append(future)
+                continue
+            cache_key = self._cache_key(title, artist)
+            if cache_key not in waits:
+                # Another request is already looking this key up; join its flight.
+                waits[cache_key] = asyncio.ensure_future(
+                    self.lookup_flight.do(cache_key, partial(self._lookup_and_cache, cache_key, title, artist))
+                )
+            futures.append(waits[cache_key])
+        return futures
+
+    @staticmethod
+    async def _batch_result(future: asyncio.Future[LookupResult]) -> LookupResult:
+        return await asyncio.shield(future)
+
+    async def _lookup_batch(
+        self,
+        pending: dict[str, tuple[str, str]],
+        batch: dict[str, asyncio.Future[LookupResult]],
+        search_timeout_sec: Optional[float] = None,
+    ) -> None:
+        searches = {asyncio.ensure_future(self._search_video_ids(*pending[key])): key for key in pending}
+        remaining = set(searches)
         try:
+            timeout = search_timeout_sec
+            while remaining:
+                # Searches finished within the timeout share one statistics call; the stragglers share the next.
+                done, remaining = await asyncio.wait(remaining, timeout=timeout)
+                timeout = None
+                if not done:
+                    continue
+                results = await self._resolve_searches({key: task for task, key in searches.items() if task in done})
+                for key, result in results.items():
+                    if not batch[key].done():
+                        batch[key].set_result(result)
+        except BaseException as exc:
+            for task in remaining:
+                task.cancel()
+            for future in batch.values():
+                if future.done():
+                    continue
+                if isinstance(exc, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(exc)
+            raise
+
+    async def _resolve_searches(self, searches: dict[str, asyncio.Future[list[str]]]) -> dict[str, LookupResult]:
+        video_ids_by_key: dict[str, list[str]] = {}
+        skipped_keys: set[str] = set()
+        for key, search in searches.items():
+            exc = search.exception()
+            if isinstance(exc, QuotaExhaustedError):
+                skipped_keys.add(key)
+                continue
+            if exc is not None:
+                logger.warning("youtube search failed: %s", exc)
+                continue
+            video_ids_by_key[key] = search.result()
+
+        all_video_ids = [video_id for video_ids in video_ids_by_key.values() for video_id in video_ids]
+        try:
+            views_by_id = await self.get_view_counts(all_video_ids)
+            stats_failed = False
+        except QuotaExhaustedError as exc:
+            logger.info("youtube statistics skipped: %s", exc)
+            views_by_id = {}
+            stats_failed = True
+            skipped_keys.update(video_ids_by_key)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("youtube statistics lookup failed: %s", exc)
+            views_by_id = {}
+            stats_failed = True
+
+        results: dict[str, LookupResult] = {}
+        for key in searches:
+            video_ids = video_ids_by_key.get(key)
+            if not video_ids:
+                result: LookupResult = (None, None, 0)
+            else:
+                result = self._pick_best(video_ids, views_by_id)
+            # A found video without stats is still a usable hit, but it is not
+            # cached so the next lookup retries the statistics call.
+            if key not in skipped_keys and not (video_ids and stats_failed):
+                await self._cache_set(key, result)
+            results[key] = result
+        return results
+
+    @staticmethod
+    def _pick_best(video_ids: list[str], views_by_id: dict[str, int]) -> LookupResult:
+        best_id = max(video_ids, key=lambda vid: views_by_id.get(vid, 0))
+        best_views = views_by_id.get(best_id, 0)
+        return best_id, f"https://www.youtube.com/embed/{best_id}", best_views
+
+    async def _request_lookup(self, title: str, artist: str) -> LookupResult:
+        video_ids = await self._search_video_ids(title, artist)
+        if not video_ids:
+            return None, None, 0
+        views_by_id = await self.get_view_counts(video_ids)
+        return self._pick_best(video_ids, views_by_id)
+
+    async def _search_video_ids(self, title: str, artist: str) -> list[str]:
+        query = f"{title} {artist} official audio"
+        if self.quota_budget is not None:
+            await asyncio.to_thread(self.quota_budget.consume, YOUTUBE_SEARCH_COST)
+
+        with observe_upstream("youtube", "search"):
             async with httpx.AsyncClient(timeout=12) as client:
                 search_resp = await client.get(
                     self.SEARCH_URL,
@@ -73,7 +411,7 @@ class YouTubeService:
                         "part": "snippet",
                         "q": query,
                         "type": "video",
-                        "maxResults": 3,
+                        "maxResults": self.SEARCH_MAX_RESULTS,
                         "videoEmbeddable": "true",
                         "key": self.api_key,
                     },
@@ -81,10 +419,30 @@ class YouTubeService:
                 search_resp.raise_for_status()
                 search_data = search_resp.json()
 
-                video_ids = [item["id"]["videoId"] for item in search_data.get("items", []) if item.get("id", {}).get("videoId")]
-                if not video_ids:
-                    return None, None, 0
+        return [item["id"]["videoId"] for item in search_data.get("items", []) if item.get("id", {}).get("videoId")]
+
+    async def get_view_counts(self, video_ids: list[str]) -> dict[str, int]:
+        views_by_id: dict[str, int] = {}
+        missing: list[str] = []
+        for video_id in dict.fromkeys(video_ids):
+            cached = self._stats_cache_get(video_id)
+            if cached is not None:
+                views_by_id[video_id] = cached
+            else:
+                missing.append(video_id)
+
+        for offset in range(0, len(missing), self.VIDEOS_MAX_IDS):
+            fetched = await self._request_statistics(missing[offset : offset + self.VIDEOS_MAX_IDS])
+            for video_id, view_count in fetched.items():
+                self._stats_cache_set(video_id, view_count)
+            views_by_id.update(fetched)
+        return views_by_id
 
+    async def _request_statistics(self, video_ids: list[str]) -> dict[str, int]:
+        if self.quota_budget is not None:
+            await asyncio.to_thread(self.quota_budget.consume, YOUTUBE_VIDEOS_LIST_COST)
+        with observe_upstream("youtube", "videos"):
+            async with httpx.AsyncClient(timeout=12) as client:
                 stats_resp = await client.get(
                     self.VIDEOS_URL,
                     params={
@@ -96,20 +454,10 @@ class YouTubeService:
                 stats_resp.raise_for_status()
                 stats_data = stats_resp.json()
 
-            views_by_id: dict[str, int] = {}
-            for item in stats_data.get("items", []):
-                video_id = item.get("id")
-                view_count = int(item.get("statistics", {}).get("viewCount", 0))
-                if video_id:
-                    views_by_id[video_id] = view_count
-
-            best_id = max(video_ids, key=lambda vid: views_by_id.get(vid, 0))
-            best_views = views_by_id.get(best_id, 0)
-            result = (best_id, f"https://www.youtube.com/embed/{best_id}", best_views)
-            self._cache_set(cache_key, result)
-            return result
-        except Exception as exc:  # noqa: BLE001
-            logger.warning("youtube lookup failed: %s", exc)
-            result = (None, None, 0)
-            self._cache_set(cache_key, result)
-            return result
+        views_by_id: dict[str, int] = {}
+        for item in stats_data.get("items", []):
+            video_id = item.get("id")
+            view_count = int(item.get("statistics", {}).get("viewCount", 0))
+            if video_id:
+                views_by_id[video_id] = view_count
+        return views_by_id
@@ -4,12 +4,33 @@ import hashlib
 import json
 import mimetypes
 import shutil
+import struct
+import zlib
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
 
 import httpx
 
 from .config import Settings
+from .metrics import observe_upstream
+
+
+WARMUP_IMAGE_FILENAME = "warmup_256.png"
+PREVIEW_EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp"}
+
+
+def _solid_png(width: int, height: int, rgb: tuple[int, int, int]) -> bytes:
+    def chunk(kind: bytes, body: bytes) -> bytes:
+        return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body) & 0xFFFFFFFF)
+
+    row = b"\x00" + bytes(rgb) * width
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(row * height))
+        + chunk(b"IEND", b"")
+    )
 
 
 class Storage:
@@ -67,10 +88,16 @@ class Storage:
             f"/static/renders/{cache_key}/thumb.jpg",
         )
 
+    def hls_url(self, cache_key: str) -> Optional[str]:
+        if not (self.render_dir(cache_key) / "hls" / "index.m3u8").exists():
+            return None
+        return f"/static/renders/{cache_key}/hls/index.m3u8"
+
     async def download_album_art(self, album_art_url: str, timeout_sec: int = 30) -> tuple[bytes, str]:
-        async with httpx.AsyncClient(timeout=timeout_sec) as client:
-            response = await client.get(album_art_url)
-            response.raise_for_status()
+        with observe_upstream("art_cdn", "download"):
+            async with httpx.AsyncClient(timeout=timeout_sec) as client:
+                response = await client.get(album_art_url)
+                response.raise_for_status()
 
         content_type = response.headers.get("content-type", "").split(";")[0].strip()
         ext = mimetypes.guess_extension(content_type) or ".jpg"
@@ -89,6 +116,12 @@ class Storage:
 
         return filename
 
+    def ensure_warmup_image(self) -> str:
+        comfy_input = self.settings.comfy_input_dir / WARMUP_IMAGE_FILENAME
+        if not comfy_input.exists():
+            comfy_input.write_bytes(_solid_png(256, 256, (128, 128, 128)))
+        return WARMUP_IMAGE_FILENAME
+
     def ensure_render_dir(self, cache_key: str) -> Path:
         render_dir = self.render_dir(cache_key)
         render_dir.mkdir(parents=True, exist_ok=True)
@@ -99,6 +132,26 @@ class Storage:
         meta_path = render_dir / "meta.json"
         meta_path.write_text(json.dumps(data, ensure_ascii=True, indent=2), encoding="utf-8")
 
+    def write_preview(self, cache_key: str, image: bytes, media_type: str) -> None:
+        render_dir = self.ensure_render_dir(cache_key)
+        ext = PREVIEW_EXTENSIONS.get(media_type, ".jpg")
+        tmp_path = render_dir / f"preview{ext}.tmp"
+        tmp_path.write_bytes(image)
+        tmp_path.replace(render_dir / f"preview{ext}")
+
+    def read_preview(self, cache_key: str) -> Optional[tuple[bytes, str]]:
+        render_dir = self.render_dir(cache_key)
+        for media_type, ext in PREVIEW_EXTENSIONS.items():
+            try:
+                return (render_dir / f"preview{ext}").read_bytes(), media_type
+            except FileNotFoundError:
+                continue
+        return None
+
+    def delete_preview(self, cache_key: str) -> None:
+        for ext in PREVIEW_EXTENSIONS.values():
+            (self.render_dir(cache_key) / f"preview{ext}").unlink(missing_ok=True)
+
     def write_job(self, job_id: str, data: dict[str, Any]) -> None:
         path = self.settings.jobs_dir / f"{job_id}.json"
         path.write_text(json.dumps(data, ensure_ascii=True, indent=2), encoding="utf-8")
@@ -116,3 +169,12 @@ class Storage:
             except json.JSONDecodeError:
                 continue
         return jobs
+
+    def load_render_metas(self) -> list[dict[str, Any]]:
+        metas: list[dict[str, Any]] = []
+        for path in self.settings.renders_dir.glob("*/meta.json"):
+            try:
+                metas.append(json.loads(path.read_text(encoding="utf-8")))
+            except json.JSONDecodeError:
+                continue
+        return metas
@@ -0,0 +1,333 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import random
+import secrets
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional, Protocol, Union
+
+
+logger = logging.getLogger(__name__)
+
+
+def new_trace_id() -> str:
+    return secrets.token_hex(16)
+
+
+def new_span_id() -> str:
+    return secrets.token_hex(8)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ts: float
+    attributes: dict[str, Any] = field(default_factory=dict)
+    duration_sec: float = 0.0
+    status: str = "ok"
+    error: Optional[str] = None
+    start_perf: float = field(default=0.0, repr=False)
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ts": round(self.start_ts, 6),
+            "duration_sec": round(self.duration_sec, 6),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    trace_id: Optional[str] = None
+    span_id: Optional[str] = None
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+AnySpan = Union[Span, _NoopSpan]
+
+# Holds NOOP_SPAN once a root decided not to sample, so nested work does not start traces of its own.
+_current_span: ContextVar[Optional[AnySpan]] = ContextVar("trace_current_span", default=None)
+
+
+class SpanExporter(Protocol):
+    def export(self, span: Span) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class JsonLinesExporter:
+    def __init__(self, path: Path, flush_every: int = 64) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self._lock = threading.Lock()
+        self._buffer: list[str] = []
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            self._buffer.append(line)
+            if len(self._buffer) >= self.flush_every:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._buffer:
+            return
+        # The API and the standalone worker append to the same file; one write() per line on an O_APPEND
+        # descriptor keeps their lines from interleaving.
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            for line in self._buffer:
+                os.write(fd, (line + "\n").encode("utf-8"))
+        finally:
+            os.close(fd)
+        self._buffer.clear()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        self.flush()
+
+
+class LoggingExporter:
+    def __init__(self, log: logging.Logger = logger) -> None:
+        self.log = log
+
+    def export(self, span: Span) -> None:
+        self.log.info("span %s", json.dumps(span.to_dict(), ensure_ascii=False, default=str))
+
+    def close(self) -> None:
+        pass
+
+
+class Tracer:
+    def __init__(
+        self,
+        sample_rate: float = 0.0,
+        exporter: Optional[SpanExporter] = None,
+        rng: Callable[[], float] = random.random,
+    ) -> None:
+        self.sample_rate = 0.0
+        self.exporter: Optional[SpanExporter] = None
+        self.rng = rng
+        self.configure(sample_rate, exporter)
+
+    def configure(self, sample_rate: float, exporter: Optional[SpanExporter]) -> None:
+        previous = self.exporter
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self.exporter = exporter
+        if previous is not None and previous is not exporter:
+            previous.close()
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None and self.sample_rate > 0
+
+    def current(self) -> Optional[Span]:
+        span = _current_span.get()
+        return span if isinstance(span, Span) else None
+
+    def should_sample(self) -> bool:
+        return self.enabled and (self.sample_rate >= 1.0 or self.rng() < self.sample_rate)
+
+    def _start(self, name: str, trace_id: Optional[str], parent_id: Optional[str], attributes: dict[str, Any]) -> Optional[Span]:
+        if self.exporter is None:
+            return None
+        if trace_id is None:
+            parent = _current_span.get()
+            if isinstance(parent, Span):
+                trace_id, parent_id = parent.trace_id, parent.span_id
+            elif parent is None and self.should_sample():
+                trace_id = new_trace_id()
+            else:
+                return None
+        return Span(
+            name=name,
+            trace_id=trace_id,
+            span_id=new_span_id(),
+            parent_id=parent_id,
+            start_ts=time.time(),
+            attributes=attributes,
+            start_perf=time.perf_counter(),
+        )
+
+    @contextlib.contextmanager
+    def span(
+        self, name: str, trace_id: Optional[str] = None, parent_id: Optional[str] = None, **attributes: Any
+    ) -> Iterator[AnySpan]:
+        # Joins the current trace, continues an explicit trace_id, or starts a new trace if this one is sampled.
+        span = self._start(name, trace_id, parent_id, attributes)
+        if span is None:
+            with self.suppressed():
+                yield NOOP_SPAN
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except asyncio.CancelledError:
+            span.status = "cancelled"
+            raise
+        except BaseException as exc:
+            span.status = "error"
+            span.error = f"{type(exc).__name__}: {exc}"[:300]
+            raise
+        finally:
+            _current_span.reset(token)
+            span.duration_sec = time.perf_counter() - span.start_perf
+            self._export(span)
+
+    @contextlib.contextmanager
+    def suppressed(self) -> Iterator[_NoopSpan]:
+        token = _current_span.set(NOOP_SPAN)
+        try:
+            yield NOOP_SPAN
+        finally:
+            _current_span.reset(token)
+
+    def continued(
+        self, name: str, trace_id: Optional[str], parent_id: Optional[str] = None, **attributes: Any
+    ) -> contextlib.AbstractContextManager[AnySpan]:
+        # Work started by an earlier request is traced only if that request was sampled.
+        if not trace_id or self.exporter is None:
+            return self.suppressed()
+        return self.span(name, trace_id=trace_id, parent_id=parent_id, **attributes)
+
+    def record(
+        self,
+        name: str,
+        trace_id: Optional[str],
+        start_ts: float,
+        end_ts: float,
+        parent_id: Optional[str] = None,
+        **attributes: Any,
+    ) -> None:
+        # For intervals measured elsewhere, such as time spent queued between two processes.
+        if self.exporter is None or not trace_id:
+            return
+        if parent_id is None:
+            parent = _current_span.get()
+            if isinstance(parent, Span) and parent.trace_id == trace_id:
+                parent_id = parent.span_id
+        span = Span(
+            name=name,
+            trace_id=trace_id,
+            span_id=new_span_id(),
+            parent_id=parent_id,
+            start_ts=start_ts,
+            attributes=attributes,
+            duration_sec=max(0.0, end_ts - start_ts),
+        )
+        self._export(span)
+
+    def _export(self, span: Span) -> None:
+        exporter = self.exporter
+        if exporter is None:
+            return
+        try:
+            exporter.export(span)
+        except Exception as exc:  # noqa: BLE001
+            logger.debug("span export failed: %s", exc)
+
+    def close(self) -> None:
+        if self.exporter is not None:
+            self.exporter.close()
+
+
+TRACER = Tracer()
+
+
+def build_exporter(kind: str, path: Path) -> Optional[SpanExporter]:
+    if kind == "file":
+        return JsonLinesExporter(path)
+    if kind == "log":
+        return LoggingExporter()
+    return None
+
+
+def configure_tracing(sample_rate: float, exporter_kind: str, path: Path, tracer: Tracer = TRACER) -> Tracer:
+    exporter = build_exporter(exporter_kind, path) if sample_rate > 0 else None
+    tracer.configure(sample_rate, exporter)
+    return tracer
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[tuple[str, str]]:
+    # W3C traceparent: version-traceid-parentid-flags; only sampled parents are continued.
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3], 16)
+        int(parts[1], 16)
+        int(parts[2], 16)
+    except ValueError:
+        return None
+    if not flags & 0x01 or set(parts[1]) == {"0"}:
+        return None
+    return parts[1], parts[2]
+
+
+class TracingMiddleware:
+    def __init__(self, app: Any, tracer: Tracer = TRACER) -> None:
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope: dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or self.tracer.exporter is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        parent = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        trace_id, parent_id = parent if parent else (None, None)
+        if trace_id is None and not self.tracer.should_sample():
+            with self.tracer.suppressed():
+                await self.app(scope, receive, send)
+            return
+
+        method = scope.get("method", "GET")
+        with self.tracer.span(
+            f"HTTP {method}",
+            trace_id=trace_id or new_trace_id(),
+            parent_id=parent_id,
+            **{"http.method": method, "http.target": scope.get("path", "")},
+        ) as span:
+
+            async def send_with_trace(message: dict[str, Any]) -> None:
+                if message["type"] == "http.response.start":
+                    span.set(**{"http.status_code": message["status"]})
+                    message.setdefault("headers", [])
+                    message["headers"] = [*message["headers"], (b"x-trace-id", str(span.trace_id).encode("latin-1"))]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace)
+            finally:
+                route = scope.get("route")
+                if route is not None and isinstance(span, Span):
+                    span.name = f"HTTP {method} {getattr(route, 'path', '')}".rstrip()
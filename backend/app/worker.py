@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import signal
+from dataclasses import replace
+
+from .config import Settings, get_settings
+from .services_comfy import ComfyService
+from .services_jobstore import SQLiteJobStore
+from .services_queue import RenderQueueService
+from .storage import Storage
+from .tracing import TRACER, configure_tracing
+
+
+logger = logging.getLogger(__name__)
+
+
+def build_worker(settings: Settings) -> RenderQueueService:
+    # A standalone worker always claims from the shared store, even when the API processes disable their own worker.
+    settings = replace(settings, queue_backend="sqlite", render_worker_enabled=True)
+    storage = Storage(settings)
+    storage.ensure_directories()
+    return RenderQueueService(
+        settings=settings,
+        storage=storage,
+        comfy_service=ComfyService(settings=settings),
+        job_store=SQLiteJobStore(settings.queue_db_path),
+    )
+
+
+async def run_worker(settings: Settings) -> None:
+    # The tracer is process-wide, so only the process entry point configures and closes it.
+    configure_tracing(settings.trace_sample_rate, settings.trace_exporter, settings.trace_file_path)
+    queue_service = build_worker(settings)
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:  # pragma: no cover
+            pass
+
+    logger.info("render worker %s claiming from %s", queue_service.worker_id, settings.queue_db_path)
+    queue_service.start()
+    try:
+        await stop_event.wait()
+    finally:
+        logger.info("stopping render worker %s", queue_service.worker_id)
+        await queue_service.stop()
+        if queue_service.job_store is not None:
+            queue_service.job_store.close()
+        TRACER.close()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_worker(get_settings()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Requests/sec for the render status and history endpoints, pydantic response_model vs cached bytes.
+
+Runs in-process over httpx's ASGI transport on one core, so the numbers isolate routing and
+serialization from network and uvicorn overhead:
+
+    cd backend && python -m benchmarks.bench_render_status --requests 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Optional
+
+import httpx
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Query, Response
+
+from app import api_renders
+from app.config import get_settings
+from app.schemas import RenderHistoryItem, RenderHistoryResponse, RenderStatusResponse
+from app.services_comfy import ComfyService
+from app.services_queue import JobRecord, RenderQueueService, status_etag
+from app.storage import Storage
+
+
+def build_service(root: Path, history_size: int) -> RenderQueueService:
+    settings = replace(
+        get_settings(),
+        data_dir=root,
+        inputs_dir=root / "inputs",
+        renders_dir=root / "renders",
+        jobs_dir=root / "jobs",
+        comfy_input_dir=root / "comfy_input",
+        queue_backend="memory",
+    )
+    storage = Storage(settings)
+    storage.ensure_directories()
+    service = RenderQueueService(settings=settings, storage=storage, comfy_service=ComfyService(settings=settings))
+    for index in range(history_size):
+        job_id = f"job-{index:05d}"
+        service.jobs[job_id] = JobRecord(
+            job_id=job_id,
+            status="completed" if index else "processing",
+            phase="done" if index else "sampling",
+            progress=100 if index else 40,
+            track={
+                "track_id": str(index),
+                "title": f"Song {index}",
+                "artist": "Artist",
+                "album": "Album",
+                "album_art_url": f"https://example.com/art/{index}.jpg",
+            },
+            result={"video_url": f"/static/renders/{index}/video.mp4", "thumbnail_url": None, "cache_key": f"k{index}"},
+            error={"code": None, "message": None},
+            cache_key=f"k{index}",
+            image_filename=f"{index}.jpg",
+            created_at=f"2026-02-07T09:{index % 60:02d}:00+00:00",
+            updated_at=f"2026-02-07T10:{index % 60:02d}:00+00:00",
+            version=3,
+        )
+    return service
+
+
+def legacy_router() -> APIRouter:
+    # The endpoints as they were before the cached-bytes path: nested models validated again by response_model.
+    router = APIRouter(prefix="/renders")
+
+    @router.get("/history", response_model=RenderHistoryResponse)
+    async def history(
+        limit: int = Query(default=6, ge=1, le=50),
+        queue_service: RenderQueueService = Depends(api_renders.get_queue_service),
+    ) -> RenderHistoryResponse:
+        records = await queue_service.list_history(limit=limit)
+        return RenderHistoryResponse(
+            items=[
+                RenderHistoryItem(
+                    job_id=record.job_id,
+                    status=record.status,  # type: ignore[arg-type]
+                    track={
+                        **record.track,
+                        "album_art_url": record.track.get("album_art_url")
+                        or (f"/static/inputs/{record.image_filename}" if record.image_filename else None),
+                    },
+                    result=record.result,
+                    created_at=record.created_at,
+                    updated_at=record.updated_at,
+                )
+                for record in records
+            ]
+        )
+
+    @router.get("/{job_id}", response_model=RenderStatusResponse)
+    async def status(
+        job_id: str,
+        response: Response,
+        wait: float = Query(default=0, ge=0, le=60),
+        if_none_match: Optional[str] = Header(default=None),
+        queue_service: RenderQueueService = Depends(api_renders.get_queue_service),
+    ) -> RenderStatusResponse | Response:
+        etag = await queue_service.job_etag(job_id)
+        if etag is None:
+            raise HTTPException(status_code=404, detail="job not found")
+        if wait > 0 and api_renders._etag_matches(if_none_match, etag):
+            etag = await queue_service.wait_for_change(job_id, etag, wait)
+        if etag is not None and api_renders._etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        result = await queue_service.get_job(job_id)
+        if not result:
+            raise HTTPException(status_code=404, detail="job not found")
+        response.headers["ETag"] = status_etag(result.version, result.queue_position)
+        response.headers["Cache-Control"] = "no-cache"
+        return result
+
+    return router
+
+
+def build_app(service: RenderQueueService, router: APIRouter) -> FastAPI:
+    app = FastAPI()
+    app.include_router(router, prefix="/api/v1")
+    app.dependency_overrides[api_renders.get_queue_service] = lambda: service
+    return app
+
+
+async def measure(app: FastAPI, path: str, requests: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(min(200, requests)):
+            (await client.get(path)).raise_for_status()
+        start = time.perf_counter()
+        for _ in range(requests):
+            await client.get(path)
+        elapsed = time.perf_counter() - start
+    return requests / elapsed
+
+
+async def run(requests: int, history_size: int, limit: int) -> list[dict[str, Any]]:
+    with tempfile.TemporaryDirectory() as tmp:
+        service = build_service(Path(tmp), history_size)
+        apps = {"before": build_app(service, legacy_router()), "after": build_app(service, api_renders.router)}
+        paths = {"status": "/api/v1/renders/job-00000", "history": f"/api/v1/renders/history?limit={limit}"}
+        results = []
+        for endpoint, path in paths.items():
+            before = await measure(apps["before"], path, requests)
+            after = await measure(apps["after"], path, requests)
+            results.append(
+                {
+                    "endpoint": endpoint,
+                    "before_rps": round(before, 1),
+                    "after_rps": round(after, 1),
+                    "speedup": round(after / before, 2),
+                }
+            )
+        return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--history-size", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=24)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.requests, args.history_size, args.limit))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'endpoint':<10} {'before req/s':>13} {'after req/s':>12} {'speedup':>8}")
+    for row in results:
+        print(f"{row['endpoint']:<10} {row['before_rps']:>13} {row['after_rps']:>12} {row['speedup']:>7}x")
+
+
+if __name__ == "__main__":
+    main()
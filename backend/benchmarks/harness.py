@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+
+Setup = Callable[[], Callable[[], Any]]
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    group: str
+    setup: Setup
+    params: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Result:
+    name: str
+    group: str
+    params: dict[str, Any]
+    loops: int
+    repeats: int
+    min_ns: float
+    median_ns: float
+    mean_ns: float
+    stdev_ns: float
+    ops_per_sec: float
+
+
+def measure(case: Case, repeats: int = 5, min_repeat_sec: float = 0.05) -> Result:
+    fn = case.setup()
+    fn()
+    # Calibrate the loop count so each repeat runs long enough for perf_counter to be precise.
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_repeat_sec or loops >= 1_000_000:
+            break
+        loops *= 10 if elapsed < min_repeat_sec / 10 else 2
+
+    timings: list[float] = []
+    for _ in range(max(1, repeats)):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        timings.append((time.perf_counter() - start) / loops * 1e9)
+
+    best = min(timings)
+    return Result(
+        name=case.name,
+        group=case.group,
+        params=case.params,
+        loops=loops,
+        repeats=len(timings),
+        min_ns=round(best, 1),
+        median_ns=round(statistics.median(timings), 1),
+        mean_ns=round(statistics.fmean(timings), 1),
+        stdev_ns=round(statistics.stdev(timings), 1) if len(timings) > 1 else 0.0,
+        ops_per_sec=round(1e9 / best, 1) if best > 0 else 0.0,
+    )
+
+
+def git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=RESULTS_DIR.parent
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def build_report(results: list[Result]) -> dict[str, Any]:
+    return {
+        "meta": {
+            "commit": git_revision(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+        },
+        "results": [asdict(result) for result in results],
+    }
+
+
+def write_report(report: dict[str, Any], path: Optional[Path] = None) -> Path:
+    if path is None:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        path = RESULTS_DIR / f"{stamp}-{report['meta']['commit'] or 'nogit'}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2, sort_keys=True), encoding="utf-8")
+    return path
+
+
+def latest_report(exclude: Optional[Path] = None) -> Optional[Path]:
+    reports = sorted(path for path in RESULTS_DIR.glob("*.json") if path != exclude)
+    return reports[-1] if reports else None
+
+
+def compare(baseline: dict[str, Any], current: dict[str, Any], threshold: float) -> list[dict[str, Any]]:
+    before = {row["name"]: row for row in baseline.get("results", [])}
+    rows = []
+    for row in current.get("results", []):
+        previous = before.get(row["name"])
+        if previous is None or previous["min_ns"] <= 0:
+            continue
+        change = row["min_ns"] / previous["min_ns"] - 1.0
+        rows.append(
+            {
+                "name": row["name"],
+                "baseline_ns": previous["min_ns"],
+                "current_ns": row["min_ns"],
+                "change": round(change, 4),
+                "regressed": change > threshold,
+            }
+        )
+    return rows
+
+
+def format_ns(value: float) -> str:
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("us", 1e3)):
+        if value >= scale:
+            return f"{value / scale:.2f} {unit}"
+    return f"{value:.0f} ns"
@@ -0,0 +1,307 @@
+"""Micro-benchmarks for backend hot paths, written as machine-readable JSON reports.
+
+    cd backend && python -m benchmarks.suite                  # full run, report in benchmarks/results/
+    cd backend && python -m benchmarks.suite --quick -k queue # 10k-job sizes only, filtered by name
+    cd backend && python -m benchmarks.suite --compare        # diff against the previous report
+
+--compare exits non-zero when any case is slower than the baseline by more than --threshold.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+from dataclasses import asdict, replace
+from pathlib import Path
+from typing import Any, Callable
+
+from app.config import Settings, get_settings
+from app.services_comfy import ComfyService
+from app.services_jobstore import SQLiteJobStore
+from app.services_music import compute_track_score
+from app.services_queue import JobRecord, RenderQueueService
+from app.services_suggest import TrackSuggestIndex
+from app.services_youtube import YouTubeService
+from app.storage import Storage
+
+from .harness import Case, build_report, compare, format_ns, latest_report, measure, write_report
+
+
+JOB_COUNTS = (10_000, 100_000)
+QUICK_JOB_COUNTS = (10_000,)
+JOB_FILE_COUNTS = (1_000, 10_000)
+QUICK_JOB_FILE_COUNTS = (1_000,)
+# Roughly a 600px iTunes JPEG, a 1400px original and a large PNG upload.
+IMAGE_SIZES = (100_000, 1_000_000, 5_000_000)
+SUGGEST_ENTRIES = 50_000
+# A single broad letter, a broad two-token query and a narrow one.
+SUGGEST_QUERIES = ("s", "song ti", "artist 4217")
+
+_TMP_DIRS: list[Path] = []
+
+
+def _settings() -> Settings:
+    root = Path(tempfile.mkdtemp(prefix="bench-"))
+    _TMP_DIRS.append(root)
+    return replace(
+        get_settings(),
+        data_dir=root,
+        inputs_dir=root / "inputs",
+        renders_dir=root / "renders",
+        jobs_dir=root / "jobs",
+        comfy_input_dir=root / "comfy_input",
+        queue_backend="memory",
+    )
+
+
+def _job(index: int, status: str) -> JobRecord:
+    minute = index % 60
+    return JobRecord(
+        job_id=f"job-{index:06d}",
+        status=status,
+        phase="done" if status == "completed" else "queued",
+        progress=100 if status == "completed" else 0,
+        track={"track_id": str(index), "title": f"Song {index}", "artist": "Artist"},
+        result={"video_url": f"/static/renders/{index}/video.mp4", "thumbnail_url": None, "cache_key": f"k{index}"},
+        error={"code": None, "message": None},
+        cache_key=f"k{index}",
+        image_filename=f"{index}.jpg",
+        created_at=f"2026-02-{1 + index % 28:02d}T09:{minute:02d}:00+00:00",
+        updated_at=f"2026-02-{1 + index % 28:02d}T10:{minute:02d}:00+00:00",
+        version=3,
+    )
+
+
+def _queue_service(settings: Settings) -> RenderQueueService:
+    storage = Storage(settings)
+    return RenderQueueService(settings=settings, storage=storage, comfy_service=ComfyService(settings=settings))
+
+
+def track_score_case() -> Callable[[], Any]:
+    rng = random.Random(7)
+    pairs = [(rng.randrange(0, 50), rng.choice((0, rng.randrange(1, 2_000_000_000)))) for _ in range(1_000)]
+
+    def run() -> None:
+        for rank, views in pairs:
+            compute_track_score(rank, views)
+
+    return run
+
+
+def _full_youtube_cache() -> tuple[YouTubeService, list[str]]:
+    service = YouTubeService(api_key="", cache_max_size=get_settings().youtube_cache_max_size)
+    keys = [service._cache_key(f"Song {index}", f"Artist {index % 97}") for index in range(service.cache_max_size)]
+    for index, key in enumerate(keys):
+        service._cache_set(key, (f"video{index}", f"https://youtu.be/video{index}", index))
+    return service, keys
+
+
+def youtube_cache_get_case() -> Callable[[], Any]:
+    service, keys = _full_youtube_cache()
+    probes = random.Random(11).sample(keys, min(1_000, len(keys)))
+
+    def run() -> None:
+        for key in probes:
+            service._cache_get(key)
+
+    return run
+
+
+def youtube_cache_set_case() -> Callable[[], Any]:
+    service, _ = _full_youtube_cache()
+    counter = iter(range(10**12))
+
+    def run() -> None:
+        # Every insert lands in a full cache and evicts the oldest entry.
+        for _ in range(1_000):
+            index = next(counter)
+            service._cache_set(f"new song {index}::artist", (None, None, 0))
+
+    return run
+
+
+def cache_key_case(size: int) -> Callable[[], Any]:
+    payload = os.urandom(size)
+    settings = get_settings()
+    return lambda: Storage.compute_cache_key(payload, settings.workflow_version, settings.render_preset)
+
+
+def build_prompt_case() -> Callable[[], Any]:
+    service = ComfyService(settings=get_settings())
+    return lambda: service.build_prompt("album.jpg", "0" * 64)
+
+
+def execution_ratio_case() -> Callable[[], Any]:
+    service = ComfyService(settings=get_settings())
+    prompt = service.build_prompt("album.jpg", "0" * 64)
+    weights = service.cost_model.weights(prompt)
+    node_ids = list(weights)
+    events: list[tuple[set[str], dict[str, float]]] = []
+    done: set[str] = set()
+    # A storm of progress events: many step updates per node as the sampler advances, then the node completes.
+    for node_id in node_ids:
+        for step in range(1, 21):
+            events.append((set(done), {node_id: step / 20}))
+        done.add(node_id)
+
+    def run() -> None:
+        for done_nodes, running in events:
+            service._compute_execution_ratio(weights, done_nodes, running)
+
+    return run
+
+
+def queue_position_case(count: int) -> Callable[[], Any]:
+    service = _queue_service(_settings())
+    for index in range(count):
+        job = _job(index, "queued")
+        service.jobs[job.job_id] = job
+        service.queue.put_nowait(job.job_id)
+    last = service.jobs[f"job-{count - 1:06d}"]
+    return lambda: service._queue_position(last)
+
+
+def list_history_case(count: int) -> Callable[[], Any]:
+    service = _queue_service(_settings())
+    for index in range(count):
+        job = _job(index, "completed" if index % 4 else "failed")
+        service.jobs[job.job_id] = job
+    loop = asyncio.new_event_loop()
+    return lambda: loop.run_until_complete(service.list_history(limit=24, include_failed=True))
+
+
+def list_history_sqlite_case(count: int) -> Callable[[], Any]:
+    settings = replace(_settings(), queue_backend="sqlite")
+    store = SQLiteJobStore(settings.data_dir / "queue.sqlite3")
+    store._conn.execute("BEGIN")  # noqa: SLF001  # one transaction keeps seeding 100k rows quick
+    for index in range(count):
+        store.save_job(asdict(_job(index, "completed" if index % 4 else "failed")))
+    store._conn.execute("COMMIT")  # noqa: SLF001
+    service = RenderQueueService(settings, Storage(settings), ComfyService(settings), job_store=store)
+    loop = asyncio.new_event_loop()
+    return lambda: loop.run_until_complete(service.list_history(limit=24, include_failed=True))
+
+
+def load_jobs_case(count: int) -> Callable[[], Any]:
+    settings = _settings()
+    storage = Storage(settings)
+    for index in range(count):
+        job = _job(index, "completed")
+        storage.write_job(job.job_id, asdict(job))
+    return storage.load_jobs
+
+
+def _full_suggest_index() -> TrackSuggestIndex:
+    index = TrackSuggestIndex(max_entries=SUGGEST_ENTRIES)
+    rng = random.Random(7)
+    for start in range(0, SUGGEST_ENTRIES, 50):
+        index.observe_tracks(
+            {"track_id": str(number), "title": f"Song Title {number}", "artist": f"Artist {rng.randrange(5_000)}"}
+            for number in range(start, start + 50)
+        )
+    for number in rng.sample(range(SUGGEST_ENTRIES), 2_000):
+        index.observe_tracks([{"track_id": str(number), "title": f"Song Title {number}", "artist": "Artist"}])
+    return index
+
+
+def suggest_case(query: str) -> Callable[[], Any]:
+    index = _full_suggest_index()
+    return lambda: index.suggest(query, limit=5)
+
+
+def suggest_observe_case() -> Callable[[], Any]:
+    index = _full_suggest_index()
+    counter = iter(range(SUGGEST_ENTRIES, 10**9))
+
+    def run() -> None:
+        number = next(counter)
+        index.observe_tracks([{"track_id": str(number), "title": f"Song Title {number}", "artist": "New Artist"}])
+
+    return run
+
+
+def build_cases(quick: bool = False) -> list[Case]:
+    job_counts = QUICK_JOB_COUNTS if quick else JOB_COUNTS
+    file_counts = QUICK_JOB_FILE_COUNTS if quick else JOB_FILE_COUNTS
+    cases = [
+        Case("music.compute_track_score[1000]", "music", track_score_case, {"calls": 1_000}),
+        Case("youtube.cache_get[1000@max]", "youtube", youtube_cache_get_case, {"calls": 1_000}),
+        Case("youtube.cache_set_evict[1000@max]", "youtube", youtube_cache_set_case, {"calls": 1_000}),
+        Case("comfy.build_prompt", "comfy", build_prompt_case),
+        Case("comfy.execution_ratio_storm", "comfy", execution_ratio_case),
+        Case(f"suggest.observe_evict[{SUGGEST_ENTRIES}@max]", "suggest", suggest_observe_case, {"entries": SUGGEST_ENTRIES}),
+    ]
+    cases.extend(
+        Case(f"suggest.suggest[{query}]", "suggest", lambda query=query: suggest_case(query), {"entries": SUGGEST_ENTRIES})
+        for query in SUGGEST_QUERIES
+    )
+    cases.extend(
+        Case(f"storage.compute_cache_key[{size}]", "storage", lambda size=size: cache_key_case(size), {"bytes": size})
+        for size in IMAGE_SIZES
+    )
+    cases.extend(
+        Case(f"queue.queue_position[{count}]", "queue", lambda count=count: queue_position_case(count), {"jobs": count})
+        for count in job_counts
+    )
+    cases.extend(
+        Case(f"queue.list_history[{count}]", "queue", lambda count=count: list_history_case(count), {"jobs": count})
+        for count in job_counts
+    )
+    cases.extend(
+        Case(f"queue.list_history_sqlite[{count}]", "queue", lambda count=count: list_history_sqlite_case(count), {"jobs": count})
+        for count in job_counts
+    )
+    cases.extend(
+        Case(f"storage.load_jobs[{count}]", "storage", lambda count=count: load_jobs_case(count), {"files": count})
+        for count in file_counts
+    )
+    return cases
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", "--filter", default="", help="only run cases whose name contains this substring")
+    parser.add_argument("--quick", action="store_true", help="skip the largest job counts")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="report path (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", nargs="?", const="latest", help="baseline report to diff against (default: newest)")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before --compare fails")
+    args = parser.parse_args()
+
+    cases = [case for case in build_cases(quick=args.quick) if args.filter in case.name]
+    results = []
+    try:
+        for case in cases:
+            result = measure(case, repeats=args.repeats)
+            results.append(result)
+            print(f"{case.name:<40} {format_ns(result.min_ns):>12}  ({result.ops_per_sec:,.0f} ops/s)", flush=True)
+    finally:
+        for root in _TMP_DIRS:
+            shutil.rmtree(root, ignore_errors=True)
+
+    report = build_report(results)
+    baseline_path = None
+    if args.compare:
+        baseline_path = latest_report() if args.compare == "latest" else Path(args.compare)
+    path = write_report(report, args.output)
+    print(f"wrote {path}")
+
+    if baseline_path is None:
+        return
+    rows = compare(json.loads(baseline_path.read_text(encoding="utf-8")), report, args.threshold)
+    print(f"\ncompared with {baseline_path}")
+    for row in rows:
+        flag = "  REGRESSED" if row["regressed"] else ""
+        print(f"{row['name']:<40} {row['change']:+8.1%}{flag}")
+    if any(row["regressed"] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""Create/poll load driver for the render API.
+
+Submits --jobs render requests from --concurrency simulated clients, each long-polling its job
+until it finishes, then reports throughput, queue wait and end-to-end latency percentiles.
+Pair it with loadtest.fake_comfy, which also serves the album art:
+
+    cd backend && python -m loadtest.fake_comfy --sampling-sec 1 &
+    COMFY_BASE_URL=http://127.0.0.1:8188 uvicorn app.main:app --port 8000 &
+    cd backend && python -m loadtest.driver --jobs 50 --concurrency 10 --art-base-url http://127.0.0.1:8188
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import time
+import uuid
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import Any, Optional
+
+import httpx
+
+
+TERMINAL_STATUSES = {"completed", "failed"}
+
+
+@dataclass
+class JobSample:
+    job_id: str
+    cache_hit: bool
+    create_sec: float
+    status: str = "unknown"
+    error_code: Optional[str] = None
+    queue_wait_sec: Optional[float] = None
+    total_sec: Optional[float] = None
+    polls: int = 0
+
+
+@dataclass
+class LoadReport:
+    jobs: int
+    concurrency: int
+    elapsed_sec: float
+    completed: int
+    failed: int
+    timed_out: int
+    cache_hits: int
+    throughput_jobs_per_sec: float
+    requests: int
+    requests_per_sec: float
+    create_latency_sec: dict[str, float]
+    poll_latency_sec: dict[str, float]
+    queue_wait_sec: dict[str, float]
+    end_to_end_sec: dict[str, float]
+    errors: dict[str, int] = field(default_factory=dict)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def summarize(values: list[float]) -> dict[str, float]:
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 4) if values else 0.0,
+        "p50": round(percentile(values, 50), 4),
+        "p95": round(percentile(values, 95), 4),
+        "p99": round(percentile(values, 99), 4),
+        "max": round(max(values), 4) if values else 0.0,
+    }
+
+
+class LoadDriver:
+    def __init__(
+        self,
+        api_base_url: str,
+        art_base_url: str,
+        jobs: int,
+        concurrency: int,
+        unique_art: bool = True,
+        wait_sec: float = 20.0,
+        poll_interval_sec: float = 1.0,
+        job_timeout_sec: float = 900.0,
+    ) -> None:
+        self.api_base_url = api_base_url.rstrip("/")
+        self.art_base_url = art_base_url.rstrip("/")
+        self.jobs = jobs
+        self.concurrency = max(1, concurrency)
+        self.unique_art = unique_art
+        self.wait_sec = wait_sec
+        self.poll_interval_sec = poll_interval_sec
+        self.job_timeout_sec = job_timeout_sec
+        self.run_id = uuid.uuid4().hex[:8]
+        self.samples: list[JobSample] = []
+        self.poll_latencies: list[float] = []
+        self.errors: Counter[str] = Counter()
+
+    def _request_body(self, index: int) -> dict[str, Any]:
+        # A per-run seed keeps every job a cache miss unless --repeat-art asks for cache hits.
+        seed = int(self.run_id, 16) % 10**6 * 10**6 + index if self.unique_art else 1
+        return {
+            "track_id": f"load-{self.run_id}-{index}",
+            "album_id": None,
+            "title": f"Load Test {index}",
+            "artist": "Load Driver",
+            "album_art_url": f"{self.art_base_url}/art/{seed}.png",
+        }
+
+    async def _run_job(self, client: httpx.AsyncClient, index: int) -> None:
+        started = time.monotonic()
+        try:
+            response = await client.post(f"{self.api_base_url}/renders", json=self._request_body(index))
+            response.raise_for_status()
+        except httpx.HTTPError as exc:
+            self.errors[f"create:{type(exc).__name__}"] += 1
+            return
+        created = response.json()
+        sample = JobSample(job_id=created["job_id"], cache_hit=bool(created.get("cache_hit")), create_sec=time.monotonic() - started)
+        self.samples.append(sample)
+
+        etag: Optional[str] = None
+        status: dict[str, Any] = {"status": created.get("status")}
+        while status.get("status") not in TERMINAL_STATUSES:
+            if time.monotonic() - started > self.job_timeout_sec:
+                sample.status = "timeout"
+                return
+            if etag and self.wait_sec <= 0:
+                await asyncio.sleep(self.poll_interval_sec)
+            headers = {"If-None-Match": etag} if etag else {}
+            poll_started = time.monotonic()
+            try:
+                response = await client.get(
+                    f"{self.api_base_url}/renders/{sample.job_id}", params={"wait": self.wait_sec}, headers=headers
+                )
+            except httpx.HTTPError as exc:
+                self.errors[f"poll:{type(exc).__name__}"] += 1
+                await asyncio.sleep(1)
+                continue
+            self.poll_latencies.append(time.monotonic() - poll_started)
+            sample.polls += 1
+            if response.status_code == 304:
+                continue
+            if response.status_code != 200:
+                self.errors[f"poll:{response.status_code}"] += 1
+                await asyncio.sleep(1)
+                continue
+            etag = response.headers.get("etag")
+            status = response.json()
+            if sample.queue_wait_sec is None and status.get("status") != "queued":
+                sample.queue_wait_sec = time.monotonic() - started
+
+        sample.status = str(status["status"])
+        sample.total_sec = time.monotonic() - started
+        if sample.queue_wait_sec is None:
+            sample.queue_wait_sec = sample.total_sec
+        error = status.get("error") or {}
+        sample.error_code = error.get("code")
+        if sample.error_code:
+            self.errors[f"job:{sample.error_code}"] += 1
+
+    async def run(self) -> LoadReport:
+        indexes: asyncio.Queue[int] = asyncio.Queue()
+        for index in range(self.jobs):
+            indexes.put_nowait(index)
+
+        # Long-polls hold a connection each, so size the pool for every client plus headroom.
+        limits = httpx.Limits(max_connections=self.concurrency * 2, max_keepalive_connections=self.concurrency * 2)
+        timeout = httpx.Timeout(self.wait_sec + 30, connect=10)
+        async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+
+            async def client_loop() -> None:
+                while True:
+                    try:
+                        index = indexes.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    await self._run_job(client, index)
+
+            started = time.monotonic()
+            await asyncio.gather(*(client_loop() for _ in range(self.concurrency)))
+            elapsed = time.monotonic() - started
+
+        finished = [sample for sample in self.samples if sample.status in TERMINAL_STATUSES]
+        completed = [sample for sample in finished if sample.status == "completed"]
+        requests = len(self.samples) + len(self.poll_latencies)
+        return LoadReport(
+            jobs=self.jobs,
+            concurrency=self.concurrency,
+            elapsed_sec=round(elapsed, 3),
+            completed=len(completed),
+            failed=sum(1 for sample in finished if sample.status == "failed"),
+            timed_out=sum(1 for sample in self.samples if sample.status == "timeout"),
+            cache_hits=sum(1 for sample in self.samples if sample.cache_hit),
+            throughput_jobs_per_sec=round(len(completed) / elapsed, 4) if elapsed > 0 else 0.0,
+            requests=requests,
+            requests_per_sec=round(requests / elapsed, 2) if elapsed > 0 else 0.0,
+            create_latency_sec=summarize([sample.create_sec for sample in self.samples]),
+            poll_latency_sec=summarize(self.poll_latencies),
+            queue_wait_sec=summarize([sample.queue_wait_sec for sample in finished if sample.queue_wait_sec is not None]),
+            end_to_end_sec=summarize([sample.total_sec for sample in finished if sample.total_sec is not None]),
+            errors=dict(self.errors),
+        )
+
+
+def print_report(report: LoadReport) -> None:
+    print(f"jobs {report.jobs} x{report.concurrency} clients in {report.elapsed_sec}s")
+    print(
+        f"completed {report.completed}  failed {report.failed}  timed out {report.timed_out}  cache hits {report.cache_hits}"
+    )
+    print(f"throughput {report.throughput_jobs_per_sec} jobs/s, {report.requests_per_sec} req/s over {report.requests} requests")
+    print(f"{'latency (s)':<14} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for label, stats in (
+        ("create", report.create_latency_sec),
+        ("poll", report.poll_latency_sec),
+        ("queue wait", report.queue_wait_sec),
+        ("end to end", report.end_to_end_sec),
+    ):
+        print(f"{label:<14} {stats['p50']:>9} {stats['p95']:>9} {stats['p99']:>9} {stats['max']:>9}")
+    if report.errors:
+        print("errors:", ", ".join(f"{key}={value}" for key, value in sorted(report.errors.items())))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--api-base-url", default="http://127.0.0.1:8000/api/v1")
+    parser.add_argument("--art-base-url", default="http://127.0.0.1:8188", help="server hosting /art/{seed}.png")
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--repeat-art", action="store_true", help="reuse one album art so later jobs hit the render cache")
+    parser.add_argument("--wait-sec", type=float, default=20.0, help="long-poll wait per status request (0 = plain polling)")
+    parser.add_argument("--poll-interval-sec", type=float, default=1.0, help="delay between plain polls")
+    parser.add_argument("--job-timeout-sec", type=float, default=900.0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    driver = LoadDriver(
+        api_base_url=args.api_base_url,
+        art_base_url=args.art_base_url,
+        jobs=max(1, args.jobs),
+        concurrency=args.concurrency,
+        unique_art=not args.repeat_art,
+        wait_sec=max(0.0, args.wait_sec),
+        poll_interval_sec=max(0.0, args.poll_interval_sec),
+        job_timeout_sec=args.job_timeout_sec,
+    )
+    report = asyncio.run(driver.run())
+    if args.json:
+        print(json.dumps(asdict(report), indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
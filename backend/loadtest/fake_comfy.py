@@ -0,0 +1,344 @@
+"""Offline stand-in for ComfyUI, for render throughput tests without a GPU.
+
+Implements what ComfyService talks to: POST /prompt, GET /history/{id}, GET /view, GET/POST /queue,
+POST /interrupt, GET /system_stats and the /ws event stream (executing/progress/executed/
+execution_success plus binary preview frames). Prompts run one at a time like a single GPU.
+It also serves deterministic album art at /art/{seed}.png for the load driver.
+
+    cd backend && python -m loadtest.fake_comfy --port 8188 --sampling-sec 2 --failure-rate 0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+import uuid
+import zlib
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Optional
+
+from fastapi import Body, FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response
+
+from app.services_comfy import BINARY_EVENT_PREVIEW_IMAGE
+from app.storage import _solid_png
+
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_IMAGE_TYPE_PNG = 2
+OUTPUT_NODE_ID = "341"
+
+
+@dataclass
+class FakeComfyConfig:
+    sampling_sec: float = 2.0
+    sampling_steps: int = 20
+    node_sec: float = 0.01
+    failure_rate: float = 0.0
+    preview_every: int = 4
+    output_file: Optional[Path] = None
+    seed: Optional[int] = None
+
+
+@dataclass
+class FakePrompt:
+    prompt_id: str
+    number: int
+    client_id: str
+    prompt: dict[str, Any]
+    queued_ts: float = field(default_factory=time.monotonic)
+    started_ts: Optional[float] = None
+    finished_ts: Optional[float] = None
+    history: Optional[dict[str, Any]] = None
+
+
+class FakeComfy:
+    def __init__(self, config: FakeComfyConfig) -> None:
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.output_name = config.output_file.name if config.output_file else "fake_output.mp4"
+        if config.output_file is not None:
+            self.output_bytes = config.output_file.read_bytes()
+        else:
+            # Not a playable video: the API's ffmpeg finalize step will fail unless --output-file is given.
+            logger.warning("no --output-file given; serving placeholder bytes")
+            self.output_bytes = b"\x00\x00\x00\x18ftypmp42fake-comfy-output"
+        self.prompts: dict[str, FakePrompt] = {}
+        self.pending: asyncio.Queue[str] = asyncio.Queue()
+        self.pending_ids: list[str] = []
+        self.running_id: Optional[str] = None
+        self.interrupted: set[str] = set()
+        self.sockets: dict[str, set[WebSocket]] = {}
+        self.counter = 0
+        self.executor: Optional[asyncio.Task[None]] = None
+
+    def start(self) -> None:
+        if self.executor is None:
+            self.executor = asyncio.create_task(self._run(), name="fake-comfy-executor")
+
+    async def stop(self) -> None:
+        if self.executor is None:
+            return
+        self.executor.cancel()
+        try:
+            await self.executor
+        except asyncio.CancelledError:
+            pass
+        self.executor = None
+
+    def submit(self, prompt: dict[str, Any], client_id: str) -> FakePrompt:
+        self.counter += 1
+        item = FakePrompt(prompt_id=str(uuid.uuid4()), number=self.counter, client_id=client_id, prompt=prompt)
+        self.prompts[item.prompt_id] = item
+        self.pending_ids.append(item.prompt_id)
+        self.pending.put_nowait(item.prompt_id)
+        return item
+
+    def queue_state(self) -> dict[str, list[list[Any]]]:
+        def entry(prompt_id: str) -> list[Any]:
+            item = self.prompts[prompt_id]
+            return [item.number, item.prompt_id, item.prompt, {"client_id": item.client_id}, [OUTPUT_NODE_ID]]
+
+        return {
+            "queue_running": [entry(self.running_id)] if self.running_id else [],
+            "queue_pending": [entry(prompt_id) for prompt_id in self.pending_ids],
+        }
+
+    def interrupt(self, prompt_id: Optional[str] = None) -> None:
+        if self.running_id and prompt_id in (None, self.running_id):
+            self.interrupted.add(self.running_id)
+
+    def delete_pending(self, prompt_ids: list[str]) -> None:
+        for prompt_id in prompt_ids:
+            if prompt_id in self.pending_ids:
+                self.pending_ids.remove(prompt_id)
+                self.prompts.pop(prompt_id, None)
+
+    async def _send(self, client_id: str, message: dict[str, Any] | bytes) -> None:
+        for ws in list(self.sockets.get(client_id, ())):
+            try:
+                if isinstance(message, bytes):
+                    await ws.send_bytes(message)
+                else:
+                    await ws.send_json(message)
+            except Exception:  # noqa: BLE001
+                self.sockets.get(client_id, set()).discard(ws)
+
+    def _preview_frame(self, step: int) -> bytes:
+        shade = int(255 * step / max(1, self.config.sampling_steps))
+        image = _solid_png(64, 64, (shade, 96, 255 - shade))
+        return BINARY_EVENT_PREVIEW_IMAGE.to_bytes(4, "big") + PREVIEW_IMAGE_TYPE_PNG.to_bytes(4, "big") + image
+
+    @staticmethod
+    def _sampler_node(prompt: dict[str, Any]) -> Optional[str]:
+        for node_id, node in prompt.items():
+            if isinstance(node, dict) and "Sampler" in str(node.get("class_type", "")):
+                return str(node_id)
+        return None
+
+    async def _run(self) -> None:
+        while True:
+            prompt_id = await self.pending.get()
+            if prompt_id not in self.pending_ids:
+                continue
+            self.pending_ids.remove(prompt_id)
+            self.running_id = prompt_id
+            try:
+                await self._execute(self.prompts[prompt_id])
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa: BLE001
+                logger.exception("fake execution of %s crashed", prompt_id)
+            finally:
+                self.running_id = None
+
+    async def _execute(self, item: FakePrompt) -> None:
+        config = self.config
+        item.started_ts = time.monotonic()
+        prompt_id, client_id = item.prompt_id, item.client_id
+        node_ids = [str(node_id) for node_id, node in item.prompt.items() if isinstance(node, dict)]
+        sampler = self._sampler_node(item.prompt)
+        fail_at = self.rng.choice(node_ids) if node_ids and self.rng.random() < config.failure_rate else None
+        messages: list[list[Any]] = [["execution_start", {"prompt_id": prompt_id, "timestamp": int(time.time() * 1000)}]]
+        await self._send(client_id, {"type": "execution_start", "data": {"prompt_id": prompt_id}})
+
+        outcome = "success"
+        for node_id in node_ids:
+            if prompt_id in self.interrupted:
+                outcome = "interrupted"
+                break
+            await self._send(client_id, {"type": "executing", "data": {"node": node_id, "prompt_id": prompt_id}})
+            if node_id == fail_at:
+                outcome = "error"
+                break
+            if node_id == sampler:
+                steps = max(1, config.sampling_steps)
+                for step in range(1, steps + 1):
+                    await asyncio.sleep(config.sampling_sec / steps)
+                    if prompt_id in self.interrupted:
+                        break
+                    await self._send(
+                        client_id,
+                        {"type": "progress", "data": {"value": step, "max": steps, "node": node_id, "prompt_id": prompt_id}},
+                    )
+                    if config.preview_every > 0 and step % config.preview_every == 0:
+                        await self._send(client_id, self._preview_frame(step))
+            elif config.node_sec > 0:
+                await asyncio.sleep(config.node_sec)
+            if prompt_id in self.interrupted:
+                outcome = "interrupted"
+                break
+            output: Optional[dict[str, Any]] = None
+            if node_id == OUTPUT_NODE_ID:
+                output = {"gifs": [{"filename": self.output_name, "subfolder": "Live2D", "type": "output"}]}
+            await self._send(client_id, {"type": "executed", "data": {"node": node_id, "output": output, "prompt_id": prompt_id}})
+
+        item.finished_ts = time.monotonic()
+        if outcome == "success":
+            messages.append(["execution_success", {"prompt_id": prompt_id}])
+            item.history = {
+                "prompt": [item.number, prompt_id, item.prompt, {"client_id": client_id}, [OUTPUT_NODE_ID]],
+                "outputs": {
+                    OUTPUT_NODE_ID: {"gifs": [{"filename": self.output_name, "subfolder": "Live2D", "type": "output"}]}
+                },
+                "status": {"status_str": "success", "completed": True, "messages": messages},
+            }
+            await self._send(client_id, {"type": "executing", "data": {"node": None, "prompt_id": prompt_id}})
+            await self._send(client_id, {"type": "execution_success", "data": {"prompt_id": prompt_id}})
+            return
+
+        event = "execution_error" if outcome == "error" else "execution_interrupted"
+        payload: dict[str, Any] = {"prompt_id": prompt_id, "node_id": fail_at or "", "node_type": "FakeNode"}
+        if outcome == "error":
+            payload["exception_message"] = "simulated failure"
+        messages.append([event, payload])
+        item.history = {
+            "prompt": [item.number, prompt_id, item.prompt, {"client_id": client_id}, [OUTPUT_NODE_ID]],
+            "outputs": {},
+            "status": {"status_str": "error", "completed": False, "messages": messages},
+        }
+        self.interrupted.discard(prompt_id)
+        await self._send(client_id, {"type": event, "data": payload})
+
+
+def create_fake_comfy_app(config: Optional[FakeComfyConfig] = None) -> FastAPI:
+    comfy = FakeComfy(config or FakeComfyConfig())
+
+    @asynccontextmanager
+    async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+        comfy.start()
+        try:
+            yield
+        finally:
+            await comfy.stop()
+
+    app = FastAPI(title="Fake ComfyUI", lifespan=lifespan)
+    app.state.comfy = comfy
+
+    @app.post("/prompt")
+    async def post_prompt(payload: dict[str, Any] = Body(...)) -> dict[str, Any]:
+        prompt = payload.get("prompt")
+        if not isinstance(prompt, dict) or not prompt:
+            raise HTTPException(status_code=400, detail="prompt is required")
+        item = comfy.submit(prompt, str(payload.get("client_id") or ""))
+        return {"prompt_id": item.prompt_id, "number": item.number, "node_errors": {}}
+
+    @app.get("/history/{prompt_id}")
+    async def get_history(prompt_id: str) -> dict[str, Any]:
+        item = comfy.prompts.get(prompt_id)
+        if item is None or item.history is None:
+            return {}
+        return {prompt_id: item.history}
+
+    @app.get("/view")
+    async def view(filename: str = Query(...), subfolder: str = Query(default=""), type: str = Query(default="output")) -> Response:
+        if filename != comfy.output_name:
+            raise HTTPException(status_code=404, detail="file not found")
+        return Response(content=comfy.output_bytes, media_type="video/mp4")
+
+    @app.get("/queue")
+    async def get_queue() -> dict[str, list[list[Any]]]:
+        return comfy.queue_state()
+
+    @app.post("/queue")
+    async def edit_queue(payload: dict[str, Any] = Body(...)) -> dict[str, Any]:
+        comfy.delete_pending([str(prompt_id) for prompt_id in payload.get("delete") or []])
+        return {}
+
+    @app.post("/interrupt")
+    async def interrupt(payload: Optional[dict[str, Any]] = Body(default=None)) -> dict[str, Any]:
+        prompt_id = (payload or {}).get("prompt_id")
+        comfy.interrupt(str(prompt_id) if prompt_id else None)
+        return {}
+
+    @app.get("/system_stats")
+    async def system_stats() -> dict[str, Any]:
+        return {
+            "system": {"os": "fake", "python_version": "fake", "embedded_python": False},
+            "devices": [{"name": "fake:0", "type": "cuda", "index": 0, "vram_total": 24 << 30, "torch_vram_total": 8 << 30}],
+        }
+
+    @app.get("/art/{seed}.png")
+    async def album_art(seed: int) -> Response:
+        color = zlib.crc32(str(seed).encode("utf-8")).to_bytes(4, "big")[:3]
+        return Response(content=_solid_png(300, 300, tuple(color)), media_type="image/png")  # type: ignore[arg-type]
+
+    @app.websocket("/ws")
+    async def websocket(ws: WebSocket, clientId: str = Query(default="")) -> None:  # noqa: N803
+        await ws.accept()
+        client_id = clientId or uuid.uuid4().hex
+        comfy.sockets.setdefault(client_id, set()).add(ws)
+        try:
+            await ws.send_json(
+                {"type": "status", "data": {"status": {"exec_info": {"queue_remaining": len(comfy.pending_ids)}}, "sid": client_id}}
+            )
+            while True:
+                await ws.receive_text()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            sockets = comfy.sockets.get(client_id)
+            if sockets is not None:
+                sockets.discard(ws)
+                if not sockets:
+                    comfy.sockets.pop(client_id, None)
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8188)
+    parser.add_argument("--sampling-sec", type=float, default=2.0, help="wall time of the sampler node")
+    parser.add_argument("--steps", type=int, default=20, help="sampler progress events per prompt")
+    parser.add_argument("--node-sec", type=float, default=0.01, help="wall time of every other node")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of prompts that fail mid-graph")
+    parser.add_argument("--preview-every", type=int, default=4, help="send a preview frame every N steps (0 disables)")
+    parser.add_argument("--output-file", type=Path, help="video served from /view as the render output")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    logging.basicConfig(level=logging.INFO)
+    config = FakeComfyConfig(
+        sampling_sec=max(0.0, args.sampling_sec),
+        sampling_steps=max(1, args.steps),
+        node_sec=max(0.0, args.node_sec),
+        failure_rate=min(1.0, max(0.0, args.failure_rate)),
+        preview_every=max(0, args.preview_every),
+        output_file=args.output_file,
+        seed=args.seed,
+    )
+    uvicorn.run(create_fake_comfy_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+import asyncio
+import time
+from dataclasses import asdict
 from pathlib import Path
+from typing import Optional
 
 import pytest
 from fastapi.testclient import TestClient
@@ -328,3 +332,219 @@ async def test_sampling_progress_updates_job(monkeypatch) -> None:
     await queue_service._update_sampling_progress("job-sampling", 0.1)
     assert queue_service.jobs["job-sampling"].progress == previous_progress
     assert writes
+
+
+def test_render_preview_returns_latest_frame(monkeypatch) -> None:
+    monkeypatch.setattr(queue_service, "previews", type(queue_service.previews)())
+
+    assert client.get("/api/v1/renders/job-preview/preview").status_code == 404
+
+    queue_service._store_preview("job-preview", b"first", "image/jpeg")
+    queue_service._store_preview("job-preview", b"second", "image/jpeg")
+
+    response = client.get("/api/v1/renders/job-preview/preview")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.content == b"second"
+
+
+def test_preview_buffer_is_bounded(monkeypatch) -> None:
+    monkeypatch.setattr(queue_service, "previews", type(queue_service.previews)())
+
+    for idx in range(queue_service.settings.preview_buffer_max_jobs + 5):
+        queue_service._store_preview(f"job-{idx}", b"img", "image/jpeg")
+
+    assert len(queue_service.previews) == queue_service.settings.preview_buffer_max_jobs
+    assert "job-0" not in queue_service.previews
+
+
+def test_node_profile_endpoint_aggregates_render_metas(monkeypatch) -> None:
+    monkeypatch.setattr(
+        queue_service.storage,
+        "load_render_metas",
+        lambda: [
+            {"node_timings": [{"node_id": "27", "class_type": "WanVideoSampler", "status": "executed", "duration_sec": 12.0}]},
+            {"node_timings": [{"node_id": "27", "class_type": "WanVideoSampler", "status": "executed", "duration_sec": 8.0}]},
+            {"cache_key": "legacy-without-timings"},
+        ],
+    )
+
+    response = client.get("/api/v1/renders/profile/nodes")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["render_count"] == 2
+    assert data["items"][0]["class_type"] == "WanVideoSampler"
+    assert data["items"][0]["total_sec"] == 20.0
+
+
+def test_processing_job_eta_uses_remaining_weighted_cost(monkeypatch) -> None:
+    monkeypatch.setattr(queue_service, "_expected_job_sec", lambda: 200.0)
+    monkeypatch.setattr(queue_service, "sampling_ratios", {"job-active": 0.75})
+    monkeypatch.setattr(queue_service, "active_job_id", "job-active")
+    monkeypatch.setattr(
+        queue_service,
+        "jobs",
+        {
+            "job-active": JobRecord(
+                job_id="job-active",
+                status="processing",
+                phase="sampling",
+                progress=75,
+                track={"track_id": "1", "title": "Song", "artist": "Artist"},
+                result={"video_url": None, "thumbnail_url": None, "cache_key": "k"},
+                error={"code": None, "message": None},
+                cache_key="k",
+                image_filename="a.jpg",
+                created_at="2026-02-07T10:00:00+00:00",
+                updated_at="2026-02-07T10:00:00+00:00",
+            ),
+            "job-waiting": JobRecord(
+                job_id="job-waiting",
+                status="queued",
+                phase="queued",
+                progress=0,
+                track={"track_id": "2", "title": "Next", "artist": "Artist"},
+                result={"video_url": None, "thumbnail_url": None, "cache_key": "k2"},
+                error={"code": None, "message": None},
+                cache_key="k2",
+                image_filename="b.jpg",
+                created_at="2026-02-07T10:01:00+00:00",
+                updated_at="2026-02-07T10:01:00+00:00",
+            ),
+        },
+    )
+
+    active = client.get("/api/v1/renders/job-active").json()
+    assert active["estimated_wait_sec"] == 50
+
+    waiting = client.get("/api/v1/renders/job-waiting").json()
+    assert waiting["queue_position"] == 1
+    assert waiting["estimated_wait_sec"] == 50
+
+
+def _queued_job(job_id: str) -> JobRecord:
+    return JobRecord(
+        job_id=job_id,
+        status="queued",
+        phase="queued",
+        progress=0,
+        track={"track_id": "1", "title": "Song", "artist": "Artist"},
+        result={"video_url": None, "thumbnail_url": None, "cache_key": "k"},
+        error={"code": None, "message": None},
+        cache_key="k",
+        image_filename="a.jpg",
+        created_at="2026-02-07T10:00:00+00:00",
+        updated_at="2026-02-07T10:00:00+00:00",
+        version=3,
+    )
+
+
+def test_render_status_etag_and_not_modified(monkeypatch) -> None:
+    monkeypatch.setattr(queue_service, "jobs", {"job-etag": _queued_job("job-etag")})
+    monkeypatch.setattr(queue_service, "_changed", asyncio.Event())
+
+    first = client.get("/api/v1/renders/job-etag")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.json()["version"] == 3
+
+    not_modified = client.get("/api/v1/renders/job-etag", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+    assert not_modified.content == b""
+
+    started = time.monotonic()
+    timed_out = client.get("/api/v1/renders/job-etag?wait=0.2", headers={"If-None-Match": f"W/{etag}"})
+    assert timed_out.status_code == 304
+    assert time.monotonic() - started >= 0.2
+
+    stale = client.get("/api/v1/renders/job-etag", headers={"If-None-Match": '"1-1"'})
+    assert stale.status_code == 200
+
+
+def test_long_poll_wakes_on_job_change(monkeypatch) -> None:
+    monkeypatch.setattr(queue_service, "jobs", {"job-poll": _queued_job("job-poll")})
+    monkeypatch.setattr(queue_service.storage, "write_job", lambda *_args: None)
+
+    async def run() -> tuple[Optional[str], Optional[str], float]:
+        monkeypatch.setattr(queue_service, "_changed", asyncio.Event())
+        etag = await queue_service.job_etag("job-poll")
+        assert etag is not None
+
+        async def change_soon() -> None:
+            await asyncio.sleep(0.05)
+            await queue_service._update_phase("job-poll", "preparing")
+
+        started = time.monotonic()
+        changer = asyncio.create_task(change_soon())
+        changed = await queue_service.wait_for_change("job-poll", etag, timeout_sec=5)
+        await changer
+        return etag, changed, time.monotonic() - started
+
+    before, after, elapsed = asyncio.run(run())
+
+    assert after is not None and after != before
+    assert elapsed < 1.0
+    assert queue_service.jobs["job-poll"].version == 4
+
+
+
+def test_queued_etag_follows_the_active_jobs_progress(monkeypatch) -> None:
+    active = _queued_job("job-active")
+    active.status, active.phase = "processing", "sampling"
+    monkeypatch.setattr(queue_service, "jobs", {"job-active": active, "job-waiting": _queued_job("job-waiting")})
+    monkeypatch.setattr(queue_service, "active_job_id", "job-active")
+    monkeypatch.setattr(queue_service, "sampling_ratios", {})
+    monkeypatch.setattr(queue_service.storage, "write_job", lambda *_args: None)
+
+    async def run() -> tuple[Optional[str], Optional[str], float]:
+        monkeypatch.setattr(queue_service, "_changed", asyncio.Event())
+        etag = await queue_service.job_etag("job-waiting")
+        assert etag is not None
+
+        async def progress_soon() -> None:
+            await asyncio.sleep(0.05)
+            await queue_service._update_sampling_progress("job-active", 0.5)
+
+        started = time.monotonic()
+        progress = asyncio.create_task(progress_soon())
+        changed = await queue_service.wait_for_change("job-waiting", etag, timeout_sec=5)
+        await progress
+        return etag, changed, time.monotonic() - started
+
+    before, after, elapsed = asyncio.run(run())
+
+    assert after is not None and after != before
+    assert elapsed < 1.0
+    assert queue_service.jobs["job-waiting"].version == 3
+    response = client.get("/api/v1/renders/job-waiting", headers={"If-None-Match": before})
+    assert response.status_code == 200
+    assert response.headers["etag"] == after
+
+def test_render_status_body_reused_until_job_changes(monkeypatch) -> None:
+    job = _queued_job("job-bytes")
+    monkeypatch.setattr(queue_service, "jobs", {"job-bytes": job})
+    monkeypatch.setattr(queue_service, "_changed", asyncio.Event())
+    monkeypatch.setattr(queue_service.storage, "write_job", lambda *_args: None)
+    builds: list[str] = []
+    original_to_status = JobRecord.to_status
+
+    def counting_to_status(self: JobRecord, queue_position: int, estimated_wait_sec: int):
+        builds.append(self.job_id)
+        return original_to_status(self, queue_position, estimated_wait_sec)
+
+    monkeypatch.setattr(JobRecord, "to_status", counting_to_status)
+
+    first = client.get("/api/v1/renders/job-bytes")
+    second = client.get("/api/v1/renders/job-bytes")
+    assert first.content == second.content
+    assert first.headers["content-type"] == "application/json"
+    assert first.json() == original_to_status(job, 1, first.json()["estimated_wait_sec"]).model_dump(mode="json")
+    assert len(builds) == 1
+
+    asyncio.run(queue_service._update_phase("job-bytes", "preparing"))
+    changed = client.get("/api/v1/renders/job-bytes")
+    assert changed.json()["phase"] == "preparing"
+    assert changed.json()["version"] == 4
+    assert len(builds) == 2
+    assert "_encoded" not in asdict(queue_service.jobs["job-bytes"])
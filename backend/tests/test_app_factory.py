@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from dataclasses import replace
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.config import Settings, get_settings
+from app.main import create_app
+from app.metrics import RENDER_QUEUE_DEPTH
+from app.tracing import TRACER
+
+
+def _settings(root: Path) -> Settings:
+    return replace(
+        get_settings(),
+        data_dir=root / "data",
+        inputs_dir=root / "data" / "inputs",
+        renders_dir=root / "data" / "renders",
+        jobs_dir=root / "data" / "jobs",
+        comfy_input_dir=root / "comfy_input",
+        suggest_index_path=root / "data" / "suggest_index.json",
+        youtube_cache_db_path=root / "data" / "youtube_cache.sqlite3",
+        queue_db_path=root / "data" / "queue.sqlite3",
+        queue_backend="memory",
+        render_worker_enabled=False,
+    )
+
+
+def test_create_app_builds_services_lazily(tmp_path: Path) -> None:
+    app = create_app(_settings(tmp_path))
+    state = app.state.services
+
+    assert not (tmp_path / "data").exists()
+    assert not state.is_built("queue_service")
+
+    client = TestClient(app)
+    assert client.get("/").json() == {"status": "ok"}
+    assert not state.is_built("storage")
+
+    assert client.get("/api/v1/renders/history").json() == {"items": []}
+    assert state.is_built("queue_service")
+    assert not state.is_built("music_service")
+    assert (tmp_path / "data" / "jobs").is_dir()
+
+
+def test_app_instances_are_isolated(tmp_path: Path) -> None:
+    first = create_app(_settings(tmp_path / "a"))
+    second = create_app(_settings(tmp_path / "b"))
+
+    with TestClient(first) as first_client, TestClient(second) as second_client:
+        first_queue = first.state.services.queue_service
+        second_queue = second.state.services.queue_service
+        assert first_queue is not second_queue
+        assert first_queue.storage.settings.jobs_dir != second_queue.storage.settings.jobs_dir
+
+        assert first_client.get("/api/v1/renders/missing").status_code == 404
+        assert second_client.get("/api/v1/renders/missing").status_code == 404
+
+    assert (tmp_path / "a" / "data" / "jobs").is_dir()
+    assert (tmp_path / "b" / "data" / "jobs").is_dir()
+
+
+def test_extra_apps_leave_process_wide_tracing_and_metrics_alone(tmp_path: Path) -> None:
+    exporter_before = TRACER.exporter
+    depth_before = RENDER_QUEUE_DEPTH._functions.get(())  # noqa: SLF001
+
+    app = create_app(replace(_settings(tmp_path), trace_sample_rate=1.0, trace_exporter="log"))
+    with TestClient(app) as client:
+        assert client.get("/api/v1/renders/history").status_code == 200
+
+    assert TRACER.exporter is exporter_before
+    assert RENDER_QUEUE_DEPTH._functions.get(()) is depth_before  # noqa: SLF001
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from app.config import get_settings
+from app.schemas import RenderCreateRequest
+from app.services_comfy import ComfyService
+from app.services_prefetch import ArtworkPrefetcher
+from app.services_queue import RenderQueueService
+from app.storage import Storage
+
+
+@pytest.fixture
+def settings(tmp_path: Path):
+    data_dir = tmp_path / "data"
+    return replace(
+        get_settings(),
+        data_dir=data_dir,
+        inputs_dir=data_dir / "inputs",
+        renders_dir=data_dir / "renders",
+        jobs_dir=data_dir / "jobs",
+        comfy_input_dir=tmp_path / "comfy_input",
+    )
+
+
+class CountingStorage(Storage):
+    def __init__(self, settings) -> None:
+        super().__init__(settings)
+        self.downloads: list[str] = []
+
+    async def download_album_art(self, album_art_url: str, timeout_sec: int = 30) -> tuple[bytes, str]:  # noqa: ARG002
+        self.downloads.append(album_art_url)
+        await asyncio.sleep(0.01)
+        return f"art:{album_art_url}".encode(), ".jpg"
+
+
+def test_prefetch_stages_hashed_artwork_for_create_job(settings) -> None:
+    storage = CountingStorage(settings)
+    storage.ensure_directories()
+    prefetcher = ArtworkPrefetcher(storage, settings.workflow_version, settings.render_preset)
+    queue_service = RenderQueueService(
+        settings=settings,
+        storage=storage,
+        comfy_service=ComfyService(settings),
+        artwork_prefetcher=prefetcher,
+    )
+    req = RenderCreateRequest(track_id="1", title="T", artist="A", album_art_url="https://a/1.jpg")
+
+    async def run():
+        assert prefetcher.schedule([req.album_art_url, req.album_art_url, "https://a/2.jpg"]) == 2
+        await asyncio.sleep(0.05)
+        return await queue_service.create_job(req)
+
+    response = asyncio.run(run())
+
+    assert response.status == "queued"
+    assert storage.downloads == ["https://a/1.jpg", "https://a/2.jpg"]
+    assert prefetcher.hits == 1
+    expected_key = Storage.compute_cache_key(b"art:https://a/1.jpg", settings.workflow_version, settings.render_preset)
+    assert queue_service.jobs[response.job_id].cache_key == expected_key
+
+
+def test_fetch_joins_inflight_prefetch(settings) -> None:
+    storage = CountingStorage(settings)
+    prefetcher = ArtworkPrefetcher(storage, "v1", "p")
+
+    async def run():
+        prefetcher.schedule(["https://a/1.jpg"])
+        await asyncio.sleep(0)
+        return await prefetcher.fetch("https://a/1.jpg")
+
+    artwork = asyncio.run(run())
+
+    assert artwork.content == b"art:https://a/1.jpg"
+    assert storage.downloads == ["https://a/1.jpg"]
+    assert prefetcher.misses == 0
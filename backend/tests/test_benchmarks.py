@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from benchmarks.harness import Case, build_report, compare, measure, write_report
+from benchmarks.suite import build_cases
+
+
+def test_measure_reports_per_op_timings(tmp_path: Path) -> None:
+    result = measure(Case("noop", "test", lambda: (lambda: None)), repeats=2, min_repeat_sec=0.001)
+    assert result.loops >= 1
+    assert result.repeats == 2
+    assert 0 < result.min_ns <= result.mean_ns
+
+    path = write_report(build_report([result]), tmp_path / "report.json")
+    report = json.loads(path.read_text(encoding="utf-8"))
+    assert report["results"][0]["name"] == "noop"
+    assert "python" in report["meta"]
+
+
+def test_compare_flags_slowdowns_past_threshold() -> None:
+    baseline = {"results": [{"name": "a", "min_ns": 100.0}, {"name": "b", "min_ns": 100.0}]}
+    current = {"results": [{"name": "a", "min_ns": 105.0}, {"name": "b", "min_ns": 150.0}, {"name": "new", "min_ns": 1.0}]}
+
+    rows = {row["name"]: row for row in compare(baseline, current, threshold=0.10)}
+
+    assert set(rows) == {"a", "b"}
+    assert not rows["a"]["regressed"]
+    assert rows["b"]["regressed"]
+    assert rows["b"]["change"] == 0.5
+
+
+def test_suite_case_names_are_unique() -> None:
+    names = [case.name for case in build_cases()]
+    assert len(names) == len(set(names))
+    assert any(name.startswith("queue.list_history[100000]") for name in names)
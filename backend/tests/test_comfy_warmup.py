@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import replace
+from pathlib import Path
+from typing import Any
+
+import httpx
+import pytest
+
+from app.config import get_settings
+from app.services_comfy import WARMUP_BYPASS_NODES, ComfyService
+from app.services_queue import RenderQueueService
+from app.storage import WARMUP_IMAGE_FILENAME, Storage
+
+
+class FakeComfyUI:
+    def __init__(self, resident: bool = False, fail: bool = False, loads: bool = True) -> None:
+        self.resident = resident
+        self.fail = fail
+        self.loads = loads
+        self.prompts: list[dict[str, Any]] = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/system_stats":
+            vram = 8 << 30 if self.resident else 0
+            return httpx.Response(200, json={"system": {}, "devices": [{"name": "cuda:0", "torch_vram_total": vram}]})
+        if request.url.path == "/prompt":
+            self.prompts.append(json.loads(request.content)["prompt"])
+            return httpx.Response(200, json={"prompt_id": "warm-1", "node_errors": {}})
+        if request.url.path == "/history/warm-1":
+            if self.fail:
+                status = {"status_str": "error", "messages": [["execution_error", {"node_id": "22", "node_type": "WanVideoModelLoader", "exception_message": "OOM"}]]}
+                return httpx.Response(200, json={"warm-1": {"outputs": {}, "status": status}})
+            self.resident = self.resident or self.loads
+            return httpx.Response(200, json={"warm-1": {"outputs": {"341": {"gifs": [{"filename": "w.mp4"}]}}, "status": {"status_str": "success"}}})
+        return httpx.Response(404)
+
+
+@pytest.fixture
+def settings(tmp_path: Path):
+    data_dir = tmp_path / "data"
+    return replace(
+        get_settings(),
+        data_dir=data_dir,
+        inputs_dir=data_dir / "inputs",
+        renders_dir=data_dir / "renders",
+        jobs_dir=data_dir / "jobs",
+        comfy_input_dir=tmp_path / "comfy_input",
+        comfy_warmup_enabled=True,
+    )
+
+
+def _patch_transport(monkeypatch, fake: FakeComfyUI) -> None:
+    real_client = httpx.AsyncClient
+
+    def client_factory(*args, **kwargs) -> httpx.AsyncClient:
+        return real_client(*args, transport=httpx.MockTransport(fake.handler), **kwargs)
+
+    monkeypatch.setattr("app.services_comfy.httpx.AsyncClient", client_factory)
+
+
+def test_warmup_prompt_is_reduced_template(settings) -> None:
+    service = ComfyService(settings=settings)
+    prompt = service.build_warmup_prompt("warm.png")
+
+    assert len(prompt) == len(service._workflow_template) - len(WARMUP_BYPASS_NODES)
+    assert prompt["58"]["inputs"]["image"] == "warm.png"
+    assert prompt["217"]["inputs"]["Xi"] == 1
+    assert prompt["341"]["inputs"]["save_output"] is False
+    assert prompt["573"]["inputs"]["keep_model_loaded"] is True
+    assert prompt["574"]["inputs"]["keep_model_loaded"] is True
+    assert not any(node["class_type"] == "easy cleanGpuUsed" for node in prompt.values())
+    referenced = {
+        value[0] for node in prompt.values() for value in node["inputs"].values() if isinstance(value, list) and len(value) == 2
+    }
+    assert referenced.isdisjoint(WARMUP_BYPASS_NODES)
+
+
+def test_warmup_runs_prompt_and_marks_backend_ready(settings, monkeypatch) -> None:
+    fake = FakeComfyUI()
+    _patch_transport(monkeypatch, fake)
+    queue_service = RenderQueueService(settings=settings, storage=Storage(settings), comfy_service=ComfyService(settings))
+    assert queue_service.backend_state["ready"] is False
+
+    asyncio.run(queue_service._warm_up())
+
+    assert len(fake.prompts) == 1
+    assert fake.prompts[0]["58"]["inputs"]["image"] == WARMUP_IMAGE_FILENAME
+    assert (settings.comfy_input_dir / WARMUP_IMAGE_FILENAME).read_bytes().startswith(b"\x89PNG")
+    assert queue_service.backend_state["ready"] is True
+    assert queue_service.backend_state["warmed_up"] is True
+    assert queue_service.backend_state["resident"] is True
+
+
+def test_warmup_skipped_when_models_already_resident(settings, monkeypatch) -> None:
+    fake = FakeComfyUI(resident=True)
+    _patch_transport(monkeypatch, fake)
+    queue_service = RenderQueueService(settings=settings, storage=Storage(settings), comfy_service=ComfyService(settings))
+
+    asyncio.run(queue_service._warm_up())
+
+    assert fake.prompts == []
+    assert queue_service.backend_state["ready"] is True
+    assert queue_service.backend_state["warmed_up"] is False
+
+
+def test_failed_warmup_keeps_backend_not_ready(settings, monkeypatch) -> None:
+    fake = FakeComfyUI(fail=True)
+    _patch_transport(monkeypatch, fake)
+    queue_service = RenderQueueService(settings=settings, storage=Storage(settings), comfy_service=ComfyService(settings))
+
+    asyncio.run(queue_service._warm_up())
+
+    assert queue_service.backend_state["ready"] is False
+    assert "OOM" in queue_service.backend_state["error"]
+
+
+
+def test_warmup_without_residency_keeps_backend_not_ready(settings, monkeypatch) -> None:
+    fake = FakeComfyUI(loads=False)
+    _patch_transport(monkeypatch, fake)
+    queue_service = RenderQueueService(settings=settings, storage=Storage(settings), comfy_service=ComfyService(settings))
+
+    asyncio.run(queue_service._warm_up())
+
+    assert queue_service.backend_state["warmed_up"] is True
+    assert queue_service.backend_state["resident"] is False
+    assert queue_service.backend_state["ready"] is False
+    assert "not resident" in queue_service.backend_state["error"]
+
+def test_worker_holds_jobs_until_warmup_succeeds(settings, monkeypatch) -> None:
+    fake = FakeComfyUI(fail=True)
+    _patch_transport(monkeypatch, fake)
+    monkeypatch.setattr("app.services_queue.WARMUP_RETRY_MIN_SEC", 0.01)
+    queue_service = RenderQueueService(settings=settings, storage=Storage(settings), comfy_service=ComfyService(settings))
+    claimed = asyncio.Event()
+
+    async def claim_next_job() -> str:
+        claimed.set()
+        await asyncio.Event().wait()
+        return ""
+
+    queue_service._claim_next_job = claim_next_job  # type: ignore[method-assign]
+
+    async def run() -> None:
+        worker = asyncio.create_task(queue_service._worker())
+        try:
+            await asyncio.sleep(0.1)
+            assert not claimed.is_set()
+            assert len(fake.prompts) >= 2
+            fake.fail = False
+            await asyncio.wait_for(claimed.wait(), timeout=2)
+        finally:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+
+    asyncio.run(run())
+    assert queue_service.backend_state["ready"] is True
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import socket
+import threading
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Iterator
+
+import httpx
+import pytest
+import uvicorn
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.services_comfy import ComfyError, ComfyService, RenderOutputs
+from loadtest.driver import percentile, summarize
+from loadtest.fake_comfy import FakeComfyConfig, create_fake_comfy_app
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def _serve(config: FakeComfyConfig) -> Iterator[str]:
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(create_fake_comfy_app(config), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("fake comfy server did not start")
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+
+@pytest.fixture
+def output_file(tmp_path: Path) -> Path:
+    path = tmp_path / "loop.mp4"
+    path.write_bytes(b"fake-video-bytes")
+    return path
+
+
+def _comfy_service(base_url: str, monkeypatch) -> ComfyService:
+    settings = replace(get_settings(), comfy_base_url=base_url, render_timeout_sec=30)
+    service = ComfyService(settings=settings)
+    monkeypatch.setattr(
+        service,
+        "finalize_outputs",
+        lambda downloaded, render_dir: RenderOutputs(video_path=downloaded, thumb_path=render_dir / "thumb.jpg"),
+    )
+    return service
+
+
+def test_render_against_fake_comfy(tmp_path: Path, output_file: Path, monkeypatch) -> None:
+    config = FakeComfyConfig(sampling_sec=0.2, sampling_steps=8, node_sec=0.0, preview_every=2, output_file=output_file)
+    with _serve(config) as base_url:
+        service = _comfy_service(base_url, monkeypatch)
+        phases: list[str] = []
+        ratios: list[float] = []
+        previews: list[str] = []
+
+        async def on_phase(phase: str) -> None:
+            phases.append(phase)
+
+        async def on_progress(ratio: float) -> None:
+            ratios.append(ratio)
+
+        async def on_preview(image: bytes, media_type: str) -> None:
+            previews.append(media_type)
+
+        outputs = asyncio.run(
+            service.render("album.png", "k" * 64, tmp_path, on_phase, on_progress, on_preview)
+        )
+
+    assert outputs.video_path.read_bytes() == b"fake-video-bytes"
+    assert phases == ["prompting", "sampling", "assembling", "postprocessing"]
+    assert ratios and ratios[-1] == 1.0
+    assert ratios == sorted(ratios)
+    assert previews and set(previews) <= {"image/png", "image/jpeg"}
+    assert outputs.node_timings
+
+
+def test_fake_comfy_failure_rate_surfaces_exec_error(tmp_path: Path, output_file: Path, monkeypatch) -> None:
+    config = FakeComfyConfig(sampling_sec=0.0, node_sec=0.0, failure_rate=1.0, output_file=output_file, seed=1)
+    with _serve(config) as base_url:
+        service = _comfy_service(base_url, monkeypatch)
+        with pytest.raises(ComfyError) as exc_info:
+            asyncio.run(service.render("album.png", "k" * 64, tmp_path))
+
+    assert exc_info.value.code == "COMFY_EXEC_ERROR"
+    assert "simulated failure" in exc_info.value.message
+
+
+def test_cancelled_render_interrupts_its_prompt(tmp_path: Path, output_file: Path, monkeypatch) -> None:
+    config = FakeComfyConfig(sampling_sec=10.0, sampling_steps=100, node_sec=0.0, output_file=output_file)
+    with _serve(config) as base_url:
+        service = _comfy_service(base_url, monkeypatch)
+        sampling = asyncio.Event()
+
+        async def on_phase(phase: str) -> None:
+            if phase == "sampling":
+                sampling.set()
+
+        async def run() -> None:
+            task = asyncio.create_task(service.render("album.png", "k" * 64, tmp_path, on_phase))
+            await asyncio.wait_for(sampling.wait(), timeout=5)
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        # Sampling would take 10s; the prompt only leaves the GPU this quickly because it was interrupted.
+        deadline = time.monotonic() + 3
+        while httpx.get(f"{base_url}/queue").json()["queue_running"]:
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+
+
+def test_fake_comfy_queue_and_interrupt(output_file: Path) -> None:
+    app = create_fake_comfy_app(FakeComfyConfig(sampling_sec=5.0, node_sec=0.0, output_file=output_file))
+    prompt = {"27": {"class_type": "WanVideoSampler", "inputs": {}}, "341": {"class_type": "VHS_VideoCombine", "inputs": {}}}
+    with TestClient(app) as client:
+        first = client.post("/prompt", json={"prompt": prompt, "client_id": "a"}).json()
+        second = client.post("/prompt", json={"prompt": prompt, "client_id": "b"}).json()
+        assert first["node_errors"] == {}
+
+        deadline = time.monotonic() + 5
+        while not client.get("/queue").json()["queue_running"]:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        queue = client.get("/queue").json()
+        assert queue["queue_running"][0][1] == first["prompt_id"]
+        assert [item[1] for item in queue["queue_pending"]] == [second["prompt_id"]]
+
+        client.post("/interrupt")
+        deadline = time.monotonic() + 5
+        while not client.get(f"/history/{first['prompt_id']}").json():
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        history = client.get(f"/history/{first['prompt_id']}").json()[first["prompt_id"]]
+        assert history["status"]["status_str"] == "error"
+        assert history["status"]["messages"][-1][0] == "execution_interrupted"
+
+        art = client.get("/art/42.png")
+        assert art.headers["content-type"] == "image/png"
+        assert art.content == client.get("/art/42.png").content
+
+
+def test_load_driver_percentiles() -> None:
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 95) == 0.0
+    stats = summarize(values)
+    assert stats["p95"] == 95.0
+    assert stats["max"] == 100.0
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from app.config import get_settings
+from app.services_comfy import ComfyError, ComfyService
+
+
+def test_finalize_command_remuxes_mp4_with_faststart_and_thumbnail() -> None:
+    cmd = ComfyService._build_finalize_command(
+        Path("/tmp/render/LoopVid_00001.mp4"),
+        Path("/tmp/render/video.mp4"),
+        Path("/tmp/render/thumb.jpg"),
+    )
+
+    assert cmd.count("-i") == 1
+    assert cmd[cmd.index("-c:v") + 1] == "copy"
+    assert cmd[cmd.index("-movflags") + 1] == "+faststart"
+    assert "/tmp/render/thumb.jpg" in cmd
+    assert "hls" not in cmd
+
+
+def test_finalize_command_transcodes_non_mp4_and_adds_hls() -> None:
+    hls_dir = Path("/tmp/render/hls")
+    cmd = ComfyService._build_finalize_command(
+        Path("/tmp/render/LoopVid_00001.webm"),
+        Path("/tmp/render/video.mp4"),
+        Path("/tmp/render/thumb.jpg"),
+        hls_dir=hls_dir,
+    )
+
+    assert cmd.count("-i") == 1
+    assert cmd.count("libx264") == 1
+    assert cmd[cmd.index("-flags") + 1] == "+global_header"
+    assert cmd[cmd.index("-f") + 1] == "tee"
+    mp4_slave, hls_slave = cmd[cmd.index("-f") + 2].split("|")
+    assert mp4_slave == "[f=mp4:movflags=+faststart]video.mp4"
+    assert hls_slave.startswith("[f=hls:")
+    assert "hls_segment_filename=hls/segment_%03d.ts" in hls_slave
+    assert hls_slave.endswith("]hls/index.m3u8")
+    assert cmd[-1] == "/tmp/render/thumb.jpg"
+
+
+def test_finalize_command_tees_remuxed_mp4_without_reencoding() -> None:
+    cmd = ComfyService._build_finalize_command(
+        Path("/tmp/render/LoopVid_00001.mp4"),
+        Path("/tmp/render/video.mp4"),
+        Path("/tmp/render/thumb.jpg"),
+        hls_dir=Path("/tmp/render/hls"),
+    )
+
+    assert cmd[cmd.index("-c:v") + 1] == "copy"
+    assert "-flags" not in cmd
+    assert cmd[cmd.index("-f") + 1] == "tee"
+
+
+def test_finalize_outputs_runs_single_ffmpeg_pass(tmp_path: Path, monkeypatch) -> None:
+    service = ComfyService(settings=replace(get_settings(), render_hls_enabled=True))
+    source = tmp_path / "video.mp4"
+    source.write_bytes(b"raw")
+    calls: list[list[str]] = []
+
+    class FakeResult:
+        returncode = 0
+        stderr = ""
+
+    def fake_run(cmd: list[str], **kwargs) -> FakeResult:
+        calls.append(cmd)
+        assert kwargs["cwd"] == tmp_path
+        return FakeResult()
+
+    monkeypatch.setattr("app.services_comfy.subprocess.run", fake_run)
+
+    outputs = service.finalize_outputs(source, tmp_path)
+
+    assert len(calls) == 1
+    assert calls[0][calls[0].index("-i") + 1] == str(tmp_path / "source.mp4")
+    assert outputs.video_path == tmp_path / "video.mp4"
+    assert outputs.thumb_path == tmp_path / "thumb.jpg"
+    assert outputs.hls_playlist_path == tmp_path / "hls" / "index.m3u8"
+    assert not (tmp_path / "source.mp4").exists()
+
+
+def test_finalize_outputs_cleans_up_partial_outputs_on_failure(tmp_path: Path, monkeypatch) -> None:
+    service = ComfyService(settings=replace(get_settings(), render_hls_enabled=True))
+    source = tmp_path / "video.mp4"
+    source.write_bytes(b"raw")
+
+    class FakeResult:
+        returncode = 1
+        stderr = "boom"
+
+    def fake_run(_cmd: list[str], **_kwargs) -> FakeResult:
+        (tmp_path / "video.mp4").write_bytes(b"partial")
+        (tmp_path / "hls" / "segment_000.ts").write_bytes(b"partial")
+        return FakeResult()
+
+    monkeypatch.setattr("app.services_comfy.subprocess.run", fake_run)
+
+    with pytest.raises(ComfyError) as exc_info:
+        service.finalize_outputs(source, tmp_path)
+
+    assert exc_info.value.code == "DOWNLOAD_FAILED"
+    assert not (tmp_path / "source.mp4").exists()
+    assert not (tmp_path / "video.mp4").exists()
+    assert not (tmp_path / "hls").exists()
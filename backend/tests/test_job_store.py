@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from app.config import get_settings
+from app.schemas import RenderCreateRequest
+from app.services_comfy import ComfyService
+from app.services_jobstore import SQLiteJobStore
+from app.services_queue import RenderQueueService
+from app.storage import Storage
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_claim_is_exclusive_and_lease_expiry_allows_reclaim(tmp_path: Path) -> None:
+    clock = FakeClock()
+    first = SQLiteJobStore(tmp_path / "queue.sqlite3", clock=clock)
+    second = SQLiteJobStore(tmp_path / "queue.sqlite3", clock=clock)
+    first.enqueue("job-1")
+
+    assert first.claim("worker-a", lease_sec=30) == ("job-1", 1)
+    assert second.claim("worker-b", lease_sec=30) is None
+    assert second.renew("job-1", "worker-b", lease_sec=30) is False
+    assert first.queue_depth() == 0
+
+    clock.now += 31
+    assert second.waiting_job_ids() == ["job-1"]
+    assert second.claim("worker-b", lease_sec=30) == ("job-1", 2)
+    assert first.renew("job-1", "worker-a", lease_sec=30) is False
+
+    first.ack("job-1", "worker-a")
+    assert second.waiting_job_ids() == []
+    second.ack("job-1", "worker-b")
+    clock.now += 60
+    assert first.claim("worker-a", lease_sec=30) is None
+
+
+def test_release_does_not_count_as_an_attempt(tmp_path: Path) -> None:
+    store = SQLiteJobStore(tmp_path / "queue.sqlite3", clock=FakeClock())
+    store.enqueue("job-1")
+    for _ in range(5):
+        assert store.claim("worker-a", lease_sec=30) == ("job-1", 1)
+        store.release("job-1", "worker-a")
+    store.release("job-1", "worker-b")
+    assert store.claim("worker-b", lease_sec=30) == ("job-1", 1)
+
+
+def test_concurrent_claimers_never_share_a_job(tmp_path: Path) -> None:
+    path = tmp_path / "queue.sqlite3"
+    seed = SQLiteJobStore(path)
+    for idx in range(60):
+        seed.enqueue(f"job-{idx:02d}")
+
+    claimed: list[str] = []
+    claimed_lock = threading.Lock()
+
+    def claimer(worker_id: str) -> None:
+        store = SQLiteJobStore(path)
+        while True:
+            result = store.claim(worker_id, lease_sec=300)
+            if result is None:
+                break
+            with claimed_lock:
+                claimed.append(result[0])
+        store.close()
+
+    threads = [threading.Thread(target=claimer, args=(f"w{idx}",)) for idx in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == [f"job-{idx:02d}" for idx in range(60)]
+
+
+@pytest.fixture
+def settings(tmp_path: Path):
+    data_dir = tmp_path / "data"
+    return replace(
+        get_settings(),
+        data_dir=data_dir,
+        inputs_dir=data_dir / "inputs",
+        renders_dir=data_dir / "renders",
+        jobs_dir=data_dir / "jobs",
+        comfy_input_dir=tmp_path / "comfy_input",
+        queue_backend="sqlite",
+        queue_db_path=data_dir / "queue.sqlite3",
+    )
+
+
+def test_job_state_is_shared_between_service_instances(settings, monkeypatch) -> None:
+    storage = Storage(settings)
+    storage.ensure_directories()
+
+    async def fake_download(_url: str, timeout_sec: int = 30):  # noqa: ARG001
+        return b"img", ".jpg"
+
+    monkeypatch.setattr(storage, "download_album_art", fake_download)
+    api = RenderQueueService(settings, storage, ComfyService(settings), job_store=SQLiteJobStore(settings.queue_db_path))
+    worker = RenderQueueService(settings, storage, ComfyService(settings), job_store=SQLiteJobStore(settings.queue_db_path))
+    req = RenderCreateRequest(track_id="1", title="T", artist="A", album_art_url="https://a/1.jpg")
+
+    async def run():
+        created = await api.create_job(req)
+        queued = await api.get_job(created.job_id)
+        claimed_id = await worker._claim_next_job()
+        await worker._update_phase(claimed_id, "sampling")
+        processing = await api.get_job(created.job_id)
+        return created, queued, claimed_id, processing
+
+    created, queued, claimed_id, processing = asyncio.run(run())
+
+    assert queued is not None and queued.status == "queued" and queued.queue_position == 1
+    assert claimed_id == created.job_id
+    assert processing is not None and processing.status == "processing" and processing.phase == "sampling"
+    assert api.queue_depth() == 0
+
+
+
+def test_locked_store_does_not_block_the_event_loop(settings) -> None:
+    storage = Storage(settings)
+    storage.ensure_directories()
+    worker = RenderQueueService(settings, storage, ComfyService(settings), job_store=SQLiteJobStore(settings.queue_db_path))
+    blocker = SQLiteJobStore(settings.queue_db_path)
+    blocker.enqueue("job-1")
+
+    async def run() -> tuple[bool, float]:
+        # Another process holds the write lock, so the worker's claim waits on busy_timeout.
+        blocker._conn.execute("BEGIN IMMEDIATE")  # noqa: SLF001
+        claim = asyncio.create_task(worker._claim_next_job())
+        started = time.monotonic()
+        for _ in range(10):
+            await asyncio.sleep(0.02)
+        elapsed = time.monotonic() - started
+        waiting = not claim.done()
+        blocker._conn.execute("COMMIT")  # noqa: SLF001
+        for _ in range(250):
+            if blocker.waiting_job_ids() == []:
+                break
+            await asyncio.sleep(0.02)
+        claim.cancel()
+        return waiting, elapsed
+
+    waiting, elapsed = asyncio.run(run())
+    assert waiting
+    assert elapsed < 1.0
+    assert blocker.waiting_job_ids() == []
+
+
+def test_history_is_filtered_and_limited_in_the_store(tmp_path: Path) -> None:
+    clock = FakeClock()
+    store = SQLiteJobStore(tmp_path / "queue.sqlite3", clock=clock)
+    for index, status in enumerate(["completed", "failed", "queued", "completed", "processing", "completed"]):
+        clock.now += 1
+        store.save_job({"job_id": f"job-{index}", "status": status})
+
+    assert [raw["job_id"] for raw in store.load_jobs_by_status(("completed",), limit=2)] == ["job-5", "job-3"]
+    assert [raw["job_id"] for raw in store.load_jobs_by_status(("completed", "failed"))] == ["job-5", "job-3", "job-1", "job-0"]
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app, queue_service
+from app.metrics import UPSTREAM_REQUEST_SECONDS, MetricsRegistry, observe_upstream
+from app.services_queue import JobRecord, PHASE_PROGRESS
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    registry = MetricsRegistry()
+    histogram = registry.histogram("demo_seconds", "Demo.", ("kind",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, kind="a")
+    histogram.observe(0.5, kind="a")
+    histogram.observe(3.0, kind="a")
+    counter = registry.counter("demo_total", "Demo.", ("code",))
+    counter.inc(code='bad"quote')
+
+    text = registry.render()
+
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{kind="a",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{kind="a",le="1"} 2' in text
+    assert 'demo_seconds_bucket{kind="a",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{kind="a"} 3' in text
+    assert 'demo_total{code="bad\\"quote"} 1' in text
+    with pytest.raises(ValueError):
+        counter.inc(wrong="label")
+
+
+def test_observe_upstream_records_errors() -> None:
+    before = UPSTREAM_REQUEST_SECONDS.count(upstream="test_upstream", outcome="error")
+    with pytest.raises(RuntimeError):
+        with observe_upstream("test_upstream"):
+            raise RuntimeError("boom")
+    assert UPSTREAM_REQUEST_SECONDS.count(upstream="test_upstream", outcome="error") == before + 1
+
+
+def test_metrics_endpoint_reports_phase_and_outcome_series() -> None:
+    job_id = "metrics-job"
+    queue_service.jobs[job_id] = JobRecord(
+        job_id=job_id,
+        status="queued",
+        phase="queued",
+        progress=PHASE_PROGRESS["queued"],
+        track={"track_id": "1", "title": "T", "artist": "A", "album_id": None, "album_art_url": "", "youtube_video_id": None},
+        result={"video_url": None, "thumbnail_url": None, "hls_url": None, "cache_key": "k"},
+        error={"code": None, "message": None},
+        cache_key="k",
+        image_filename=None,
+        created_at="2026-01-01T00:00:00+00:00",
+        updated_at="2026-01-01T00:00:00+00:00",
+    )
+    queue_service.phase_started[job_id] = ("queued", 0.0)
+
+    async def run() -> None:
+        await queue_service._update_phase(job_id, "preparing")
+        await queue_service._fail_job(job_id, "COMFY_TIMEOUT", "timed out")
+
+    try:
+        asyncio.run(run())
+        response = TestClient(app).get("/metrics")
+    finally:
+        queue_service.jobs.pop(job_id, None)
+        queue_service.storage.delete_job(job_id)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'render_phase_duration_seconds_count{phase="queued"}' in body
+    assert 'render_phase_duration_seconds_count{phase="preparing"}' in body
+    assert "render_queue_wait_seconds_count" in body
+    assert 'render_jobs_total{outcome="failed",code="COMFY_TIMEOUT"} 1' in body
+    assert job_id not in queue_service.phase_started
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+
+from app.services_music import MusicService, cluster_track_candidates, normalize_track_title
+
+
+def _candidate(track_id: str, title: str, artist: str) -> dict[str, str]:
+    return {"track_id": track_id, "title": title, "artist": artist, "album_art_url": "https://example.com/a.jpg"}
+
+
+def test_normalize_track_title_strips_version_suffixes() -> None:
+    assert normalize_track_title("Hey Jude - Remastered 2015") == "hey jude"
+    assert normalize_track_title("Beautiful Things (feat. Someone)") == "beautiful things"
+    assert normalize_track_title("Café del Mar [2011 Remaster]") == "cafe del mar"
+    assert normalize_track_title("Song (Deluxe Edition)") == "song"
+    assert normalize_track_title("Song (Live)") == "song live"
+
+    assert normalize_track_title("Song (25th Anniversary Edition) [Bonus Track]") == "song"
+
+
+def test_normalize_track_title_keeps_distinct_recordings() -> None:
+    assert normalize_track_title("Love Story (Taylor's Version)") == "love story taylor s version"
+    assert normalize_track_title("Hello (Acoustic Version)") == "hello acoustic version"
+    assert normalize_track_title("Hello (Instrumental Version)") == "hello instrumental version"
+    assert normalize_track_title("Yesterday - Live Version") == "yesterday live version"
+
+
+def test_cluster_keeps_live_acoustic_and_rerecorded_versions_apart() -> None:
+    clustered = cluster_track_candidates(
+        [
+            _candidate("1", "Love Story", "Taylor Swift"),
+            _candidate("2", "Love Story (Taylor's Version)", "Taylor Swift"),
+            _candidate("3", "Hello", "Adele"),
+            _candidate("4", "Hello (Acoustic Version)", "Adele"),
+            _candidate("5", "Hello (Instrumental Version)", "Adele"),
+            _candidate("6", "Yesterday", "The Beatles"),
+            _candidate("7", "Yesterday (Live)", "The Beatles"),
+            _candidate("8", "Yesterday - Live Version", "The Beatles"),
+        ]
+    )
+
+    assert [item["track_id"] for item in clustered] == ["1", "2", "3", "4", "5", "6", "7", "8"]
+
+def test_cluster_prefers_plain_release_and_keeps_distinct_songs() -> None:
+    clustered = cluster_track_candidates(
+        [
+            _candidate("1", "Hey Jude - Remastered 2015", "The Beatles"),
+            _candidate("2", "Hey Jude", "Beatles"),
+            _candidate("3", "Hey Jude (Live)", "The Beatles"),
+            _candidate("4", "Let It Be", "The Beatles"),
+            _candidate("5", "Hey Jude", "Someone Else Entirely"),
+        ]
+    )
+
+    assert [item["track_id"] for item in clustered] == ["2", "3", "4", "5"]
+    assert clustered[0]["duplicate_track_ids"] == ["1"]
+
+
+def test_cluster_keeps_songs_with_near_identical_titles_apart() -> None:
+    pairs = [
+        ("Lover", "Lovers", "Taylor Swift"),
+        ("Mr. Brightside Part 1", "Mr. Brightside Part 2", "The Killers"),
+        ("Symphony No. 5 in C Minor: I", "Symphony No. 5 in C Minor: II", "Ludwig van Beethoven"),
+    ]
+    for first, second, artist in pairs:
+        clustered = cluster_track_candidates([_candidate("1", first, artist), _candidate("2", second, artist)])
+        assert [item["track_id"] for item in clustered] == ["1", "2"], (first, second)
+        assert all(item["duplicate_track_ids"] == [] for item in clustered)
+
+
+class RecordingYouTubeService:
+    def __init__(self) -> None:
+        self.looked_up: list[tuple[str, str]] = []
+
+    async def lookup_tracks(self, tracks):
+        self.looked_up.extend(tracks)
+        return [(None, None, 0) for _ in tracks]
+
+
+def test_search_enriches_once_per_cluster() -> None:
+    youtube = RecordingYouTubeService()
+    service = MusicService(youtube_service=youtube, youtube_lookup_top_k=3)
+
+    async def fake_itunes_search(query: str) -> list[dict[str, object]]:  # noqa: ARG001
+        return [
+            {"trackId": 1, "trackName": "Espresso", "artistName": "Sabrina Carpenter", "artworkUrl100": "https://e/1.jpg"},
+            {"trackId": 2, "trackName": "Espresso (Deluxe Edition)", "artistName": "Sabrina Carpenter", "artworkUrl100": "https://e/2.jpg"},
+            {"trackId": 3, "trackName": "Espresso", "artistName": "Sabrina Carpenter & Friend", "artworkUrl100": "https://e/3.jpg"},
+            {"trackId": 4, "trackName": "Please Please Please", "artistName": "Sabrina Carpenter", "artworkUrl100": "https://e/4.jpg"},
+        ]
+
+    service._itunes_search = fake_itunes_search  # type: ignore[method-assign]
+    items = asyncio.run(service.search_tracks("espresso", limit=3))
+
+    assert [item.track_id for item in items] == ["1", "4"]
+    assert youtube.looked_up == [("Espresso", "Sabrina Carpenter"), ("Please Please Please", "Sabrina Carpenter")]
@@ -4,6 +4,7 @@ import asyncio
 from typing import Optional
 
 from app.services_music import MusicService
+from app.services_quota import YouTubeQuotaBudget
 
 
 class StubYouTubeService:
@@ -15,6 +16,9 @@ class StubYouTubeService:
         video_id = f"vid-{self.calls}"
         return video_id, f"https://www.youtube.com/embed/{video_id}", 10_000
 
+    async def lookup_tracks(self, tracks: list[tuple[str, str]]) -> list[tuple[Optional[str], Optional[str], int]]:
+        return [await self.lookup_track(title, artist) for title, artist in tracks]
+
 
 def _itunes_rows(count: int) -> list[dict[str, object]]:
     return [
@@ -56,3 +60,52 @@ def test_search_tracks_can_disable_youtube_lookup() -> None:
 
     assert len(items) == 3
     assert stub.calls == 0
+
+
+def test_search_tracks_lowers_lookup_depth_as_quota_drains() -> None:
+    now = [1_700_000_000.0]
+    budget = YouTubeQuotaBudget(daily_limit=10_000, burst_units=500, reserve_units=0, clock=lambda: now[0])
+    stub = StubYouTubeService()
+    service = MusicService(youtube_service=stub, youtube_lookup_top_k=5, quota_budget=budget)
+
+    async def fake_itunes_search(_query: str) -> list[dict[str, object]]:
+        return _itunes_rows(10)
+
+    service._itunes_search = fake_itunes_search  # type: ignore[method-assign]
+
+    asyncio.run(service.search_tracks("beautiful", limit=3))
+    assert stub.calls == 4
+
+    budget.consume(300)
+    asyncio.run(service.search_tracks("beautiful again", limit=3))
+    assert stub.calls == 5
+
+    budget.consume(100)
+    items = asyncio.run(service.search_tracks("beautiful once more", limit=3))
+    assert len(items) == 3
+    assert stub.calls == 5
+
+
+class CachingStubYouTubeService(StubYouTubeService):
+    def __init__(self, cached_titles: set[str]) -> None:
+        super().__init__()
+        self.cached_titles = cached_titles
+
+    async def is_cached(self, title: str, artist: str) -> bool:  # noqa: ARG002
+        return title in self.cached_titles
+
+
+def test_search_tracks_does_not_charge_cached_lookups() -> None:
+    now = [1_700_000_000.0]
+    budget = YouTubeQuotaBudget(daily_limit=10_000, burst_units=250, reserve_units=0, clock=lambda: now[0])
+    stub = CachingStubYouTubeService({"Track 1", "Track 2", "Track 4"})
+    service = MusicService(youtube_service=stub, youtube_lookup_top_k=5, quota_budget=budget)
+
+    async def fake_itunes_search(_query: str) -> list[dict[str, object]]:
+        return _itunes_rows(10)
+
+    service._itunes_search = fake_itunes_search  # type: ignore[method-assign]
+
+    # 250 units pay for two API lookups; the three cached tracks ride along for free.
+    asyncio.run(service.search_tracks("beautiful", limit=3))
+    assert stub.calls == 5
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.services_music import MusicService
+from app.singleflight import SingleFlight
+
+
+class NoopYouTubeService:
+    async def lookup_track(self, title: str, artist: str):  # noqa: ARG002
+        return None, None, 0
+
+
+def _service(**kwargs) -> tuple[MusicService, list[str]]:
+    service = MusicService(youtube_service=NoopYouTubeService(), youtube_lookup_top_k=0, **kwargs)
+    calls: list[str] = []
+
+    async def fake_itunes_search(query: str) -> list[dict[str, object]]:
+        calls.append(query)
+        await asyncio.sleep(0.01)
+        return [{"trackId": 1, "trackName": "Song", "artistName": "Artist", "artworkUrl100": "https://example.com/100x100bb.jpg"}]
+
+    service._itunes_search = fake_itunes_search  # type: ignore[method-assign]
+    return service, calls
+
+
+def test_normalized_queries_share_cache_entry() -> None:
+    service, calls = _service()
+
+    async def run() -> None:
+        await service.search_tracks("Beautiful  Things")
+        await service.search_tracks("  beautiful things ")
+
+    asyncio.run(run())
+
+    assert calls == ["beautiful things"]
+    stats = service.search_cache_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_concurrent_identical_queries_make_one_upstream_call() -> None:
+    service, calls = _service()
+
+    async def run() -> list[list]:
+        return await asyncio.gather(*(service.search_tracks("hype boy") for _ in range(10)))
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(len(items) == 1 for items in results)
+    assert service.search_cache_stats()["coalesced"] == 9
+
+
+def test_search_cache_expires_and_evicts() -> None:
+    service, calls = _service(search_cache_ttl_sec=10, search_cache_max_size=2)
+
+    async def run() -> None:
+        await service.search_tracks("a")
+        await service.search_tracks("b")
+        await service.search_tracks("c")
+        await service.search_tracks("a")
+        created_ts, results = service.search_cache["a"]
+        service.search_cache["a"] = (created_ts - 11, results)
+        await service.search_tracks("a")
+
+    asyncio.run(run())
+
+    assert calls == ["a", "b", "c", "a", "a"]
+    assert len(service.search_cache) == 2
+
+
+def test_search_cache_can_be_disabled() -> None:
+    service, calls = _service(search_cache_ttl_sec=0)
+
+    async def run() -> None:
+        await service.search_tracks("a")
+        await service.search_tracks("a")
+
+    asyncio.run(run())
+
+    assert calls == ["a", "a"]
+
+
+def test_single_flight_propagates_errors_without_caching() -> None:
+    flight: SingleFlight[int] = SingleFlight()
+    attempts = 0
+
+    async def boom() -> int:
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def run() -> list:
+        first = await asyncio.gather(flight.do("k", boom), flight.do("k", boom), return_exceptions=True)
+        second = await asyncio.gather(flight.do("k", boom), return_exceptions=True)
+        return first + second
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(item, RuntimeError) for item in results)
+    assert attempts == 2
+    assert flight.inflight_count == 0
+
+
+def test_single_flight_cancelling_one_caller_keeps_shared_call() -> None:
+    flight: SingleFlight[int] = SingleFlight()
+
+    async def slow() -> int:
+        await asyncio.sleep(0.02)
+        return 42
+
+    async def run() -> int:
+        first = asyncio.create_task(flight.do("k", slow))
+        second = asyncio.create_task(flight.do("k", slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == 42
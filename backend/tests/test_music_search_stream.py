@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import replace
+from pathlib import Path
+from typing import Optional
+
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import create_app
+from app.services_music import STREAM_STATS_RESERVE_SEC, MusicService
+from app.services_youtube import YouTubeService
+
+
+class SlowYouTubeService:
+    def __init__(self, delays: dict[str, float]) -> None:
+        self.delays = delays
+
+    async def _lookup(self, title: str) -> tuple[Optional[str], Optional[str], int]:
+        await asyncio.sleep(self.delays.get(title, 0.0))
+        return f"vid-{title}", f"https://www.youtube.com/embed/vid-{title}", 5_000_000
+
+    async def lookup_futures(
+        self, tracks: list[tuple[str, str]], search_timeout_sec: Optional[float] = None  # noqa: ARG002
+    ) -> list[asyncio.Future[tuple[Optional[str], Optional[str], int]]]:
+        return [asyncio.ensure_future(self._lookup(title)) for title, _artist in tracks]
+
+
+def _itunes_rows(count: int) -> list[dict[str, object]]:
+    return [
+        {
+            "trackId": idx,
+            "trackName": f"Track {idx}",
+            "artistName": "Artist",
+            "artworkUrl100": "https://example.com/a/100x100bb.jpg",
+        }
+        for idx in range(1, count + 1)
+    ]
+
+
+def _collect(service: MusicService, **kwargs) -> list[dict]:
+    async def run() -> list[dict]:
+        return [event async for event in service.stream_search("query", **kwargs)]
+
+    return asyncio.run(run())
+
+
+def _service(delays: dict[str, float], top_k: int) -> MusicService:
+    service = MusicService(youtube_service=SlowYouTubeService(delays), youtube_lookup_top_k=top_k)
+
+    async def fake_itunes_search(_query: str) -> list[dict[str, object]]:
+        return _itunes_rows(5)
+
+    service._itunes_search = fake_itunes_search  # type: ignore[method-assign]
+    return service
+
+
+def test_stream_emits_candidates_then_updates_in_completion_order() -> None:
+    service = _service({"Track 1": 0.05, "Track 2": 0.0}, top_k=2)
+
+    events = _collect(service, limit=3, deadline_sec=1.0)
+
+    assert events[0]["type"] == "candidates"
+    assert [item["track_id"] for item in events[0]["items"]] == ["1", "2", "3"]
+    assert all(item["youtube_video_id"] is None for item in events[0]["items"])
+    assert [event["track_id"] for event in events[1:3]] == ["2", "1"]
+    assert events[-1]["type"] == "done"
+    assert events[-1]["timed_out"] is False
+    assert events[-1]["items"][0]["youtube_video_id"] == "vid-Track 1"
+
+
+def test_stream_stops_waiting_at_enrichment_deadline() -> None:
+    service = _service({"Track 1": 0.5}, top_k=1)
+
+    events = _collect(service, limit=2, deadline_sec=0.01)
+
+    assert [event["type"] for event in events] == ["candidates", "done"]
+    assert events[-1]["timed_out"] is True
+    assert len(events[-1]["items"]) == 2
+
+
+
+def test_stream_batches_statistics_across_candidates() -> None:
+    youtube = YouTubeService(api_key="test-key")
+    stats_requests: list[list[str]] = []
+
+    async def fake_search(title: str, artist: str) -> list[str]:  # noqa: ARG001
+        await asyncio.sleep(0.05 if title == "Track 3" else 0.0)
+        return [f"{title}-a"]
+
+    async def fake_statistics(video_ids: list[str]) -> dict[str, int]:
+        stats_requests.append(video_ids)
+        return {video_id: 1_000 for video_id in video_ids}
+
+    youtube._search_video_ids = fake_search  # type: ignore[method-assign]
+    youtube._request_statistics = fake_statistics  # type: ignore[method-assign]
+    service = MusicService(youtube_service=youtube, youtube_lookup_top_k=3)
+
+    async def fake_itunes_search(_query: str) -> list[dict[str, object]]:
+        return _itunes_rows(5)
+
+    service._itunes_search = fake_itunes_search  # type: ignore[method-assign]
+
+    events = _collect(service, limit=3, deadline_sec=1.0)
+    assert sorted(event["track_id"] for event in events if event["type"] == "update") == ["1", "2", "3"]
+    assert stats_requests == [["Track 1-a", "Track 2-a", "Track 3-a"]]
+
+    # With the deadline nearly spent, finished searches go out together and the straggler follows on its own.
+    stats_requests.clear()
+    youtube.cache.clear()
+    youtube.stats_cache.clear()
+    events = _collect(service, limit=3, deadline_sec=STREAM_STATS_RESERVE_SEC + 0.02)
+    assert events[-1]["timed_out"] is False
+    assert stats_requests == [["Track 1-a", "Track 2-a"], ["Track 3-a"]]
+
+class StubMusicService:
+    enrichment_deadline_ms = 2500
+
+    async def stream_search(self, query: str, limit: int = 3, deadline_sec: float = 2.5):
+        yield {"type": "candidates", "limit": limit, "items": [], "deadline_sec": deadline_sec, "query": query}
+        yield {"type": "done", "timed_out": False, "items": []}
+
+
+def test_stream_endpoint_returns_ndjson(tmp_path: Path) -> None:
+    settings = replace(
+        get_settings(),
+        data_dir=tmp_path / "data",
+        inputs_dir=tmp_path / "data" / "inputs",
+        renders_dir=tmp_path / "data" / "renders",
+        jobs_dir=tmp_path / "data" / "jobs",
+        comfy_input_dir=tmp_path / "comfy_input",
+        suggest_index_path=tmp_path / "data" / "suggest_index.json",
+        youtube_cache_db_path=None,
+        rate_limit_db_path=tmp_path / "data" / "ratelimit.sqlite3",
+        queue_backend="memory",
+        render_worker_enabled=False,
+    )
+    app = create_app(settings)
+    app.state.services.music_service = StubMusicService()
+
+    response = TestClient(app).get("/api/v1/music/search/stream?q=hello&deadline_ms=500")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0]["deadline_sec"] == 0.5
+    assert lines[-1]["type"] == "done"
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from app.config import get_settings
+from app.services_comfy import ComfyService
+from app.services_profiler import NodeCostModel, NodeExecutionProfiler, summarize_node_timings
+
+
+PROMPT = {
+    "22": {"class_type": "WanVideoModelLoader", "inputs": {}},
+    "27": {"class_type": "WanVideoSampler", "inputs": {}},
+    "341": {"class_type": "VHS_VideoCombine", "inputs": {}},
+}
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_profiler_records_cached_and_executed_nodes() -> None:
+    clock = FakeClock()
+    profiler = NodeExecutionProfiler(PROMPT, clock=clock)
+
+    profiler.observe("execution_cached", {"nodes": ["22"]})
+    clock.now = 101.0
+    profiler.observe("executing", {"node": "27"})
+    clock.now = 131.0
+    profiler.observe("executing", {"node": "341"})
+    clock.now = 133.5
+    profiler.observe("executed", {"node": "341"})
+    profiler.observe("executing", {"node": None})
+
+    timings = {item["node_id"]: item for item in profiler.as_list()}
+    assert timings["22"]["status"] == "cached"
+    assert timings["22"]["duration_sec"] == 0.0
+    assert timings["27"] == {
+        "node_id": "27",
+        "class_type": "WanVideoSampler",
+        "status": "executed",
+        "start_sec": 1.0,
+        "end_sec": 31.0,
+        "duration_sec": 30.0,
+    }
+    assert timings["341"]["duration_sec"] == 2.5
+
+
+def test_profiler_finish_closes_running_nodes() -> None:
+    clock = FakeClock()
+    profiler = NodeExecutionProfiler(PROMPT, clock=clock)
+
+    profiler.observe("progress_state", {"nodes": {"27": {"state": "running"}}})
+    clock.now = 110.0
+    profiler.finish()
+
+    assert profiler.as_list()[0]["duration_sec"] == 10.0
+
+
+def test_summarize_node_timings_builds_histogram() -> None:
+    profiles = [
+        [
+            {"node_id": "27", "class_type": "WanVideoSampler", "status": "executed", "duration_sec": 200.0},
+            {"node_id": "22", "class_type": "WanVideoModelLoader", "status": "cached", "duration_sec": 0.0},
+        ],
+        [
+            {"node_id": "27", "class_type": "WanVideoSampler", "status": "executed", "duration_sec": 250.0},
+            {"node_id": "22", "class_type": "WanVideoModelLoader", "status": "executed", "duration_sec": 4.0},
+        ],
+    ]
+
+    items = summarize_node_timings(profiles)
+
+    assert [item["node_id"] for item in items] == ["27", "22"]
+    sampler = items[0]
+    assert sampler["executed_count"] == 2
+    assert sampler["total_sec"] == 450.0
+    assert sampler["p50_sec"] == 200.0
+    assert sampler["max_sec"] == 250.0
+    buckets = {bucket["le"]: bucket["count"] for bucket in sampler["histogram"]}
+    assert buckets[120.0] == 0
+    assert buckets[300.0] == 2
+    assert buckets[None] == 2
+    assert items[1]["cached_count"] == 1
+
+
+def test_cost_model_prefers_learned_durations_over_bootstrap() -> None:
+    model = NodeCostModel(smoothing=0.5)
+    assert not model.has_history
+    assert model.weights(PROMPT)["27"] == 150.0
+
+    model.observe([{"node_id": "27", "class_type": "WanVideoSampler", "status": "executed", "duration_sec": 100.0}])
+    model.observe([{"node_id": "27", "class_type": "WanVideoSampler", "status": "executed", "duration_sec": 200.0}])
+    model.observe([{"node_id": "22", "class_type": "WanVideoModelLoader", "status": "cached", "duration_sec": 0.0}])
+
+    weights = model.weights(PROMPT)
+    assert model.has_history
+    assert weights["27"] == 150.0
+    assert weights["22"] == 15.0
+
+
+def test_execution_ratio_is_weighted_by_node_cost() -> None:
+    service = ComfyService(settings=get_settings())
+    weights = {"22": 10.0, "27": 80.0, "341": 10.0}
+
+    assert service._compute_execution_ratio(weights, {"22"}, {}) == 0.1
+    assert service._compute_execution_ratio(weights, {"22"}, {"27": 0.5}) == 0.5
+    assert service._compute_execution_ratio(weights, {"22", "27"}, {"27": 0.5}) == 0.9
+    assert service._compute_execution_ratio(weights, {"unknown"}, {}) == 0.0
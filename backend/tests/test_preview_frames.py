@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import io
+import json
+from dataclasses import replace
+
+import pytest
+from PIL import Image
+
+from app.config import get_settings
+from app.services_comfy import ComfyService
+
+
+def _png_bytes(size: tuple[int, int]) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color=(200, 10, 10)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_decode_preview_image_frame() -> None:
+    frame = (1).to_bytes(4, "big") + (1).to_bytes(4, "big") + b"jpeg-bytes"
+    assert ComfyService._decode_preview_frame(frame) == (b"jpeg-bytes", "image/jpeg")
+
+
+def test_decode_preview_image_with_metadata_frame() -> None:
+    metadata = json.dumps({"image_type": "image/png", "node_id": "27"}).encode("utf-8")
+    frame = (4).to_bytes(4, "big") + len(metadata).to_bytes(4, "big") + metadata + b"png-bytes"
+    assert ComfyService._decode_preview_frame(frame) == (b"png-bytes", "image/png")
+
+
+@pytest.mark.parametrize("frame", [b"", (3).to_bytes(4, "big") + b"\x00" * 8, (1).to_bytes(4, "big") + (9).to_bytes(4, "big")])
+def test_decode_preview_ignores_unknown_frames(frame: bytes) -> None:
+    assert ComfyService._decode_preview_frame(frame) is None
+
+
+def test_downscale_preview_limits_longest_side() -> None:
+    service = ComfyService(settings=replace(get_settings(), preview_max_size=64))
+
+    image, media_type = service._downscale_preview(_png_bytes((512, 256)), "image/png")
+
+    assert media_type == "image/jpeg"
+    with Image.open(io.BytesIO(image)) as decoded:
+        assert decoded.size == (64, 32)
+
+
+def test_downscale_preview_keeps_small_frames() -> None:
+    service = ComfyService(settings=replace(get_settings(), preview_max_size=64))
+    original = _png_bytes((32, 32))
+
+    assert service._downscale_preview(original, "image/png") == (original, "image/png")
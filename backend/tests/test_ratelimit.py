@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import time
+from dataclasses import replace
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.config import Settings, get_settings
+from app.main import create_app
+from app.ratelimit import MemoryBucketStore, RateLimiter, RateLimitRule, SQLiteBucketStore, client_identity
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_token_bucket_refills_and_reports_retry_after() -> None:
+    clock = FakeClock()
+    limiter = RateLimiter({"search": RateLimitRule(capacity=3, refill_per_sec=0.5)}, MemoryBucketStore(clock=clock))
+
+    decisions = [limiter.check("search", "ip:1") for _ in range(4)]
+    assert [decision.allowed for decision in decisions] == [True, True, True, False]
+    assert [decision.remaining for decision in decisions] == [2, 1, 0, 0]
+    assert decisions[-1].retry_after_sec == 2
+    assert decisions[-1].reset_sec == 6
+    assert decisions[-1].policy == "3;w=6"
+
+    assert limiter.check("search", "ip:2").allowed
+    clock.now += 2
+    assert limiter.check("search", "ip:1").allowed
+    assert not limiter.check("search", "ip:1").allowed
+
+
+def test_disabled_bucket_is_unlimited() -> None:
+    limiter = RateLimiter({"render": RateLimitRule(capacity=3, refill_per_sec=0.0)}, MemoryBucketStore())
+    assert limiter.check("render", "ip:1") is None
+    assert limiter.check("unknown", "ip:1") is None
+
+
+def test_memory_store_forgets_least_recent_clients() -> None:
+    store = MemoryBucketStore(max_keys=2)
+    rule = RateLimitRule(capacity=1, refill_per_sec=0.01)
+    for key in ("a", "b", "c"):
+        store.take(key, rule, 1)
+    assert list(store.buckets) == ["b", "c"]
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path: Path) -> None:
+    clock = FakeClock()
+    rule = RateLimitRule(capacity=2, refill_per_sec=1.0)
+    first = SQLiteBucketStore(tmp_path / "ratelimit.sqlite3", clock=clock)
+    second = SQLiteBucketStore(tmp_path / "ratelimit.sqlite3", clock=clock)
+    try:
+        assert first.take("render:ip:1", rule, 1) == (True, 1.0)
+        assert second.take("render:ip:1", rule, 1) == (True, 0.0)
+        assert first.take("render:ip:1", rule, 1) == (False, 0.0)
+        clock.now += 1.5
+        assert second.take("render:ip:1", rule, 1) == (True, 0.5)
+    finally:
+        first.close()
+        second.close()
+
+
+
+def test_locked_sqlite_store_does_not_block_the_event_loop(tmp_path: Path) -> None:
+    path = tmp_path / "ratelimit.sqlite3"
+    limiter = RateLimiter({"search": RateLimitRule(capacity=2, refill_per_sec=1.0)}, SQLiteBucketStore(path))
+    blocker = sqlite3.connect(str(path), isolation_level=None)
+
+    async def run() -> tuple[bool, float, bool]:
+        # Another API process holds the write lock, so the bucket update waits on the busy timeout.
+        blocker.execute("BEGIN IMMEDIATE")
+        check = asyncio.create_task(limiter.check_async("search", "ip:1"))
+        started = time.monotonic()
+        for _ in range(10):
+            await asyncio.sleep(0.02)
+        elapsed = time.monotonic() - started
+        waiting = not check.done()
+        blocker.execute("COMMIT")
+        decision = await check
+        return waiting, elapsed, decision is not None and decision.allowed
+
+    try:
+        waiting, elapsed, allowed = asyncio.run(run())
+    finally:
+        blocker.close()
+        limiter.close()
+    assert waiting
+    assert elapsed < 1.0
+    assert allowed
+
+def test_client_identity() -> None:
+    scope = {
+        "client": ("10.0.0.2", 5000),
+        "headers": [(b"x-forwarded-for", b"1.2.3.4, 203.0.113.9"), (b"x-api-key", b"partner")],
+    }
+    assert client_identity(scope) == "ip:10.0.0.2"
+    assert client_identity(scope, trust_forwarded=True) == "ip:203.0.113.9"
+    assert client_identity(scope, api_keys=frozenset({"partner"})).startswith("key:")
+    assert client_identity(scope, api_keys=frozenset({"other"})) == "ip:10.0.0.2"
+
+
+def _settings(root: Path, **overrides: object) -> Settings:
+    return replace(
+        get_settings(),
+        data_dir=root / "data",
+        inputs_dir=root / "data" / "inputs",
+        renders_dir=root / "data" / "renders",
+        jobs_dir=root / "data" / "jobs",
+        comfy_input_dir=root / "comfy_input",
+        suggest_index_path=root / "data" / "suggest_index.json",
+        youtube_cache_db_path=None,
+        rate_limit_db_path=root / "data" / "ratelimit.sqlite3",
+        queue_backend="memory",
+        render_worker_enabled=False,
+        rate_limit_search_burst=2,
+        rate_limit_search_per_min=1,
+        rate_limit_api_keys=frozenset({"partner"}),
+        **overrides,
+    )
+
+
+def test_search_requests_are_limited_per_client(tmp_path: Path) -> None:
+    app = create_app(_settings(tmp_path))
+    state = app.state.services
+
+    async def fake_search(query: str, limit: int):  # noqa: ARG001
+        return []
+
+    state.music_service.search_tracks = fake_search  # type: ignore[method-assign]
+    client = TestClient(app)
+
+    first = client.get("/api/v1/music/search", params={"q": "song"})
+    assert first.status_code == 200
+    assert first.headers["ratelimit-limit"] == "2"
+    assert first.headers["ratelimit-remaining"] == "1"
+    assert first.headers["ratelimit-policy"] == "2;w=120"
+    assert client.get("/api/v1/music/search", params={"q": "song"}).status_code == 200
+
+    limited = client.get("/api/v1/music/search", params={"q": "song"}, headers={"Origin": "http://localhost:5173"})
+    assert limited.status_code == 429
+    assert limited.json() == {"detail": "rate limit exceeded", "bucket": "search"}
+    assert limited.headers["retry-after"] == "60"
+    assert limited.headers["access-control-allow-origin"] == "*"
+
+    assert client.get("/api/v1/music/search", params={"q": "song"}, headers={"X-API-Key": "partner"}).status_code == 200
+    assert client.get("/api/v1/music/search/cache").status_code == 200
+    assert "ratelimit-limit" not in client.get("/api/v1/renders/history").headers
+
+
+def test_render_bucket_is_separate_and_built_lazily(tmp_path: Path) -> None:
+    app = create_app(_settings(tmp_path, rate_limit_render_burst=1, rate_limit_backend="sqlite"))
+    state = app.state.services
+    client = TestClient(app)
+
+    assert client.get("/").status_code == 200
+    assert not state.is_built("rate_limiter")
+
+    payload = {"track_id": "1"}
+    first = client.post("/api/v1/renders", json=payload)
+    assert first.status_code == 422
+    assert first.headers["ratelimit-remaining"] == "0"
+    assert client.post("/api/v1/renders", json=payload).status_code == 429
+    assert (tmp_path / "data" / "ratelimit.sqlite3").exists()
+    state.rate_limiter.close()
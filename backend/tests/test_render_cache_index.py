@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from app.config import get_settings
+from app.services_music import MusicService
+from app.services_render_index import RenderCacheIndex
+from app.storage import Storage
+
+
+@pytest.fixture
+def storage(tmp_path: Path) -> Storage:
+    data_dir = tmp_path / "data"
+    settings = replace(
+        get_settings(),
+        data_dir=data_dir,
+        inputs_dir=data_dir / "inputs",
+        renders_dir=data_dir / "renders",
+        jobs_dir=data_dir / "jobs",
+        comfy_input_dir=tmp_path / "comfy_input",
+    )
+    storage = Storage(settings)
+    storage.ensure_directories()
+    return storage
+
+
+def _write_render(storage: Storage, cache_key: str, track: dict[str, str], workflow_version: str = "v1") -> None:
+    render_dir = storage.ensure_render_dir(cache_key)
+    (render_dir / "video.mp4").write_bytes(b"mp4")
+    storage.write_meta(
+        cache_key,
+        {"track": track, "cache_key": cache_key, "workflow_version": workflow_version, "render_preset": "p"},
+    )
+
+
+def test_rebuild_indexes_current_workflow_renders_only(storage: Storage) -> None:
+    _write_render(storage, "current", {"album_id": "10", "album_art_url": "https://a/10.jpg"})
+    _write_render(storage, "old", {"album_id": "20", "album_art_url": "https://a/20.jpg"}, workflow_version="v0")
+    index = RenderCacheIndex(storage, "v1", "p")
+    index.rebuild()
+
+    assert index.lookup("10", None) == "current"
+    assert index.lookup(None, "https://a/10.jpg") == "current"
+    assert index.lookup("20", "https://a/20.jpg") is None
+
+
+def test_lookup_drops_entries_whose_render_was_removed(storage: Storage) -> None:
+    index = RenderCacheIndex(storage, "v1", "p")
+    index.record({"album_id": "10", "album_art_url": "https://a/10.jpg"}, "missing")
+
+    assert index.lookup("10", "https://a/10.jpg") is None
+    assert index.by_album_id == {}
+    assert index.by_art_url == {}
+
+
+class NoopYouTubeService:
+    async def lookup_tracks(self, tracks):
+        return [(None, None, 0) for _ in tracks]
+
+
+def test_search_results_are_annotated_and_boosted(storage: Storage) -> None:
+    _write_render(storage, "cached", {"album_id": "2", "album_art_url": "https://a/600x600bb.jpg"})
+    index = RenderCacheIndex(storage, "v1", "p")
+    index.rebuild()
+    service = MusicService(
+        youtube_service=NoopYouTubeService(),
+        youtube_lookup_top_k=0,
+        render_index=index,
+        render_cached_boost=0.5,
+    )
+
+    async def fake_itunes_search(query: str) -> list[dict[str, object]]:  # noqa: ARG001
+        return [
+            {"trackId": 1, "collectionId": 1, "trackName": "First", "artistName": "A", "artworkUrl100": "https://a/other.jpg"},
+            {"trackId": 2, "collectionId": 2, "trackName": "Second", "artistName": "B", "artworkUrl100": "https://a/100x100bb.jpg"},
+        ]
+
+    service._itunes_search = fake_itunes_search  # type: ignore[method-assign]
+    items = asyncio.run(service.search_tracks("q", limit=2))
+
+    assert [item.track_id for item in items] == ["2", "1"]
+    assert items[0].render_cached is True
+    assert items[0].video_url == "/static/renders/cached/video.mp4"
+    assert items[1].render_cached is False
+    assert items[1].video_url is None
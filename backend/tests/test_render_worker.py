@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from app.config import get_settings
+from app.schemas import RenderCreateRequest
+from app.services_comfy import ComfyService, RenderOutputs
+from app.services_jobstore import SQLiteJobStore
+from app.services_queue import RenderQueueService
+from app.services_render_index import RenderCacheIndex
+from app.storage import Storage
+from app.worker import build_worker
+
+
+class FakeComfyService(ComfyService):
+    def __init__(self, settings, block: bool = False) -> None:
+        super().__init__(settings)
+        self.block = block
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+        self.hold = False
+
+    async def render(self, image_filename, cache_key, render_dir, phase_callback=None, preview_callback=None, **kwargs):  # noqa: ARG002
+        self.started.set()
+        if phase_callback:
+            await phase_callback("sampling")
+        if preview_callback:
+            await preview_callback(b"frame-1", "image/jpeg")
+        if self.block:
+            await asyncio.Event().wait()
+        if self.hold:
+            await self.release.wait()
+        video_path = render_dir / "video.mp4"
+        thumb_path = render_dir / "thumb.jpg"
+        video_path.write_bytes(b"mp4")
+        thumb_path.write_bytes(b"jpg")
+        return RenderOutputs(video_path=video_path, thumb_path=thumb_path)
+
+
+@pytest.fixture
+def settings(tmp_path: Path):
+    data_dir = tmp_path / "data"
+    return replace(
+        get_settings(),
+        data_dir=data_dir,
+        inputs_dir=data_dir / "inputs",
+        renders_dir=data_dir / "renders",
+        jobs_dir=data_dir / "jobs",
+        comfy_input_dir=tmp_path / "comfy_input",
+        comfy_warmup_enabled=False,
+        queue_backend="sqlite",
+        queue_db_path=data_dir / "queue.sqlite3",
+        queue_lease_sec=3,
+        queue_poll_interval_ms=20,
+        render_worker_enabled=False,
+    )
+
+
+def _api_service(settings) -> RenderQueueService:
+    storage = Storage(settings)
+    storage.ensure_directories()
+
+    async def fake_download(_url: str, timeout_sec: int = 30):  # noqa: ARG001
+        return b"img", ".jpg"
+
+    storage.download_album_art = fake_download  # type: ignore[method-assign]
+    return RenderQueueService(settings, storage, ComfyService(settings), job_store=SQLiteJobStore(settings.queue_db_path))
+
+
+def _worker(settings, block: bool = False) -> RenderQueueService:
+    worker = build_worker(settings)
+    worker.comfy_service = FakeComfyService(worker.settings, block=block)
+    return worker
+
+
+async def _wait_for_status(api: RenderQueueService, job_id: str, wanted: str) -> None:
+    for _ in range(200):
+        status = await api.get_job(job_id)
+        if status is not None and status.status == wanted:
+            return
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"job {job_id} never reached {wanted}")
+
+
+def test_standalone_worker_renders_jobs_enqueued_by_api(settings) -> None:
+    api = _api_service(settings)
+    worker = _worker(settings)
+    req = RenderCreateRequest(track_id="1", title="T", artist="A", album_art_url="https://a/1.jpg")
+
+    async def run():
+        worker.start()
+        created = await api.create_job(req)
+        await _wait_for_status(api, created.job_id, "completed")
+        workers = api.list_workers()
+        await worker.stop()
+        return workers, api.list_workers(), await api.get_job(created.job_id)
+
+    workers_running, workers_stopped, final = asyncio.run(run())
+
+    assert api.worker_task is None
+    assert [item["worker_id"] for item in workers_running] == [worker.worker_id]
+    assert workers_running[0]["alive"] is True
+    assert workers_stopped == []
+    assert final is not None and final.status == "completed"
+    assert final.result is not None and final.result.video_url.endswith("/video.mp4")
+    assert api.queue_depth() == 0
+
+
+def test_api_serves_previews_and_indexes_renders_from_a_separate_worker(settings) -> None:
+    api = _api_service(settings)
+    api.render_index = RenderCacheIndex(api.storage, settings.workflow_version, settings.render_preset)
+    worker = _worker(settings)
+    worker.comfy_service.hold = True
+    req = RenderCreateRequest(track_id="1", title="T", artist="A", album_art_url="https://a/1.jpg")
+
+    async def run():
+        api.start()
+        worker.start()
+        created = await api.create_job(req)
+        await asyncio.wait_for(worker.comfy_service.started.wait(), timeout=5)
+        await asyncio.sleep(0.05)
+        preview = await api.get_preview(created.job_id)
+        worker.comfy_service.release.set()
+        # No status polls from here on: the API has to notice the completion by following the shared store.
+        for _ in range(200):
+            if api.render_index.lookup(None, req.album_art_url):
+                break
+            await asyncio.sleep(0.02)
+        cache_key = api.render_index.lookup(None, req.album_art_url)
+        after = await api.get_preview(created.job_id)
+        await worker.stop()
+        await api.stop()
+        return preview, cache_key, after
+
+    preview, cache_key, after = asyncio.run(run())
+
+    assert preview == (b"frame-1", "image/jpeg")
+    assert cache_key is not None
+    assert after is None
+    assert api.storage.read_preview(cache_key) is None
+
+
+def test_stopping_a_worker_hands_its_job_to_another(settings) -> None:
+    api = _api_service(settings)
+    first = _worker(settings, block=True)
+    second = _worker(settings)
+    req = RenderCreateRequest(track_id="1", title="T", artist="A", album_art_url="https://a/1.jpg")
+
+    async def run():
+        first.start()
+        created = await api.create_job(req)
+        await asyncio.wait_for(first.comfy_service.started.wait(), timeout=5)
+        await first.stop()
+        requeued = await api.get_job(created.job_id)
+        second.start()
+        await _wait_for_status(api, created.job_id, "completed")
+        await second.stop()
+        return requeued
+
+    requeued = asyncio.run(run())
+
+    assert requeued is not None and requeued.status == "queued" and requeued.queue_position == 1
+    assert api.job_store is not None and api.job_store.waiting_job_ids() == []
+
+
+def test_worker_abandons_a_job_whose_lease_was_reclaimed(settings) -> None:
+    api = _api_service(settings)
+    worker = _worker(settings, block=True)
+    req = RenderCreateRequest(track_id="1", title="T", artist="A", album_art_url="https://a/1.jpg")
+
+    async def run():
+        worker.start()
+        created = await api.create_job(req)
+        await asyncio.wait_for(worker.comfy_service.started.wait(), timeout=5)
+        # Another worker reclaimed the lease after this one missed its renewals.
+        api.job_store._conn.execute("UPDATE render_queue SET lease_owner = 'other-worker'")  # noqa: SLF001
+        await worker._beat()
+        for _ in range(100):
+            if worker.active_job_id is None:
+                break
+            await asyncio.sleep(0.02)
+        abandoned = worker.active_job_id is None and not worker.worker_task.done()
+        status = await api.get_job(created.job_id)
+        owner = api.job_store._conn.execute("SELECT lease_owner FROM render_queue").fetchone()  # noqa: SLF001
+        await worker.stop()
+        return abandoned, status, owner
+
+    abandoned, status, owner = asyncio.run(run())
+
+    assert abandoned
+    assert status is not None and status.status == "processing"
+    assert owner == ("other-worker",)
+    assert not any(settings.renders_dir.glob("*/meta.json"))
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+from pathlib import Path
+
+from app import services_suggest
+from app.services_music import MusicService
+from app.services_suggest import TrackSuggestIndex
+
+
+def _track(track_id: str, title: str, artist: str) -> dict[str, str]:
+    return {"track_id": track_id, "title": title, "artist": artist, "album_art_url": f"https://example.com/{track_id}.jpg"}
+
+
+def test_prefix_match_ranks_rendered_tracks_first() -> None:
+    index = TrackSuggestIndex()
+    index.observe_tracks([_track("1", "Beautiful Things", "Benson Boone"), _track("2", "Beautiful Day", "U2")])
+    index.observe_tracks([_track("2", "Beautiful Day", "U2")])
+    index.mark_rendered(_track("1", "Beautiful Things", "Benson Boone"), "/media/abc/video.mp4")
+
+    items = index.suggest("beau", limit=5)
+
+    assert [item["track_id"] for item in items] == ["1", "2"]
+    assert items[0]["render_cached"] is True
+    assert items[0]["video_url"] == "/media/abc/video.mp4"
+    assert [item["track_id"] for item in index.suggest("beautiful da")] == ["2"]
+    assert index.suggest("benson u2") == []
+
+
+def test_index_persists_and_evicts_oldest(tmp_path: Path) -> None:
+    path = tmp_path / "suggest_index.json"
+    index = TrackSuggestIndex(path=path, max_entries=2)
+    index.observe_tracks([_track("1", "One", "A")])
+    index.observe_tracks([_track("2", "Two", "B")])
+    index.observe_tracks([_track("3", "Three", "C")])
+    index.save()
+
+    reloaded = TrackSuggestIndex(path=path, max_entries=2)
+
+    assert sorted(reloaded.tracks) == ["2", "3"]
+    assert reloaded.suggest("one") == []
+    assert reloaded.suggest("thr")[0]["track_id"] == "3"
+
+
+def test_ranked_prefixes_match_a_full_scan_after_evictions(monkeypatch) -> None:
+    # Small enough that broad prefixes are served from the pre-ranked lists rather than scanned.
+    monkeypatch.setattr(services_suggest, "RANKED_PER_PREFIX", 12)
+    monkeypatch.setattr(services_suggest, "EXACT_SCAN_MAX", 16)
+    index = TrackSuggestIndex(max_entries=300)
+    rng = random.Random(3)
+    words = ["sun", "song", "summer", "star", "storm", "silver", "sea", "sky"]
+    for step in range(3_000):
+        number = rng.randrange(800)
+        track = _track(str(number), f"{words[number % len(words)]} {number}", f"artist {number % 40}")
+        if step % 97 == 0:
+            index.mark_rendered(track, f"/media/{number}/video.mp4")
+        else:
+            index.observe_tracks([track])
+
+    assert len(index.tracks) == 300
+    def full_scan(query: str) -> list[str]:
+        keys = query.split()
+        matches = [
+            record
+            for record in index.tracks.values()
+            if all(any(token.startswith(key) for token in f"{record['title']} {record['artist']}".split()) for key in keys)
+        ]
+        matches.sort(key=lambda record: (not record["render_cached"], -record["popularity"], -record["last_seen"]))
+        return [record["track_id"] for record in matches]
+
+    for query in ("s", "su", "song", "a", "artist", "artist 12"):
+        assert [item["track_id"] for item in index.suggest(query, limit=10)] == full_scan(query)[:10]
+
+    # When every token is broad only the pre-ranked leaders are considered: still valid matches, in rank order.
+    expected = full_scan("artist 1")
+    found = [item["track_id"] for item in index.suggest("artist 1", limit=10)]
+    assert found and found == [track_id for track_id in expected if track_id in found]
+
+
+def test_saves_are_debounced_off_the_event_loop(tmp_path: Path) -> None:
+    path = tmp_path / "suggest_index.json"
+    index = TrackSuggestIndex(path=path, save_every=2, save_delay_sec=0.05)
+
+    async def run() -> None:
+        index.observe_tracks([_track("1", "One", "A"), _track("2", "Two", "B")])
+        index.observe_tracks([_track("3", "Three", "C"), _track("4", "Four", "D")])
+        assert not path.exists()
+        await asyncio.sleep(0.2)
+        assert len(json.loads(path.read_text(encoding="utf-8"))) == 4
+        index.observe_tracks([_track("5", "Five", "E")])
+        await index.close()
+
+    asyncio.run(run())
+    assert len(json.loads(path.read_text(encoding="utf-8"))) == 5
+
+
+class NoopYouTubeService:
+    async def lookup_track(self, title: str, artist: str):  # noqa: ARG002
+        return None, None, 0
+
+    async def lookup_tracks(self, tracks):
+        return [(None, None, 0) for _ in tracks]
+
+
+def test_suggest_falls_back_to_itunes_then_serves_locally() -> None:
+    index = TrackSuggestIndex()
+    service = MusicService(youtube_service=NoopYouTubeService(), youtube_lookup_top_k=0, suggest_index=index)
+    calls: list[str] = []
+
+    async def fake_itunes_search(query: str) -> list[dict[str, object]]:
+        calls.append(query)
+        return [{"trackId": 7, "trackName": "Espresso", "artistName": "Sabrina Carpenter", "artworkUrl100": "https://example.com/100x100bb.jpg"}]
+
+    service._itunes_search = fake_itunes_search  # type: ignore[method-assign]
+
+    async def run() -> tuple[tuple[list, str], tuple[list, str]]:
+        first = await service.suggest_tracks("espresso")
+        second = await service.suggest_tracks("esp")
+        return first, second
+
+    (first_items, first_source), (second_items, second_source) = asyncio.run(run())
+
+    assert first_source == "itunes"
+    assert first_items[0]["track_id"] == "7"
+    assert second_source == "local"
+    assert second_items[0]["title"] == "Espresso"
+    assert calls == ["espresso"]
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import create_app
+from app.schemas import RenderCreateRequest
+from app.services_comfy import ComfyService, RenderOutputs
+from app.services_queue import RenderQueueService
+from app.storage import Storage
+from app.tracing import TRACER, JsonLinesExporter, Span, Tracer, parse_traceparent
+
+
+class ListExporter:
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def close(self) -> None:
+        pass
+
+    def named(self, name: str) -> Span:
+        matches = [span for span in self.spans if span.name == name]
+        assert len(matches) == 1, [span.name for span in self.spans]
+        return matches[0]
+
+
+@pytest.fixture
+def exporter():
+    exporter = ListExporter()
+    TRACER.configure(1.0, exporter)
+    yield exporter
+    TRACER.configure(0.0, None)
+
+
+def test_nested_spans_share_trace_and_record_errors() -> None:
+    exporter = ListExporter()
+    tracer = Tracer(sample_rate=1.0, exporter=exporter)
+
+    with tracer.span("outer", kind="test") as outer:
+        with pytest.raises(ValueError):
+            with tracer.span("inner"):
+                raise ValueError("boom")
+        tracer.record("measured", outer.trace_id, start_ts=10.0, end_ts=12.5)
+
+    inner, measured, outer_span = exporter.spans
+    assert outer_span.name == "outer" and outer_span.parent_id is None
+    assert inner.parent_id == outer_span.span_id and inner.trace_id == outer_span.trace_id
+    assert inner.status == "error" and "boom" in (inner.error or "")
+    assert measured.parent_id == outer_span.span_id and measured.duration_sec == 2.5
+    assert outer_span.attributes == {"kind": "test"}
+
+
+def test_unsampled_root_suppresses_children() -> None:
+    exporter = ListExporter()
+    decisions = iter([0.9, 0.0])
+    tracer = Tracer(sample_rate=0.5, exporter=exporter, rng=lambda: next(decisions))
+
+    with tracer.span("dropped") as root:
+        assert root.trace_id is None
+        with tracer.span("child"):
+            pass
+    with tracer.continued("job", None):
+        with tracer.span("inside unsampled job"):
+            pass
+    with tracer.continued("job", "a" * 32, parent_id="b" * 16):
+        with tracer.span("step"):
+            pass
+
+    assert [span.name for span in exporter.spans] == ["step", "job"]
+    assert exporter.spans[1].parent_id == "b" * 16
+
+
+def test_json_lines_exporter_flushes_on_close(tmp_path: Path) -> None:
+    path = tmp_path / "traces" / "spans.jsonl"
+    tracer = Tracer(sample_rate=1.0, exporter=JsonLinesExporter(path, flush_every=100))
+    with tracer.span("one"):
+        pass
+    assert not path.exists()
+    tracer.close()
+    [line] = path.read_text(encoding="utf-8").splitlines()
+    assert json.loads(line)["name"] == "one"
+
+
+def test_parse_traceparent() -> None:
+    trace_id, span_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+    assert parse_traceparent(f"00-{trace_id}-{span_id}-01") == (trace_id, span_id)
+    assert parse_traceparent(f"00-{trace_id}-{span_id}-00") is None
+    assert parse_traceparent("garbage") is None
+    assert parse_traceparent(None) is None
+
+
+class PhasedComfyService(ComfyService):
+    async def render(self, image_filename, cache_key, render_dir, phase_callback=None, **kwargs):  # noqa: ARG002
+        for phase in ("prompting", "sampling", "assembling"):
+            await phase_callback(phase)
+        video_path, thumb_path = render_dir / "video.mp4", render_dir / "thumb.jpg"
+        video_path.write_bytes(b"mp4")
+        thumb_path.write_bytes(b"jpg")
+        return RenderOutputs(video_path=video_path, thumb_path=thumb_path)
+
+
+def test_render_job_spans_follow_trace_id_on_job_record(tmp_path: Path, exporter: ListExporter) -> None:
+    data_dir = tmp_path / "data"
+    settings = replace(
+        get_settings(),
+        data_dir=data_dir,
+        inputs_dir=data_dir / "inputs",
+        renders_dir=data_dir / "renders",
+        jobs_dir=data_dir / "jobs",
+        comfy_input_dir=tmp_path / "comfy_input",
+        comfy_warmup_enabled=False,
+        queue_backend="memory",
+        render_worker_enabled=True,
+    )
+    storage = Storage(settings)
+
+    async def fake_download(_url: str, timeout_sec: int = 30):  # noqa: ARG001
+        return b"img", ".jpg"
+
+    storage.download_album_art = fake_download  # type: ignore[method-assign]
+    service = RenderQueueService(settings, storage, PhasedComfyService(settings))
+
+    async def run() -> str:
+        service.start()
+        try:
+            created = await service.create_job(
+                RenderCreateRequest(track_id="1", title="Song", artist="Artist", album_art_url="https://example.com/a.jpg")
+            )
+            for _ in range(200):
+                status = await service.get_job(created.job_id)
+                if status is not None and status.status == "completed":
+                    break
+                await asyncio.sleep(0.01)
+            return created.job_id
+        finally:
+            await service.stop()
+
+    job_id = asyncio.run(run())
+    job = service.jobs[job_id]
+
+    create = exporter.named("render.create_job")
+    assert job.trace_id == create.trace_id and job.trace_span_id == create.span_id
+    assert exporter.named("render.fetch_art").parent_id == create.span_id
+    assert exporter.named("render.hash_art").trace_id == job.trace_id
+    assert exporter.named("render.queue_wait").parent_id == create.span_id
+
+    render_job = exporter.named("render.job")
+    assert render_job.parent_id == create.span_id
+    assert render_job.attributes["status"] == "completed"
+    for phase in ("preparing", "prompting", "sampling", "assembling"):
+        assert exporter.named(f"render.phase.{phase}").parent_id == render_job.span_id
+    assert {span.trace_id for span in exporter.spans} == {job.trace_id}
+
+
+def test_http_requests_get_trace_header(tmp_path: Path, exporter: ListExporter) -> None:
+    app = create_app(replace(get_settings(), data_dir=tmp_path, trace_sample_rate=0.0))
+    TRACER.configure(1.0, exporter)
+    client = TestClient(app)
+
+    response = client.get("/")
+    span = exporter.named("HTTP GET /")
+    assert response.headers["x-trace-id"] == span.trace_id
+    assert span.attributes["http.status_code"] == 200
+
+    traceparent = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+    client.get("/api/v1/renders/missing", headers={"traceparent": traceparent})
+    continued = exporter.named("HTTP GET /api/v1/renders/{job_id}")
+    assert continued.trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+    assert continued.parent_id == "00f067aa0ba902b7"
+    assert continued.attributes["http.status_code"] == 404
+
+
+def test_json_lines_exporters_sharing_a_file_keep_lines_whole(tmp_path: Path) -> None:
+    path = tmp_path / "spans.jsonl"
+    first, second = JsonLinesExporter(path, flush_every=3), JsonLinesExporter(path, flush_every=5)
+    tracer_a, tracer_b = Tracer(sample_rate=1.0, exporter=first), Tracer(sample_rate=1.0, exporter=second)
+    for index in range(20):
+        with tracer_a.span("a", payload="x" * 2000 * index):
+            pass
+        with tracer_b.span("b"):
+            pass
+    tracer_a.close()
+    tracer_b.close()
+
+    names = [json.loads(line)["name"] for line in path.read_text(encoding="utf-8").splitlines()]
+    assert sorted(names) == ["a"] * 20 + ["b"] * 20
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from app.services_youtube import YouTubeService
+
+
+def _service(fail: bool = False) -> tuple[YouTubeService, list[tuple[str, str]]]:
+    service = YouTubeService(api_key="test-key")
+    calls: list[tuple[str, str]] = []
+
+    async def fake_request_lookup(title: str, artist: str):
+        calls.append((title, artist))
+        await asyncio.sleep(0.01)
+        if fail:
+            raise RuntimeError("quota exceeded")
+        return "vid-1", "https://www.youtube.com/embed/vid-1", 1_000
+
+    service._request_lookup = fake_request_lookup  # type: ignore[method-assign]
+    return service, calls
+
+
+def test_concurrent_lookups_share_one_upstream_call() -> None:
+    service, calls = _service()
+
+    async def run() -> list:
+        return await asyncio.gather(*(service.lookup_track("Ditto", "NewJeans") for _ in range(8)))
+
+    results = asyncio.run(run())
+
+    assert calls == [("Ditto", "NewJeans")]
+    assert set(results) == {("vid-1", "https://www.youtube.com/embed/vid-1", 1_000)}
+    assert service.lookup_flight.coalesced == 7
+    assert service.lookup_flight.inflight_count == 0
+
+
+def test_failed_lookup_is_shared_and_cached_as_empty() -> None:
+    service, calls = _service(fail=True)
+
+    async def run() -> list:
+        return await asyncio.gather(*(service.lookup_track("Ditto", "NewJeans") for _ in range(3)))
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert results == [(None, None, 0)] * 3
+
+
+def test_cancelled_caller_does_not_cancel_shared_lookup() -> None:
+    service, calls = _service()
+
+    async def run():
+        first = asyncio.create_task(service.lookup_track("Ditto", "NewJeans"))
+        second = asyncio.create_task(service.lookup_track("ditto", "newjeans"))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run())[0] == "vid-1"
+    assert len(calls) == 1
+    assert asyncio.run(service._cache_get(service._cache_key("Ditto", "NewJeans"))) is not None
+
+
+def test_lookup_cache_is_shared_through_sqlite(tmp_path) -> None:
+    db_path = tmp_path / "youtube_cache.sqlite3"
+    writer = YouTubeService(api_key="test-key", cache_db_path=db_path)
+    asyncio.run(writer._cache_set(writer._cache_key("Ditto", "NewJeans"), ("vid-9", "https://www.youtube.com/embed/vid-9", 42)))
+    writer.close()
+
+    reader = YouTubeService(api_key="test-key", cache_db_path=db_path)
+
+    async def fail_request(_title: str, _artist: str):
+        raise AssertionError("persistent cache hit should not call YouTube")
+
+    reader._request_lookup = fail_request  # type: ignore[method-assign]
+
+    assert asyncio.run(reader.lookup_track("ditto", "newjeans"))[0] == "vid-9"
+
+
+
+def test_locked_lookup_db_does_not_block_the_event_loop(tmp_path) -> None:
+    db_path = tmp_path / "youtube_cache.sqlite3"
+    service = YouTubeService(api_key="test-key", cache_db_path=db_path)
+    blocker = sqlite3.connect(str(db_path), isolation_level=None)
+
+    async def run() -> tuple[bool, float]:
+        # Another process holds the write lock, so persisting the lookup waits on the busy timeout.
+        blocker.execute("BEGIN IMMEDIATE")
+        write = asyncio.create_task(service._cache_set(service._cache_key("Ditto", "NewJeans"), ("vid-9", None, 1)))
+        started = time.monotonic()
+        for _ in range(10):
+            await asyncio.sleep(0.02)
+        elapsed = time.monotonic() - started
+        waiting = not write.done()
+        blocker.execute("COMMIT")
+        await write
+        return waiting, elapsed
+
+    waiting, elapsed = asyncio.run(run())
+    blocker.close()
+    service.close()
+    assert waiting
+    assert elapsed < 1.0
+
+def test_negative_results_use_shorter_ttl() -> None:
+    service = YouTubeService(api_key="test-key", cache_ttl_sec=1_000, negative_cache_ttl_sec=10)
+    positive_key = service._cache_key("a", "b")
+    negative_key = service._cache_key("c", "d")
+    asyncio.run(service._cache_set(positive_key, ("vid", "https://www.youtube.com/embed/vid", 1)))
+    asyncio.run(service._cache_set(negative_key, (None, None, 0)))
+    for key in (positive_key, negative_key):
+        created_ts, result = service.cache[key]
+        service.cache[key] = (created_ts - 60, result)
+
+    assert asyncio.run(service._cache_get(positive_key)) is not None
+    assert asyncio.run(service._cache_get(negative_key)) is None
+
+
+def test_stale_entry_is_served_and_refreshed_in_background() -> None:
+    service, calls = _service()
+    service.stale_ttl_sec = 3_600
+    key = service._cache_key("Ditto", "NewJeans")
+    asyncio.run(service._cache_set(key, ("old-vid", "https://www.youtube.com/embed/old-vid", 1)))
+    created_ts, result = service.cache[key]
+    service.cache[key] = (created_ts - service.cache_ttl_sec - 5, result)
+
+    async def run():
+        stale = await service.lookup_track("Ditto", "NewJeans")
+        again = await service.lookup_track("Ditto", "NewJeans")
+        await asyncio.gather(*service._refresh_tasks)
+        return stale, again
+
+    stale, again = asyncio.run(run())
+
+    assert stale[0] == "old-vid"
+    assert again[0] == "old-vid"
+    assert len(calls) == 1
+    assert asyncio.run(service._cache_get(key))[0] == "vid-1"
+
+
+def test_lookup_tracks_batches_statistics_into_one_request() -> None:
+    service = YouTubeService(api_key="test-key")
+    searches: list[tuple[str, str]] = []
+    stats_requests: list[list[str]] = []
+
+    async def fake_search(title: str, artist: str) -> list[str]:
+        searches.append((title, artist))
+        return [f"{title}-a", f"{title}-b"]
+
+    async def fake_statistics(video_ids: list[str]) -> dict[str, int]:
+        stats_requests.append(video_ids)
+        return {video_id: (200 if video_id.endswith("-b") else 100) for video_id in video_ids}
+
+    service._search_video_ids = fake_search  # type: ignore[method-assign]
+    service._request_statistics = fake_statistics  # type: ignore[method-assign]
+
+    results = asyncio.run(service.lookup_tracks([("one", "x"), ("two", "y"), ("one", "x"), ("three", "z")]))
+
+    assert [result[0] for result in results] == ["one-b", "two-b", "one-b", "three-b"]
+    assert len(searches) == 3
+    assert stats_requests == [["one-a", "one-b", "two-a", "two-b", "three-a", "three-b"]]
+
+    asyncio.run(service.get_view_counts(["one-a", "two-b", "four-a"]))
+    assert stats_requests[-1] == ["four-a"]
+
+
+def test_lookup_tracks_chunks_statistics_at_api_limit() -> None:
+    service = YouTubeService(api_key="test-key")
+    stats_requests: list[list[str]] = []
+
+    async def fake_statistics(video_ids: list[str]) -> dict[str, int]:
+        stats_requests.append(video_ids)
+        return {}
+
+    service._request_statistics = fake_statistics  # type: ignore[method-assign]
+
+    asyncio.run(service.get_view_counts([f"vid-{idx}" for idx in range(120)]))
+
+    assert [len(chunk) for chunk in stats_requests] == [50, 50, 20]
+
+
+def test_lookup_tracks_marks_failed_searches_negative() -> None:
+    service = YouTubeService(api_key="test-key")
+
+    async def fake_search(title: str, artist: str) -> list[str]:  # noqa: ARG001
+        if title == "bad":
+            raise RuntimeError("search failed")
+        return [f"{title}-a"]
+
+    async def fake_statistics(video_ids: list[str]) -> dict[str, int]:
+        return {video_id: 5 for video_id in video_ids}
+
+    service._search_video_ids = fake_search  # type: ignore[method-assign]
+    service._request_statistics = fake_statistics  # type: ignore[method-assign]
+
+    results = asyncio.run(service.lookup_tracks([("good", "x"), ("bad", "y")]))
+
+    assert results == [("good-a", "https://www.youtube.com/embed/good-a", 5), (None, None, 0)]
+
+
+def test_failed_statistics_call_keeps_found_videos_uncached() -> None:
+    service = YouTubeService(api_key="test-key")
+    stats_calls = 0
+
+    async def fake_search(title: str, artist: str) -> list[str]:  # noqa: ARG001
+        return [] if title == "missing" else [f"{title}-a", f"{title}-b"]
+
+    async def fake_statistics(video_ids: list[str]) -> dict[str, int]:
+        nonlocal stats_calls
+        stats_calls += 1
+        if stats_calls == 1:
+            raise RuntimeError("videos.list 503")
+        return {video_id: (200 if video_id.endswith("-b") else 100) for video_id in video_ids}
+
+    service._search_video_ids = fake_search  # type: ignore[method-assign]
+    service._request_statistics = fake_statistics  # type: ignore[method-assign]
+
+    first = asyncio.run(service.lookup_tracks([("found", "x"), ("missing", "y")]))
+    assert first == [("found-a", "https://www.youtube.com/embed/found-a", 0), (None, None, 0)]
+    assert asyncio.run(service._cache_get(service._cache_key("found", "x"))) is None
+    assert asyncio.run(service._cache_get(service._cache_key("missing", "y"))) == (None, None, 0)
+
+    second = asyncio.run(service.lookup_tracks([("found", "x"), ("missing", "y")]))
+    assert second == [("found-b", "https://www.youtube.com/embed/found-b", 200), (None, None, 0)]
+    assert stats_calls == 2
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.services_quota import QuotaExhaustedError, YouTubeQuotaBudget
+from app.services_youtube import YouTubeService
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_budget_refills_gradually_and_keeps_reserve() -> None:
+    clock = FakeClock()
+    budget = YouTubeQuotaBudget(daily_limit=8_640, burst_units=200, reserve_units=100, clock=clock)
+
+    assert budget.try_consume(100)
+    assert budget.try_consume(100)
+    assert not budget.try_consume(100)
+    assert budget.rejected == 1
+
+    clock.now += 1_100
+    assert budget.lookup_depth(5) == 1
+    assert budget.try_consume(100)
+
+    budget.used_today = budget.daily_limit - budget.reserve_units - 50
+    clock.now += 10_000
+    assert budget.lookup_depth(5) == 0
+    with pytest.raises(QuotaExhaustedError):
+        budget.consume(100)
+
+
+def test_budget_resets_at_quota_day_boundary() -> None:
+    clock = FakeClock()
+    budget = YouTubeQuotaBudget(daily_limit=1_000, burst_units=1_000, reserve_units=0, clock=clock)
+    budget.consume(1_000)
+    assert budget.remaining_today() == 0
+
+    clock.now += 86_400
+    assert budget.remaining_today() == 1_000
+    assert budget.stats()["spendable_units"] == 1_000
+
+
+def test_quota_skipped_lookup_is_not_cached() -> None:
+    clock = FakeClock()
+    budget = YouTubeQuotaBudget(daily_limit=10_000, burst_units=50, reserve_units=0, clock=clock)
+    service = YouTubeService(api_key="test-key", quota_budget=budget)
+
+    results = asyncio.run(service.lookup_tracks([("Ditto", "NewJeans")]))
+
+    assert results == [(None, None, 0)]
+    assert asyncio.run(service._cache_get(service._cache_key("Ditto", "NewJeans"))) is None
+
+
+def test_budget_is_shared_by_processes_using_the_same_db(tmp_path) -> None:
+    clock = FakeClock()
+    db_path = tmp_path / "youtube_cache.sqlite3"
+    first = YouTubeQuotaBudget(daily_limit=10_000, burst_units=300, reserve_units=0, clock=clock, db_path=db_path)
+    second = YouTubeQuotaBudget(daily_limit=10_000, burst_units=300, reserve_units=0, clock=clock, db_path=db_path)
+
+    assert first.try_consume(100)
+    assert second.try_consume(100)
+    assert first.try_consume(100)
+    assert not second.try_consume(100)
+    assert first.stats()["used_today"] == 300
+    assert first.stats()["rejected"] == 1
+
+    first.close()
+    reopened = YouTubeQuotaBudget(daily_limit=10_000, burst_units=300, reserve_units=0, clock=clock, db_path=db_path)
+    assert reopened.remaining_today() == 9_700
+    reopened.close()
+    second.close()
@@ -7,9 +7,10 @@ import {
   createRenderJob,
   getRenderHistory,
   getRenderJob,
+  pollRenderJob,
   RenderCreateRequest,
   RenderStatusResponse,
-  searchMusic,
+  searchMusicStream,
   TrackItem
 } from "./api";
 import AudioControlBar from "./components/AudioControlBar";
@@ -122,21 +123,36 @@ export default function App() {
     }
   }, []);
 
+  const activeJobId = job && job.status !== "completed" && job.status !== "failed" ? job.job_id : null;
+
   useEffect(() => {
-    if (!job) return;
-    if (job.status === "completed" || job.status === "failed") return;
-
-    const interval = window.setInterval(async () => {
-      try {
-        const next = await getRenderJob(job.job_id);
-        setJob(next);
-      } catch (err) {
-        setError((err as Error).message);
+    if (!activeJobId) return;
+
+    let cancelled = false;
+    const follow = async () => {
+      let etag: string | null = null;
+      while (!cancelled) {
+        try {
+          const next = await pollRenderJob(activeJobId, etag, 20);
+          etag = next.etag;
+          if (cancelled) return;
+          if (next.job) {
+            setJob(next.job);
+            if (next.job.status === "completed" || next.job.status === "failed") return;
+          }
+        } catch (err) {
+          if (cancelled) return;
+          setError((err as Error).message);
+          await new Promise((resolve) => window.setTimeout(resolve, 1000));
+        }
       }
-    }, 500);
+    };
+    void follow();
 
-    return () => window.clearInterval(interval);
-  }, [job]);
+    return () => {
+      cancelled = true;
+    };
+  }, [activeJobId]);
 
   useEffect(() => {
     if (!job || job.status !== "completed") return;
@@ -156,8 +172,27 @@ export default function App() {
     try {
       setSearchLoading(true);
       setError(null);
-      const data = await searchMusic(term, 3);
-      setTracks(data.items);
+      await searchMusicStream(term, 3, (event) => {
+        if (event.type === "candidates") {
+          setTracks(event.items.slice(0, event.limit));
+          setSearchLoading(false);
+        } else if (event.type === "update") {
+          setTracks((current) =>
+            current.map((track) =>
+              track.track_id === event.track_id
+                ? {
+                    ...track,
+                    youtube_video_id: event.youtube_video_id,
+                    youtube_embed_url: event.youtube_embed_url,
+                    score: event.score
+                  }
+                : track
+            )
+          );
+        } else {
+          setTracks(event.items);
+        }
+      });
     } catch (err) {
       setError((err as Error).message);
     } finally {
@@ -474,6 +509,7 @@ export default function App() {
                         </div>
 
                         <div className="min-w-[80px] text-right">
+                          {item.render_cached && <div className="mb-1 text-[10px] font-bold uppercase tracking-wide text-emerald-500">Ready</div>}
                           <div className="mb-1 font-mono text-xs font-bold text-blue-500">{(item.score * 100).toFixed(1)}%</div>
                           <div className={`h-1 w-full rounded-full ${isDarkMode ? "bg-gray-700" : "bg-gray-200"}`}>
                             <div className="h-full rounded-full bg-blue-500" style={{ width: `${Math.max(0, Math.min(100, item.score * 100))}%` }} />
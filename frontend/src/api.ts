@@ -6,6 +6,8 @@ export interface TrackItem {
   album_art_url: string;
   youtube_video_id: string | null;
   youtube_embed_url: string | null;
+  render_cached?: boolean;
+  video_url?: string | null;
   score: number;
 }
 
@@ -13,6 +15,17 @@ export interface MusicSearchResponse {
   items: TrackItem[];
 }
 
+export type MusicSearchStreamEvent =
+  | { type: "candidates"; limit: number; items: TrackItem[] }
+  | {
+      type: "update";
+      track_id: string;
+      youtube_video_id: string | null;
+      youtube_embed_url: string | null;
+      score: number;
+    }
+  | { type: "done"; timed_out: boolean; items: TrackItem[] };
+
 export interface RenderCreateRequest {
   track_id: string;
   album_id?: string | null;
@@ -36,6 +49,8 @@ export interface RenderStatusResponse {
   progress: number;
   queue_position: number;
   estimated_wait_sec: number;
+  version?: number;
+  trace_id?: string | null;
   track: {
     track_id: string;
     title: string;
@@ -48,6 +63,7 @@ export interface RenderStatusResponse {
   result: {
     video_url: string | null;
     thumbnail_url: string | null;
+    hls_url?: string | null;
     cache_key: string | null;
   };
   error: {
@@ -71,6 +87,7 @@ export interface RenderHistoryItem {
   result: {
     video_url: string | null;
     thumbnail_url: string | null;
+    hls_url?: string | null;
     cache_key: string | null;
   };
   created_at: string;
@@ -124,6 +141,35 @@ export function searchMusic(query: string, limit = 3): Promise<MusicSearchRespon
   return apiGet<MusicSearchResponse>(`/api/v1/music/search?${params.toString()}`);
 }
 
+export async function searchMusicStream(
+  query: string,
+  limit: number,
+  onEvent: (event: MusicSearchStreamEvent) => void
+): Promise<void> {
+  const params = new URLSearchParams({ q: query, limit: String(limit) });
+  const path = `/api/v1/music/search/stream?${params.toString()}`;
+  const response = await fetch(`${API_BASE}${path}`);
+  if (!response.ok || !response.body) {
+    throw new Error(`GET ${path} failed with ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { done, value } = await reader.read();
+    buffer += decoder.decode(value, { stream: !done });
+    let newline = buffer.indexOf("\n");
+    while (newline >= 0) {
+      const line = buffer.slice(0, newline).trim();
+      buffer = buffer.slice(newline + 1);
+      if (line) onEvent(JSON.parse(line) as MusicSearchStreamEvent);
+      newline = buffer.indexOf("\n");
+    }
+    if (done) break;
+  }
+}
+
 export function createRenderJob(payload: RenderCreateRequest): Promise<RenderCreateResponse> {
   return apiPost<RenderCreateRequest, RenderCreateResponse>("/api/v1/renders", payload);
 }
@@ -132,6 +178,25 @@ export function getRenderJob(jobId: string): Promise<RenderStatusResponse> {
   return apiGet<RenderStatusResponse>(`/api/v1/renders/${jobId}`);
 }
 
+export interface RenderJobPoll {
+  job: RenderStatusResponse | null;
+  etag: string | null;
+}
+
+export async function pollRenderJob(jobId: string, etag: string | null, waitSec: number): Promise<RenderJobPoll> {
+  const path = `/api/v1/renders/${jobId}?wait=${waitSec}`;
+  const response = await fetch(`${API_BASE}${path}`, {
+    headers: etag ? { "If-None-Match": etag } : undefined
+  });
+  if (response.status === 304) {
+    return { job: null, etag: response.headers.get("ETag") ?? etag };
+  }
+  if (!response.ok) {
+    throw new Error(`GET ${path} failed with ${response.status}`);
+  }
+  return { job: (await response.json()) as RenderStatusResponse, etag: response.headers.get("ETag") };
+}
+
 export function getRenderHistory(limit = 6, includeFailed = false): Promise<RenderHistoryResponse> {
   const params = new URLSearchParams({
     limit: String(limit),
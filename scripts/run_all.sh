@@ -68,6 +68,11 @@ echo "[2/3] Starting backend on :$BACKEND_PORT"
 cd "$ROOT_DIR/backend"
 COMFY_BASE_URL="$COMFY_BASE_URL" COMFY_INPUT_DIR="$COMFY_INPUT_DIR" python3 -m uvicorn app.main:app --host 0.0.0.0 --port "$BACKEND_PORT" &
 pids+=("$!")
+if [[ "${QUEUE_BACKEND:-memory}" == "sqlite" && "${RENDER_WORKER_ENABLED:-1}" == "0" ]]; then
+  echo "      Starting standalone render worker"
+  COMFY_BASE_URL="$COMFY_BASE_URL" COMFY_INPUT_DIR="$COMFY_INPUT_DIR" python3 -m app.worker &
+  pids+=("$!")
+fi
 
 cd "$ROOT_DIR"
 if command -v npm >/dev/null 2>&1; then